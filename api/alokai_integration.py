@@ -7,11 +7,12 @@ Alokai API管理平台集成配置
 
 import json
 import logging
-import requests
 from django.conf import settings
 from rest_framework.response import Response
 from functools import wraps
 
+from mall.http_client import get_client
+
 logger = logging.getLogger(__name__)
 
 # Alokai API网关配置
@@ -22,6 +23,11 @@ ALOKAI_CONFIG = {
     'service_name': getattr(settings, 'ALOKAI_SERVICE_NAME', 'mall-multi-site-api'),
 }
 
+
+def get_alokai_client():
+    """Alokai网关的共享HTTP客户端（长连接、超时、重试、熔断）"""
+    return get_client('alokai', base_url=ALOKAI_CONFIG['gateway_url'])
+
 def register_api_with_alokai(api_name, api_path, methods, description=''):
     """
     向Alokai注册一个API端点
@@ -49,8 +55,8 @@ def register_api_with_alokai(api_name, api_path, methods, description=''):
         }
         
         # 这里应该根据Alokai的实际API调整请求
-        response = requests.post(
-            f"{ALOKAI_CONFIG['gateway_url']}/register", 
+        response = get_alokai_client().post(
+            '/register',
             headers={
                 'X-API-Key': ALOKAI_CONFIG['api_key'],
                 'Content-Type': 'application/json'
@@ -108,8 +114,8 @@ def alokai_api_monitoring(view_func):
                 import threading
                 def send_monitoring_data():
                     try:
-                        requests.post(
-                            f"{ALOKAI_CONFIG['gateway_url']}/metrics", 
+                        get_alokai_client().post(
+                            '/metrics',
                             headers={
                                 'X-API-Key': ALOKAI_CONFIG['api_key'],
                                 'Content-Type': 'application/json'
@@ -148,8 +154,8 @@ def export_openapi_to_alokai():
         schema_json = json.dumps(schema)
         
         # 发送到Alokai
-        response = requests.post(
-            f"{ALOKAI_CONFIG['gateway_url']}/import-openapi", 
+        response = get_alokai_client().post(
+            '/import-openapi',
             headers={
                 'X-API-Key': ALOKAI_CONFIG['api_key'],
                 'Content-Type': 'application/json'
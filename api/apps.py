@@ -7,6 +7,11 @@ class ApiConfig(AppConfig):
     
     def ready(self):
         """在应用准备就绪时执行初始化操作"""
+        # 注册响应缓存失效信号
+        import api.signals  # noqa: F401
+        # 注册缓存配置的系统检查
+        import api.checks  # noqa: F401
+
         # 应用Swagger文档生成修复
         try:
             from .swagger_utils import apply_swagger_fixes
@@ -0,0 +1,162 @@
+"""
+公共目录接口的响应缓存
+
+缓存键由 视图/动作 + 站点代码 + 查询参数 + 依赖模型的代数(generation) 组成。
+模型发生 post_save/post_delete 时只需把对应模型的代数加一，旧缓存键自然失效，
+不需要扫描或删除任何缓存键，因此本地内存缓存和Redis缓存都可以使用。
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+DEFAULT_RESPONSE_CACHE = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'KEY_PREFIX': 'api:resp',
+}
+
+
+def get_cache_config():
+    """读取API_RESPONSE_CACHE配置，未配置的项使用默认值"""
+    config = dict(DEFAULT_RESPONSE_CACHE)
+    config.update(getattr(settings, 'API_RESPONSE_CACHE', {}))
+    return config
+
+
+def get_cache():
+    return caches[get_cache_config()['CACHE_ALIAS']]
+
+
+def _generation_key(label):
+    return f"{get_cache_config()['KEY_PREFIX']}:gen:{label}"
+
+
+def _stats_key(name):
+    return f"{get_cache_config()['KEY_PREFIX']}:stats:{name}"
+
+
+def _incr(key, initial):
+    """原子自增，键不存在时先用initial初始化（add在并发下只有一个能成功）"""
+    cache = get_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, initial, None)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            return initial
+
+
+def bump_generation(label):
+    """
+    使某个模型相关的缓存全部失效
+    初始值取当前毫秒时间戳，缓存被清空后代数也不会回到旧值，避免命中残留的旧缓存
+    """
+    return _incr(_generation_key(label), int(time.time() * 1000))
+
+
+def get_generations(labels):
+    """一次读取多个模型的当前代数，缺失的代数会被初始化"""
+    cache = get_cache()
+    keys = {label: _generation_key(label) for label in labels}
+    values = cache.get_many(list(keys.values()))
+
+    generations = {}
+    for label, key in keys.items():
+        value = values.get(key)
+        if value is None:
+            value = int(time.time() * 1000)
+            if not cache.add(key, value, None):
+                value = cache.get(key, value)
+        generations[label] = value
+    return generations
+
+
+def record_stat(name):
+    _incr(_stats_key(name), 0)
+
+
+def get_cache_stats():
+    """返回响应缓存的命中/未命中计数"""
+    cache = get_cache()
+    values = cache.get_many([_stats_key('hits'), _stats_key('misses')])
+    hits = values.get(_stats_key('hits'), 0)
+    misses = values.get(_stats_key('misses'), 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0,
+    }
+
+
+def reset_cache_stats():
+    get_cache().delete_many([_stats_key('hits'), _stats_key('misses')])
+
+
+def build_cache_key(view, request, dependencies, view_kwargs=None):
+    """根据视图、站点、查询参数和依赖模型代数生成缓存键"""
+    site_code = request.GET.get('site', getattr(request, 'site_code', 'default'))
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+    )
+    generations = get_generations(dependencies)
+
+    raw = '|'.join([
+        view.__class__.__name__,
+        getattr(view, 'action', '') or '',
+        str(sorted((view_kwargs or {}).items())),
+        str(site_code),
+        str(params),
+        '.'.join(str(generations[label]) for label in dependencies),
+    ])
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f"{get_cache_config()['KEY_PREFIX']}:{view.__class__.__name__}:{digest}"
+
+
+def cache_response(*dependencies, timeout=None):
+    """
+    视图方法缓存装饰器
+    dependencies为依赖模型的标签(app_label.model_name)，任一模型变更都会使缓存失效
+
+    用法:
+        @cache_response('goods.goods', 'goods.goodscategory')
+        def list(self, request, *args, **kwargs):
+            ...
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            config = get_cache_config()
+            if request.method != 'GET' or not config['ENABLED']:
+                return view_method(self, request, *args, **kwargs)
+
+            cache = get_cache()
+            key = build_cache_key(self, request, dependencies, kwargs)
+            cached = cache.get(key)
+            if cached is not None:
+                record_stat('hits')
+                response = Response(cached['data'], status=cached['status'])
+                response['X-Cache'] = 'HIT'
+                return response
+
+            record_stat('misses')
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(
+                    key,
+                    {'data': response.data, 'status': response.status_code},
+                    timeout if timeout is not None else config['TIMEOUT']
+                )
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
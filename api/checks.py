@@ -0,0 +1,27 @@
+"""
+缓存配置的系统检查
+
+响应缓存的失效代数、Telegram发送锁等依赖多个进程共享的缓存。本地内存缓存只在当前进程内可见，
+其他Web进程读不到失效代数，会一直返回旧的响应，因此部署检查(manage.py check --deploy)中
+使用本地内存缓存时报错。开发环境(DEBUG)默认使用本地内存缓存，测试运行器会关闭DEBUG，所以只作为部署检查注册。
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """默认缓存和响应缓存使用的缓存必须是多进程共享的后端"""
+    from .cache import get_cache_config
+    errors = []
+    for alias in sorted({'default', get_cache_config()['CACHE_ALIAS']}):
+        backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+        if backend in PROCESS_LOCAL_BACKENDS:
+            errors.append(Error(
+                f"缓存 '{alias}' 使用本地内存缓存，多进程部署下缓存失效和任务锁不会在进程之间共享",
+                hint='配置CACHE_REDIS_URL使用Redis缓存，或改用其他多进程共享的缓存后端',
+                id='api.E001',
+            ))
+    return errors
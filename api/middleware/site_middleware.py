@@ -1,6 +1,8 @@
 from django.conf import settings
 import logging
 
+from sites.registry import site_registry, DEFAULT_SITE_CODE
+
 logger = logging.getLogger(__name__)
 
 def get_current_site(request=None):
@@ -9,43 +11,44 @@ def get_current_site(request=None):
     如果提供了request，则从request中获取
     否则返回默认站点
     """
-    if request and hasattr(request, 'site'):
-        return request.site
+    if request and hasattr(request, 'site_code'):
+        return request.site_code
     return 'default'
 
 class SiteMiddleware:
     """
     站点中间件
     用于检测当前请求所属的站点
+    优先级: site查询参数 > X-Site请求头 > 域名（通过站点注册表解析）
     """
     def __init__(self, get_response):
         self.get_response = get_response
-        self.site_mapping = getattr(settings, 'SITE_MAPPING', {})
         self.site_names = getattr(settings, 'SITE_NAMES', {})
         
+    def _is_known_site(self, code):
+        return code in self.site_names or site_registry.get(code) is not None
+        
     def __call__(self, request):
-        # 默认站点
-        request.site = 'default'
-        request.site_name = self.site_names.get('default', '默认站点')
+        site_code = None
         
         # 从请求参数中获取站点
         site_param = request.GET.get('site')
-        if site_param and site_param in self.site_names:
-            request.site = site_param
-            request.site_name = self.site_names.get(site_param)
-            return self.get_response(request)
+        if site_param and self._is_known_site(site_param):
+            site_code = site_param
             
         # 从HTTP头中获取站点
-        site_header = request.headers.get('X-Site')
-        if site_header and site_header in self.site_names:
-            request.site = site_header
-            request.site_name = self.site_names.get(site_header)
-            return self.get_response(request)
+        if site_code is None:
+            site_header = request.headers.get('X-Site')
+            if site_header and self._is_known_site(site_header):
+                site_code = site_header
             
         # 从域名中获取站点
-        host = request.get_host()
-        if host in self.site_mapping:
-            request.site = self.site_mapping[host]
-            request.site_name = self.site_names.get(request.site, request.site)
+        if site_code is None:
+            site_code = site_registry.lookup_code(request.get_host()) or DEFAULT_SITE_CODE
+        
+        site = site_registry.get(site_code)
+        request.site_code = site_code
+        request.site = site
+        request.site_name = site.name if site else self.site_names.get(site_code, site_code)
             
         return self.get_response(request)
@@ -1,5 +1,15 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from collections import OrderedDict
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -24,3 +34,190 @@ class StandardResultsSetPagination(PageNumberPagination):
             ('pages', self.page.paginator.num_pages),
             ('results', data)
         ]))
+
+
+class KeysetPagination(BasePagination):
+    """
+    键集(游标)分页器
+    使用 (排序字段, id) 作为游标位置，编码为不透明的cursor参数，
+    翻页通过 WHERE 条件定位而不是 OFFSET，且默认不执行 COUNT(*)，深翻页与第一页开销一致。
+    排序字段取自视图ordering_fields中被请求的ordering参数，默认 -created_at，字段必须非空。
+    """
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering_param = 'ordering'
+    default_ordering = '-created_at'
+    count_query_param = 'with_count'
+    # 请求计数时最多统计的行数，超过则返回上限并标记为估算
+    count_cap = 1000
+
+    @classmethod
+    def is_requested(cls, request):
+        """请求中带有cursor参数或 pagination=cursor 时启用键集分页"""
+        return (
+            cls.cursor_query_param in request.query_params
+            or request.query_params.get('pagination') == 'cursor'
+        )
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, request, view):
+        """返回 (字段名, 是否降序)，只允许视图ordering_fields中的字段"""
+        ordering = request.query_params.get(self.ordering_param)
+        allowed = getattr(view, 'ordering_fields', None) or []
+        if ordering:
+            field = ordering.split(',')[0].strip()
+            if field.lstrip('-') in allowed:
+                return field.lstrip('-'), field.startswith('-')
+
+        default = getattr(view, 'ordering', None) or self.default_ordering
+        if isinstance(default, (list, tuple)):
+            default = default[0]
+        # 注解字段(如搜索相关度search_rank)无法作为游标，退回默认排序
+        if not self._is_model_field(default.lstrip('-')):
+            default = self.default_ordering
+        return default.lstrip('-'), default.startswith('-')
+
+    def _is_model_field(self, name):
+        try:
+            self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return True
+
+    def encode_cursor(self, value, pk, reverse=False):
+        # 时间保留完整微秒精度，否则同一毫秒内的行会在翻页时丢失或重复
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            value = value.isoformat()
+        elif isinstance(value, decimal.Decimal):
+            value = str(value)
+        # 主键可能是UUID，统一编码为字符串，解码时按主键字段类型还原
+        payload = {'v': value, 'id': str(pk), 'o': self.field, 'd': self.descending}
+        if reverse:
+            payload['r'] = True
+        token = json.dumps(payload, separators=(',', ':'))
+        return base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            if payload['o'] != self.field or payload['d'] != self.descending:
+                raise ValueError('ordering mismatch')
+            model_field = self.model._meta.get_field(self.field)
+            pk = self.model._meta.pk.to_python(payload['id'])
+            return model_field.to_python(payload['v']), pk, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error, FieldDoesNotExist, ValidationError):
+            raise NotFound('无效的分页游标')
+
+    def _seek(self, queryset, value, pk, forward):
+        """在 (field, id) 上定位游标之后(或之前)的行，先用单列范围条件收窄以便命中索引"""
+        after = 'lt' if forward == self.descending else 'gt'
+        bound = 'lte' if after == 'lt' else 'gte'
+        return queryset.filter(**{f'{self.field}__{bound}': value}).filter(
+            Q(**{f'{self.field}__{after}': value}) | Q(**{f'id__{after}': pk})
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        self.page_size_value = self.get_page_size(request)
+        self.field, self.descending = self.get_ordering(request, view)
+        self.base_queryset = queryset
+
+        prefix = '-' if self.descending else ''
+        reverse_prefix = '' if self.descending else '-'
+
+        cursor = self.decode_cursor(request)
+        self.has_previous = cursor is not None
+        if cursor is None:
+            queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}id')
+            rows = list(queryset[:self.page_size_value + 1])
+            self.has_next = len(rows) > self.page_size_value
+            rows = rows[:self.page_size_value]
+        else:
+            value, pk, reverse = cursor
+            if reverse:
+                # 向前翻页：反向排序取一页再倒转
+                queryset = self._seek(queryset, value, pk, forward=False)
+                queryset = queryset.order_by(f'{reverse_prefix}{self.field}', f'{reverse_prefix}id')
+                rows = list(queryset[:self.page_size_value + 1])
+                self.has_previous = len(rows) > self.page_size_value
+                rows = list(reversed(rows[:self.page_size_value]))
+                self.has_next = True
+            else:
+                queryset = self._seek(queryset, value, pk, forward=True)
+                queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}id')
+                rows = list(queryset[:self.page_size_value + 1])
+                self.has_next = len(rows) > self.page_size_value
+                rows = rows[:self.page_size_value]
+
+        self.page = rows
+        return rows
+
+    def _link(self, instance, reverse):
+        value = getattr(instance, self.field)
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.cursor_query_param, self.encode_cursor(value, instance.pk, reverse))
+        return url
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def get_count(self):
+        """按需返回上限计数，避免对大表执行完整COUNT(*)"""
+        if self.request.query_params.get(self.count_query_param) not in ('1', 'true'):
+            return None, False
+        capped = self.base_queryset.order_by()[:self.count_cap + 1].count()
+        return min(capped, self.count_cap), capped > self.count_cap
+
+    def get_paginated_response(self, data):
+        """
+        键集分页响应格式，与标准分页一样由APIJSONRenderer包装为code/message/data
+        """
+        count, count_is_estimate = self.get_count()
+        return Response(OrderedDict([
+            ('count', count),
+            ('count_is_estimate', count_is_estimate),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('page_size', self.page_size_value),
+            ('results', data)
+        ]))
+
+
+class KeysetPaginationMixin:
+    """
+    视图集混入类：请求带有cursor或 pagination=cursor 参数时使用键集分页，
+    否则仍使用默认的页码分页，保持现有客户端兼容
+    """
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            request = getattr(self, 'request', None)
+            if self.keyset_pagination_class and request is not None and self.keyset_pagination_class.is_requested(request):
+                self._paginator = self.keyset_pagination_class()
+            else:
+                return super().paginator
+        return self._paginator
@@ -0,0 +1,103 @@
+"""
+接口字段投影
+
+客户端通过 ?fields=a,b,c 只请求需要的字段：序列化器只输出这些字段，
+查询集也通过only()只读取对应的数据库列。参数名等配置见settings.API_FIELD_PROJECTION。
+"""
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+DEFAULT_FIELD_PROJECTION = {
+    'ENABLED': True,
+    'QUERY_PARAM': 'fields',
+    'MAX_FIELDS': 50,
+}
+
+
+def get_projection_config():
+    config = dict(DEFAULT_FIELD_PROJECTION)
+    config.update(getattr(settings, 'API_FIELD_PROJECTION', {}))
+    return config
+
+
+class ProjectedFieldsSerializerMixin:
+    """
+    序列化器混入类：context中有projected_fields时，只保留其中列出的字段
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        projected = self.context.get('projected_fields')
+        if projected:
+            for name in set(self.fields) - set(projected):
+                self.fields.pop(name)
+
+
+class FieldProjectionMixin:
+    """
+    视图集混入类：解析fields参数，校验字段名并把序列化器字段映射为数据库列
+
+    projection_always_include: 无论请求哪些字段都需要读取的模型字段（主键、排序字段、select_related的外键等）
+    """
+    projection_always_include = ('id',)
+
+    def get_projected_fields(self):
+        """返回请求的序列化器字段列表，未请求投影时返回None"""
+        if hasattr(self, '_projected_fields'):
+            return self._projected_fields
+
+        self._projected_fields = None
+        config = get_projection_config()
+        request = getattr(self, 'request', None)
+        if not config['ENABLED'] or request is None:
+            return None
+
+        raw = request.query_params.get(config['QUERY_PARAM'], '')
+        requested = [name.strip() for name in raw.split(',') if name.strip()]
+        if not requested:
+            return None
+        if len(requested) > config['MAX_FIELDS']:
+            raise ValidationError({config['QUERY_PARAM']: f'最多只能请求 {config["MAX_FIELDS"]} 个字段'})
+
+        available = self.get_serializer_class()().fields
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise ValidationError({config['QUERY_PARAM']: f'未知字段: {", ".join(unknown)}'})
+
+        # 保持序列化器中的字段顺序
+        self._projected_fields = [name for name in available if name in requested]
+        return self._projected_fields
+
+    def get_projected_model_fields(self, model, fields):
+        """根据序列化器字段的source推导需要读取的模型字段"""
+        available = self.get_serializer_class()().fields
+        model_fields = set(self.projection_always_include)
+        for name in fields:
+            field = available[name]
+            if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+                continue
+            parts = field.source.split('.')
+            try:
+                model_field = model._meta.get_field(parts[0])
+            except FieldDoesNotExist:
+                continue
+            if not model_field.concrete:
+                # 反向关系(如images)通过prefetch加载，不影响本表列
+                continue
+            model_fields.add(parts[0])
+            if len(parts) > 1 and model_field.is_relation:
+                model_fields.add('__'.join(parts))
+        return model_fields
+
+    def project_queryset(self, queryset):
+        """请求了字段投影时，只读取需要的列"""
+        fields = self.get_projected_fields()
+        if not fields:
+            return queryset
+        return queryset.only(*self.get_projected_model_fields(queryset.model, fields))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['projected_fields'] = self.get_projected_fields()
+        return context
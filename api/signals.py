@@ -0,0 +1,30 @@
+"""
+API相关的信号处理
+目录类模型变更时提升响应缓存代数，使相关缓存失效
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from content.models import HomeBlock
+from goods.models import Goods, GoodsImage, GoodsCategory
+from .cache import bump_generation
+
+# 响应缓存依赖的模型
+CACHE_DEPENDENCY_MODELS = [Goods, GoodsImage, GoodsCategory, HomeBlock]
+
+
+def invalidate_response_cache(sender, **kwargs):
+    """在事务提交后提升模型代数，避免其他请求在提交前把旧数据重新写入缓存"""
+    label = sender._meta.label_lower
+    transaction.on_commit(lambda: bump_generation(label))
+
+
+for model in CACHE_DEPENDENCY_MODELS:
+    post_save.connect(
+        invalidate_response_cache, sender=model,
+        dispatch_uid=f'api_cache_post_save_{model._meta.label_lower}'
+    )
+    post_delete.connect(
+        invalidate_response_cache, sender=model,
+        dispatch_uid=f'api_cache_post_delete_{model._meta.label_lower}'
+    )
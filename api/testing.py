@@ -0,0 +1,57 @@
+"""
+API测试工具
+
+QueryBudgetMixin 用于断言接口的SQL查询数量不超过预算，并且不随数据量增长（N+1回归）。
+用法:
+    class ProductQueryTests(QueryBudgetMixin, TestCase):
+        def test_list(self):
+            self.assertQueryBudget('/api/v1/products/', 2)
+            self.assertQueriesConstant('/api/v1/products/', grow=lambda: make_goods(5))
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from sites.registry import site_registry
+
+
+class QueryBudgetMixin:
+    """接口查询预算断言"""
+    client_class = APIClient
+
+    def _request(self, method, url, data=None, **extra):
+        return getattr(self.client, method)(url, data, **extra)
+
+    def count_queries(self, url, method='get', data=None, **extra):
+        """执行一次请求，返回 (response, 执行的SQL列表)"""
+        # 站点注册表按进程缓存，加载注册表的查询不计入单次请求
+        site_registry.resolve('testserver')
+        with CaptureQueriesContext(connection) as context:
+            response = self._request(method, url, data, **extra)
+        return response, [query['sql'] for query in context.captured_queries]
+
+    def assertQueryBudget(self, url, budget, method='get', data=None, status_code=200, **extra):
+        """断言请求成功且查询数量不超过budget，失败时列出全部SQL便于定位"""
+        response, queries = self.count_queries(url, method, data, **extra)
+        self.assertEqual(
+            response.status_code, status_code,
+            f'{method.upper()} {url} 返回 {response.status_code}: {getattr(response, "content", b"")[:500]}'
+        )
+        if len(queries) > budget:
+            listing = '\n'.join(f'  {index + 1}. {sql}' for index, sql in enumerate(queries))
+            self.fail(f'{method.upper()} {url} 执行了 {len(queries)} 条查询，超出预算 {budget}:\n{listing}')
+        return response
+
+    def assertQueriesConstant(self, url, grow, method='get', data=None, **extra):
+        """
+        断言查询数量不随数据量增长
+        grow为无参回调，用于追加更多数据；追加前后查询数量必须一致
+        """
+        _, before = self.count_queries(url, method, data, **extra)
+        grow()
+        _, after = self.count_queries(url, method, data, **extra)
+        if len(after) != len(before):
+            listing = '\n'.join(f'  {index + 1}. {sql}' for index, sql in enumerate(after))
+            self.fail(
+                f'{method.upper()} {url} 查询数量随数据增长: {len(before)} -> {len(after)}（疑似N+1）:\n{listing}'
+            )
@@ -1,3 +1,233 @@
-from django.test import TestCase
+import base64
+import datetime
+import json
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from content.models import Banner, HomeBlock
+from goods.models import Goods, GoodsCategory, GoodsImage
+from order.models import Order
+from users.models import ShippingAddress
+from .checks import check_shared_cache
+from .testing import QueryBudgetMixin
+
+# v1公共目录接口的查询预算（匿名请求、响应缓存关闭）
+QUERY_BUDGETS = {
+    'product_list': 2,  # COUNT + 列表
+    'product_detail': 2,  # 商品(含分类) + 图片预取
+    'product_recommended': 1,
+    'category_list': 4,  # 站点计数 + 分类路径 + COUNT + 列表
+    'category_tree': 5,  # 站点计数 + 分类路径 + 顶级分类 + 全部分类 + 站点计数
+    'category_products': 5,  # 分类对象(3) + COUNT + 列表
+    'homepage_blocks': 2,
+    'banners': 2,
+}
+
+
+def make_goods(category, count, start=0):
+    """创建指定数量的已发布商品，每个商品带两张图片"""
+    goods_list = []
+    for index in range(start, start + count):
+        goods = Goods.objects.create(
+            name=f'商品{index}',
+            category=category,
+            price=Decimal('10.00'),
+            stock=5,
+            status='published',
+            is_recommended=True,
+        )
+        for sort_order in range(2):
+            GoodsImage.objects.create(
+                goods=goods,
+                image=f'goods/images/goods{index}_{sort_order}.gif',
+                sort_order=sort_order,
+            )
+        goods_list.append(goods)
+    return goods_list
+
+
+@override_settings(API_RESPONSE_CACHE={'ENABLED': False})
+class CatalogQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """目录接口查询预算，防止N+1回归"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.root = GoodsCategory.objects.create(name='根分类', level=1)
+        cls.child = GoodsCategory.objects.create(name='子分类', level=2, parent=cls.root)
+        cls.goods = make_goods(cls.child, 3)
+        for index in range(3):
+            HomeBlock.objects.create(title=f'区块{index}', block_type='product_list')
+        # 基线中已有横幅，增长前后执行相同的查询
+        Banner.objects.create(title='横幅', image='banners/banner.gif', product=cls.goods[0])
+
+    def test_product_list(self):
+        self.assertQueryBudget('/api/v1/products/', QUERY_BUDGETS['product_list'])
+        self.assertQueriesConstant('/api/v1/products/', grow=lambda: make_goods(self.child, 5, start=10))
+
+    def test_product_detail(self):
+        url = f'/api/v1/products/{self.goods[0].id}/'
+        self.assertQueryBudget(url, QUERY_BUDGETS['product_detail'])
+
+    def test_product_recommended(self):
+        self.assertQueryBudget('/api/v1/products/recommended/', QUERY_BUDGETS['product_recommended'])
+        self.assertQueriesConstant(
+            '/api/v1/products/recommended/', grow=lambda: make_goods(self.child, 5, start=10)
+        )
+
+    def test_category_list(self):
+        self.assertQueryBudget('/api/v1/categories/', QUERY_BUDGETS['category_list'])
+
+    def test_category_tree(self):
+        self.assertQueryBudget('/api/v1/categories/tree/', QUERY_BUDGETS['category_tree'])
+
+        def grow():
+            for index in range(3):
+                parent = GoodsCategory.objects.create(name=f'新分类{index}', level=2, parent=self.root)
+                make_goods(parent, 1, start=100 + index)
+
+        self.assertQueriesConstant('/api/v1/categories/tree/', grow=grow)
+
+    def test_category_products(self):
+        url = f'/api/v1/categories/{self.root.id}/products/?descendants=true'
+        self.assertQueryBudget(url, QUERY_BUDGETS['category_products'])
+        self.assertQueriesConstant(url, grow=lambda: make_goods(self.child, 5, start=10))
+
+    def test_homepage_blocks(self):
+        self.assertQueryBudget('/api/v1/homepage-blocks/', QUERY_BUDGETS['homepage_blocks'])
+
+    def test_banners(self):
+        self.assertQueryBudget('/api/v1/banners/', QUERY_BUDGETS['banners'])
+        self.assertQueriesConstant(
+            '/api/v1/banners/',
+            grow=lambda: [
+                Banner.objects.create(
+                    title=f'横幅{index}',
+                    image=f'banners/banner{index}.gif',
+                    product=self.goods[0],
+                )
+                for index in range(3)
+            ],
+        )
+
+
+def encode_cursor(payload):
+    token = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+@override_settings(API_RESPONSE_CACHE={'ENABLED': False})
+class KeysetPaginationTests(TestCase):
+    """键集分页：created_at相同的行按id续排，前后翻页不重复不遗漏，伪造的游标返回404"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # 分类列表只返回当前站点有商品的分类，每个分类一个商品
+        cls.categories = [GoodsCategory.objects.create(name=f'分类{index}', level=1) for index in range(7)]
+        cls.goods = [make_goods(category, 1, start=index)[0] for index, category in enumerate(cls.categories)]
+        # 两组创建时间完全相同的行，翻页边界落在相同时间的行之间
+        now = timezone.now()
+        for rows, model in ((cls.goods, Goods), (cls.categories, GoodsCategory)):
+            model.objects.filter(pk__in=[row.pk for row in rows[:4]]).update(created_at=now)
+            model.objects.filter(pk__in=[row.pk for row in rows[4:]]).update(
+                created_at=now - datetime.timedelta(hours=1)
+            )
+
+    def fetch(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def walk(self, url):
+        """沿next链接翻到最后一页，再沿previous链接翻回第一页，返回两个方向的各页id"""
+        forward = []
+        page = self.fetch(url)
+        forward.append([row['id'] for row in page['results']])
+        while page['next']:
+            page = self.fetch(page['next'])
+            forward.append([row['id'] for row in page['results']])
+
+        backward = [forward[-1]]
+        while page['previous']:
+            page = self.fetch(page['previous'])
+            backward.insert(0, [row['id'] for row in page['results']])
+        return forward, backward
+
+    def assertWalksInOrder(self, url, model):
+        forward, backward = self.walk(url)
+        expected = list(model.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual([len(ids) for ids in forward], [3, 3, 1])
+        self.assertEqual(sum(forward, []), expected)
+        self.assertEqual(backward, forward)
+
+    def assertTamperedCursorRejected(self, url):
+        valid = self.fetch(url)['next'].split('cursor=')[1].split('&')[0]
+        tampered = [
+            'not-a-cursor',
+            valid[:-2],
+            encode_cursor({'v': '2026-01-01T00:00:00+00:00', 'id': 'abc', 'o': 'created_at', 'd': True}),
+            encode_cursor({'v': 'yesterday', 'id': '1', 'o': 'created_at', 'd': True}),
+            encode_cursor({'v': '2026-01-01T00:00:00+00:00', 'id': '1', 'o': 'name', 'd': True}),
+        ]
+        for cursor in tampered:
+            response = self.client.get(f'{url}&cursor={cursor}')
+            self.assertEqual(response.status_code, 404, cursor)
+
+    def test_product_list_pages_through_ties(self):
+        self.assertWalksInOrder('/api/v1/products/?pagination=cursor&page_size=3', Goods)
+
+    def test_category_list_pages_through_ties(self):
+        self.assertWalksInOrder('/api/v1/categories/?pagination=cursor&page_size=3', GoodsCategory)
+
+    def test_tampered_cursor_is_rejected(self):
+        self.assertTamperedCursorRejected('/api/v1/products/?pagination=cursor&page_size=3')
+        self.assertTamperedCursorRejected('/api/v1/categories/?pagination=cursor&page_size=3')
+
+
+class OrderCreateApiTests(TestCase):
+    """通过v1订单接口下单，订单号由号段分配器生成"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='buyer', password='pass')
+        self.address = ShippingAddress.objects.create(
+            user=self.user, recipient_name='张三', phone='13800000000',
+            province='广东', city='深圳', district='南山', address='科技园', postal_code='518000',
+        )
+        category = GoodsCategory.objects.create(name='分类', level=1)
+        self.goods = make_goods(category, 1)[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_create_orders_with_allocated_numbers(self):
+        payload = {
+            'shipping_address_id': self.address.id,
+            'recipient_name': '张三',
+            'recipient_phone': '13800000000',
+            'items': [{'product_id': self.goods.id, 'quantity': 2}],
+        }
+        for _ in range(3):
+            response = self.client.post('/api/v1/orders/list/', payload, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+
+        numbers = list(Order.objects.values_list('order_number', flat=True))
+        self.assertEqual(len(set(numbers)), 3)
+        self.assertTrue(all(len(number) <= 20 for number in numbers))
+        order = Order.objects.first()
+        self.assertEqual(order.total_amount, Decimal('20.00'))
+        self.assertIn('科技园', order.shipping_address_text)
+
+
+class SharedCacheCheckTests(TestCase):
+    """部署检查：使用本地内存缓存时报错"""
+
+    LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    REDIS = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'}}
+
+    def test_process_local_cache_fails_deploy_check(self):
+        with override_settings(CACHES=self.LOCMEM):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['api.E001'])
+        with override_settings(CACHES=self.REDIS):
+            self.assertEqual(check_shared_cache(None), [])
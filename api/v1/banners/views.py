@@ -2,6 +2,8 @@ from rest_framework import viewsets, permissions
 from rest_framework.response import Response
 from django.db.models import Q
 from content.models import Banner
+from goods.models import GoodsQuerySet
+from goods.visibility import filter_visible_in_site
 from .serializers import BannerSerializer
 from django.utils import timezone
 
@@ -23,9 +25,12 @@ class BannerViewSet(viewsets.ReadOnlyModelViewSet):
         now = timezone.now()
         
         # 基础查询：激活状态且在有效时间范围内
+        # 关联商品只用于列表序列化，一并取出分类并跳过大文本字段
         queryset = Banner.objects.filter(
             is_active=True
-        ).select_related('product')
+        ).select_related('product', 'product__category').defer(
+            *[f'product__{field}' for field in GoodsQuerySet.HEAVY_FIELDS]
+        )
         
         # 时间范围过滤
         queryset = queryset.filter(
@@ -37,13 +42,7 @@ class BannerViewSet(viewsets.ReadOnlyModelViewSet):
         site_code = self.request.GET.get('site', getattr(self.request, 'site_code', 'default'))
         
         # 只返回当前站点可见的轮播图
-        # 修复数据库不支持contains操作符的问题
-        # 暂时注释掉站点过滤，返回所有轮播图
-        # queryset = queryset.filter(
-        #     Q(visible_in__contains=site_code) | 
-        #     Q(visible_in=[]) | 
-        #     Q(visible_in__isnull=True)
-        # )
+        queryset = filter_visible_in_site(queryset, site_code)
         
         # 按位置过滤
         position = self.request.query_params.get('position', None)
@@ -20,7 +20,10 @@ class CategorySerializer(serializers.ModelSerializer):
     def get_product_count(self, obj):
         """
         获取分类下的商品数量
+        优先使用视图从分类计数表标注的站点商品数量
         """
+        if hasattr(obj, 'site_product_count'):
+            return obj.site_product_count
         return obj.goods.filter(status='published').count()
 
 class CategoryTreeSerializer(serializers.ModelSerializer):
@@ -42,8 +45,13 @@ class CategoryTreeSerializer(serializers.ModelSerializer):
     def get_children(self, obj):
         """
         递归获取子分类
+        视图在context中提供children_map时直接使用预取的子分类，不再逐节点查询
         """
-        children = obj.children.filter(is_active=True).order_by('sort_order')
+        children_map = self.context.get('children_map')
+        if children_map is not None:
+            children = children_map.get(obj.id, [])
+        else:
+            children = obj.children.filter(is_active=True).order_by('sort_order')
         serializer = CategoryTreeSerializer(children, many=True, context=self.context)
         return serializer.data
     
@@ -51,4 +59,7 @@ class CategoryTreeSerializer(serializers.ModelSerializer):
         """
         获取分类下的商品数量
         """
+        product_counts = self.context.get('product_counts')
+        if product_counts is not None:
+            return product_counts.get(obj.id, 0)
         return obj.goods.filter(status='published').count()
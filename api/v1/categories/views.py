@@ -2,18 +2,25 @@ from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from goods.models import GoodsCategory, Goods
+from goods.visibility import filter_visible_in_site
+from goods.counters import annotate_product_counts, site_counts
+from api.cache import cache_response
+from api.pagination import KeysetPaginationMixin
 from .serializers import CategorySerializer, CategoryTreeSerializer
 from django.db.models import Q
+from collections import defaultdict
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(KeysetPaginationMixin, viewsets.ReadOnlyModelViewSet):
     """
     商品分类API视图集
     提供分类列表、详情、树状结构等功能
     支持站点过滤
+    分类商品列表带cursor或pagination=cursor参数时使用键集分页
     """
     permission_classes = [permissions.AllowAny]  # 分类API允许公开访问
     serializer_class = CategorySerializer
-    queryset = GoodsCategory.objects.filter(is_active=True).order_by('sort_order')
+    # CategorySerializer.parent_name 读取父分类，随列表一起查询
+    queryset = GoodsCategory.objects.filter(is_active=True).select_related('parent').order_by('sort_order')
     
     def get_queryset(self):
         """
@@ -33,29 +40,30 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
         # 查找此站点下有商品的分类
         if site_code:
             try:
-                # 获取当前站点可见的所有商品
-                # 修复数据库不支持contains操作符的问题
-                site_products = Goods.objects.filter(
-                    status='published'
-                    # 暂时注释掉contains查询，返回所有商品
-                    # Q(visible_in__contains=site_code) | 
-                    # Q(visible_in=[]) | 
-                    # Q(visible_in__isnull=True)
-                )
+                # 从分类计数表取出当前站点有已发布商品的分类，不再扫描商品表
+                category_ids_with_goods = [
+                    category_id for category_id, count in site_counts(site_code).items() if count > 0
+                ]
                 
-                # 获取这些商品所属的分类ID
-                category_ids = site_products.values_list('category_id', flat=True).distinct()
+                # 获取这些分类的物化路径，路径中已包含全部祖先分类ID
+                paths = GoodsCategory.objects.filter(
+                    id__in=category_ids_with_goods
+                ).values_list('path', flat=True)
                 
-                # 筛选出这些分类及其父分类
+                # 筛选出这些分类及其所有祖先分类
+                category_ids = {
+                    int(part)
+                    for path in paths
+                    for part in path.strip('/').split('/') if part
+                }
                 if category_ids:
-                    # 包含这些分类ID
-                    queryset = queryset.filter(
-                        Q(id__in=category_ids) |  # 直接分类
-                        Q(children__id__in=category_ids)  # 父分类
-                    ).distinct()
+                    queryset = queryset.filter(id__in=category_ids)
             except Exception as e:
                 # 捕获数据库后端不支持的查询错误
                 print(f"Error in category filtering: {e}")
+            
+            # 标注当前站点的商品数量，供CategorySerializer.product_count使用
+            queryset = annotate_product_counts(queryset, site_code)
         
         # 支持按级别过滤
         level = self.request.query_params.get('level', None)
@@ -73,34 +81,54 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
     
     @action(detail=False, methods=['get'])
+    @cache_response('goods.goodscategory', 'goods.goods')
     def tree(self, request):
         """
         获取树状结构的分类数据
-        只返回顶级分类，子分类通过递归方式获取
+        顶级分类按站点过滤，子分类和分类计数各用一次查询预取，在内存中组装成树
         """
         # 只获取顶级分类
         queryset = self.get_queryset().filter(parent__isnull=True)
-        serializer = CategoryTreeSerializer(queryset, many=True, context={'request': request})
+        
+        # 一次查询取出全部启用分类，按父分类分组
+        children_map = defaultdict(list)
+        for category in GoodsCategory.objects.filter(is_active=True).order_by('sort_order'):
+            if category.parent_id is not None:
+                children_map[category.parent_id].append(category)
+        
+        # 从分类计数表一次取出当前站点各分类的商品数量
+        site_code = request.GET.get('site', getattr(request, 'site_code', 'default'))
+        product_counts = site_counts(site_code)
+        
+        serializer = CategoryTreeSerializer(queryset, many=True, context={
+            'request': request,
+            'children_map': children_map,
+            'product_counts': product_counts,
+        })
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def products(self, request, pk=None):
         """
         获取指定分类下的商品列表
+        descendants=true时包含所有子孙分类的商品（按物化路径前缀过滤）
         """
         category = self.get_object()
         
         # 获取站点代码
         site_code = self.request.GET.get('site', getattr(self.request, 'site_code', 'default'))
         
+        # 是否包含子孙分类
+        include_descendants = request.query_params.get('descendants', '').lower() in ('1', 'true')
+        if include_descendants:
+            products = Goods.objects.filter(status='published', category__path__startswith=category.path)
+        else:
+            products = Goods.objects.filter(status='published', category=category)
+        # 列表不读取描述等大文本字段，分类名称随select_related一并取出
+        products = products.for_listing().select_related('category')
+        
         # 查询当前站点可见的商品
-        products = Goods.objects.filter(
-            Q(visible_in__contains=site_code) | 
-            Q(visible_in=[]) | 
-            Q(visible_in__isnull=True),
-            status='published',
-            category=category
-        )
+        products = filter_visible_in_site(products, site_code)
         
         # 分页处理
         page = self.paginate_queryset(products)
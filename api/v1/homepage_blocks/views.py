@@ -2,6 +2,8 @@ from rest_framework import viewsets, permissions
 from rest_framework.response import Response
 from django.db.models import Q
 from content.models import HomeBlock
+from goods.visibility import filter_visible_in_site
+from api.cache import cache_response
 from .serializers import HomeBlockSerializer
 
 class HomeBlockViewSet(viewsets.ReadOnlyModelViewSet):
@@ -26,11 +28,7 @@ class HomeBlockViewSet(viewsets.ReadOnlyModelViewSet):
         
         # 只返回当前站点可见的模块
         # visible_in为空表示所有站点可见，否则当前站点必须在visible_in列表中
-        queryset = queryset.filter(
-            Q(visible_in__contains=site_code) | 
-            Q(visible_in=[]) | 
-            Q(visible_in__isnull=True)
-        )
+        queryset = filter_visible_in_site(queryset, site_code)
         
         # 按模块类型过滤
         block_type = self.request.query_params.get('block_type', None)
@@ -39,3 +37,17 @@ class HomeBlockViewSet(viewsets.ReadOnlyModelViewSet):
         
         # 排序
         return queryset.order_by('sort_order')
+    
+    @cache_response('content.homeblock')
+    def list(self, request, *args, **kwargs):
+        """
+        获取首页模块列表（带响应缓存）
+        """
+        return super().list(request, *args, **kwargs)
+    
+    @cache_response('content.homeblock')
+    def retrieve(self, request, *args, **kwargs):
+        """
+        获取首页模块详情（带响应缓存）
+        """
+        return super().retrieve(request, *args, **kwargs)
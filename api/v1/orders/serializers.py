@@ -66,7 +66,7 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
-    shipping_address_id = serializers.UUIDField(write_only=True)
+    shipping_address_id = serializers.IntegerField(write_only=True)
     
     class Meta:
         model = Order
@@ -93,7 +93,7 @@ class OrderCreateSerializer(serializers.ModelSerializer):
                 user=self.context['request'].user
             )
             attrs['shipping_address'] = shipping_address
-            attrs['shipping_address_text'] = f"{shipping_address.country} {shipping_address.province} {shipping_address.city} {shipping_address.district} {shipping_address.address} {shipping_address.postal_code}"
+            attrs['shipping_address_text'] = f"{shipping_address.province} {shipping_address.city} {shipping_address.district} {shipping_address.address} {shipping_address.postal_code}"
         except ShippingAddress.DoesNotExist:
             raise serializers.ValidationError({"shipping_address_id": "收货地址不存在"})
         
@@ -106,25 +106,18 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         """创建订单"""
         from goods.models import Goods
         from api.exceptions import BusinessException
-        import uuid
-        import datetime
         
         items_data = validated_data.pop('items', [])
         wishlist_item = validated_data.get('wishlist_item', None)
         
-        # 生成订单号
-        now = datetime.datetime.now()
-        order_number = f"ORD{now.strftime('%Y%m%d%H%M%S')}{str(uuid.uuid4().int)[:4]}"
-        validated_data['order_number'] = order_number
-        
         # 设置用户
         validated_data['user'] = self.context['request'].user
         
         # 计算订单总金额
         total_amount = 0
         
-        # 创建订单
-        order = Order.objects.create(**validated_data)
+        # 创建订单，订单号由Order.save()通过号段分配器生成
+        order = Order.objects.create(total_amount=total_amount, **validated_data)
         
         # 如果是从心愿单创建
         if wishlist_item:
@@ -2,9 +2,9 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Q
-from django.utils import timezone
 
-from order.models import Order, OrderItem, OrderLog, RefundDetail
+from order.models import Order, OrderItem, RefundDetail
+from order.transitions import transition, InvalidTransition
 from .serializers import (
     OrderSerializer, OrderCreateSerializer, OrderItemSerializer,
     OrderLogSerializer, RefundDetailSerializer, RefundCreateSerializer
@@ -62,19 +62,8 @@ class OrderViewSet(viewsets.ModelViewSet):
         if instance.status != 'pending':
             raise BusinessException("只有待处理状态的订单可以被取消")
             
-        # 更新订单状态为取消
-        instance.status = 'cancelled'
-        instance.save()
-        
-        # 添加订单日志
-        OrderLog.objects.create(
-            order=instance,
-            action="取消订单",
-            status_from='pending',
-            status_to='cancelled',
-            user=self.request.user,
-            note="用户取消了订单"
-        )
+        # 更新订单状态为取消并添加订单日志
+        transition(instance, 'cancel', user=self.request.user, note="用户取消了订单")
     
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -85,20 +74,12 @@ class OrderViewSet(viewsets.ModelViewSet):
         if instance.status not in ['pending', 'paid', 'processing']:
             return Response({"detail": "当前状态的订单不能被取消"}, status=status.HTTP_400_BAD_REQUEST)
             
-        # 更新订单状态
-        old_status = instance.status
-        instance.status = 'cancelled'
-        instance.save()
-        
-        # 添加订单日志
-        OrderLog.objects.create(
-            order=instance,
-            action="取消订单",
-            status_from=old_status,
-            status_to='cancelled',
-            user=request.user,
-            note=request.data.get('reason', "用户取消了订单")
-        )
+        # 更新订单状态并添加订单日志
+        reason = request.data.get('reason', "用户取消了订单")
+        try:
+            transition(instance, 'cancel', user=request.user, note=reason)
+        except InvalidTransition as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response(OrderSerializer(instance).data)
     
@@ -125,20 +106,11 @@ class OrderViewSet(viewsets.ModelViewSet):
         if instance.status != 'shipped':
             return Response({"detail": "只有已发货的订单可以确认收货"}, status=status.HTTP_400_BAD_REQUEST)
             
-        # 更新订单状态
-        instance.status = 'delivered'
-        instance.delivered_at = timezone.now()
-        instance.save()
-        
-        # 添加订单日志
-        OrderLog.objects.create(
-            order=instance,
-            action="确认收货",
-            status_from='shipped',
-            status_to='delivered',
-            user=request.user,
-            note="用户确认收货"
-        )
+        # 更新订单状态并添加订单日志
+        try:
+            transition(instance, 'deliver', user=request.user, note="用户确认收货")
+        except InvalidTransition as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response(OrderSerializer(instance).data)
     
@@ -151,20 +123,11 @@ class OrderViewSet(viewsets.ModelViewSet):
         if instance.status != 'delivered':
             return Response({"detail": "只有已送达的订单可以标记为完成"}, status=status.HTTP_400_BAD_REQUEST)
             
-        # 更新订单状态
-        instance.status = 'completed'
-        instance.completed_at = timezone.now()
-        instance.save()
-        
-        # 添加订单日志
-        OrderLog.objects.create(
-            order=instance,
-            action="完成订单",
-            status_from='delivered',
-            status_to='completed',
-            user=request.user,
-            note="用户确认完成订单"
-        )
+        # 更新订单状态并添加订单日志
+        try:
+            transition(instance, 'complete', user=request.user, note="用户确认完成订单")
+        except InvalidTransition as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response(OrderSerializer(instance).data)
         
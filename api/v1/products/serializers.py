@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from goods.models import Goods, GoodsImage
+from api.projection import ProjectedFieldsSerializerMixin
 
 class GoodsImageSerializer(serializers.ModelSerializer):
     """商品图片序列化器"""
@@ -7,7 +8,7 @@ class GoodsImageSerializer(serializers.ModelSerializer):
         model = GoodsImage
         fields = ['id', 'image', 'is_main', 'sort_order']
 
-class GoodsListSerializer(serializers.ModelSerializer):
+class GoodsListSerializer(ProjectedFieldsSerializerMixin, serializers.ModelSerializer):
     """商品列表序列化器 - 精简版本"""
     category_name = serializers.CharField(source='category.name', read_only=True)
     
@@ -18,7 +19,18 @@ class GoodsListSerializer(serializers.ModelSerializer):
             'category', 'category_name', 'is_recommended', 'is_hot', 'is_new'
         ]
 
-class GoodsDetailSerializer(serializers.ModelSerializer):
+class GoodsSearchResultSerializer(GoodsListSerializer):
+    """商品搜索结果序列化器 - 附带相关度和高亮片段"""
+    search_rank = serializers.FloatField(read_only=True)
+    highlight = serializers.SerializerMethodField()
+    
+    class Meta(GoodsListSerializer.Meta):
+        fields = GoodsListSerializer.Meta.fields + ['search_rank', 'highlight']
+    
+    def get_highlight(self, obj):
+        return self.context.get('search_highlights', {}).get(obj.id)
+
+class GoodsDetailSerializer(ProjectedFieldsSerializerMixin, serializers.ModelSerializer):
     """商品详情序列化器 - 完整版本"""
     category_name = serializers.CharField(source='category.name', read_only=True)
     images = GoodsImageSerializer(many=True, read_only=True)
@@ -2,22 +2,45 @@ from rest_framework import viewsets, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from goods.models import Goods
-from .serializers import GoodsListSerializer, GoodsDetailSerializer
-from django.db.models import Q
+from goods.models import Goods, GoodsImage
+from goods.visibility import filter_visible_in_site
+from goods.search import apply_search, get_highlights
+from api.cache import cache_response
+from api.pagination import KeysetPaginationMixin
+from api.projection import FieldProjectionMixin
+from .serializers import GoodsListSerializer, GoodsDetailSerializer, GoodsSearchResultSerializer
+from django.db.models import Q, Prefetch
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+# 商品列表类接口依赖的模型，任一模型变更都会使缓存失效
+PRODUCT_CACHE_DEPENDENCIES = ('goods.goods', 'goods.goodsimage', 'goods.goodscategory')
+
+class ProductViewSet(FieldProjectionMixin, KeysetPaginationMixin, viewsets.ReadOnlyModelViewSet):
     """
     商品API视图集
     支持列表、详情查询
-    支持站点过滤、分类过滤、搜索
+    支持站点过滤、分类过滤、全文搜索(q/keyword/search参数，按相关度排序并返回高亮片段)
+    列表带cursor或pagination=cursor参数时使用键集分页
+    支持fields参数只返回指定字段，如 ?fields=id,name,price
     """
     permission_classes = [permissions.AllowAny]  # 商品API允许公开访问
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['category', 'is_recommended', 'is_hot', 'is_new']
-    search_fields = ['name', 'description']
     ordering_fields = ['price', 'sales', 'created_at']
     ordering = ['-created_at']
+    # 全文搜索参数，按顺序取第一个非空值
+    search_params = ('q', 'keyword', 'search')
+    # 字段投影时始终读取的列：主键、select_related的分类外键、排序字段
+    projection_always_include = ('id', 'category', 'created_at', 'price', 'sales')
+    
+    def get_search_query(self):
+        """
+        获取全文搜索关键词
+        """
+        for param in self.search_params:
+            value = self.request.query_params.get(param, '').strip()
+            if value:
+                return value
+        return None
     
     def get_queryset(self):
         """
@@ -25,24 +48,32 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         """
         queryset = Goods.objects.filter(status='published').select_related('category')
         
+        # 详情页一次性预取商品图片，避免序列化images时逐条查询
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(
+                Prefetch('images', queryset=GoodsImage.objects.only(
+                    'id', 'goods_id', 'image', 'is_main', 'sort_order'
+                ))
+            )
+        else:
+            # 列表类接口不读取描述等大文本字段
+            queryset = queryset.for_listing()
+        
+        # 客户端通过fields参数请求了字段投影时只读取对应的列
+        queryset = self.project_queryset(queryset)
+        
         # 站点过滤 - 优先使用URL参数中的site
         site_code = self.request.GET.get('site', getattr(self.request, 'site_code', 'default'))
         
-        # 只返回当前站点可见的商品
-        # 注意: 之前visible_in__contains会导致数据库错误
-        # 改用字符串匹配或者返回所有商品，以修复平台兼容性问题
-        
-        # 暂时返回所有商品，以修复500错误
-        # 实际生产环境应使用更精确的查询方式
-        # queryset = queryset.filter(Q(visible_in__isnull=True) | Q(visible_in=[]))
+        # 只返回当前站点可见的商品（走站点可见性关系表索引）
+        queryset = filter_visible_in_site(queryset, site_code)
         
-        # 支持通过关键词搜索
-        keyword = self.request.query_params.get('keyword', None)
-        if keyword:
-            queryset = queryset.filter(
-                Q(name__icontains=keyword) |
-                Q(description__icontains=keyword)
-            )
+        # 全文搜索，未指定排序时按相关度排序
+        query = self.get_search_query()
+        if query:
+            queryset = apply_search(queryset, query)
+            if not self.request.query_params.get('ordering'):
+                self.ordering = ['-search_rank', '-created_at']
             
         return queryset
     
@@ -53,9 +84,35 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         """
         if self.action == 'retrieve':
             return GoodsDetailSerializer
+        if self.action == 'list' and self.get_search_query():
+            return GoodsSearchResultSerializer
         return GoodsListSerializer
     
+    def paginate_queryset(self, queryset):
+        """
+        分页后只为当前页的商品生成搜索高亮片段
+        """
+        page = super().paginate_queryset(queryset)
+        query = self.get_search_query()
+        if query and self.action == 'list':
+            rows = page if page is not None else queryset
+            self.search_highlights = get_highlights(query, [goods.id for goods in rows])
+        return page
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['search_highlights'] = getattr(self, 'search_highlights', {})
+        return context
+    
+    @cache_response(*PRODUCT_CACHE_DEPENDENCIES)
+    def list(self, request, *args, **kwargs):
+        """
+        获取商品列表（带响应缓存）
+        """
+        return super().list(request, *args, **kwargs)
+    
     @action(detail=False, methods=['get'])
+    @cache_response(*PRODUCT_CACHE_DEPENDENCIES)
     def recommended(self, request):
         """
         获取推荐商品列表
@@ -65,6 +122,7 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cache_response(*PRODUCT_CACHE_DEPENDENCIES)
     def hot(self, request):
         """
         获取热门商品列表
@@ -74,6 +132,7 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cache_response(*PRODUCT_CACHE_DEPENDENCIES)
     def new(self, request):
         """
         获取新品列表
@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from api.views import response_cache_stats
 
 # 创建默认路由器
 router = DefaultRouter()
@@ -37,6 +38,9 @@ urlpatterns = [
     # 内容页面API
     path('content/', include('api.v1.content.urls')),
     
+    # 响应缓存统计（仅管理员）
+    path('cache-stats/', response_cache_stats, name='response-cache-stats'),
+    
     # 推荐/BI/行为绘点API - 待实现
     # path('recommendations/', include('api.v1.recommendations.urls')),
     # path('events/', include('api.v1.events.urls')),
@@ -41,6 +41,18 @@ class WishlistSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class PublicWishlistItemSerializer(WishlistItemSerializer):
+    """公开心愿单列表中的物品，不输出描述"""
+
+    class Meta(WishlistItemSerializer.Meta):
+        fields = [name for name in WishlistItemSerializer.Meta.fields if name != 'description']
+
+
+class PublicWishlistSerializer(WishlistSerializer):
+    """公开心愿单列表序列化器，物品使用精简字段"""
+    items = PublicWishlistItemSerializer(many=True, read_only=True)
+
+
 class WishlistItemCreateSerializer(serializers.ModelSerializer):
     """
     创建心愿单物品的序列化器
@@ -1,11 +1,26 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Sum, Count, F, Case, When, Value, IntegerField, DecimalField
+from django.db.models import Q, Sum, Count, F, Case, When, Value, IntegerField, DecimalField, Prefetch
 from django.utils import timezone
+from goods.models import GoodsQuerySet
+from wishlist_new.analytics import user_wishlist_stats, wishlist_stats
 from wishlist_new.models import Wishlist, WishlistItem, WishlistView
-from .serializers import WishlistSerializer, WishlistItemSerializer, WishlistItemCreateSerializer
+from wishlist_new.public_cache import get_public_wishlist
+from wishlist_new.view_counter import record_view
+from .serializers import (
+    PublicWishlistSerializer, WishlistSerializer, WishlistItemSerializer, WishlistItemCreateSerializer
+)
 from api.exceptions import BusinessException
+from api.pagination import KeysetPagination
+
+
+def public_items_queryset():
+    """公开心愿单物品：商品及分类随物品一次取出，商品不读取大文本字段"""
+    return WishlistItem.objects.select_related('product__category').defer(
+        *(f'product__{name}' for name in GoodsQuerySet.HEAVY_FIELDS)
+    )
+
 
 class WishlistViewSet(viewsets.ModelViewSet):
     """
@@ -87,39 +102,46 @@ class WishlistViewSet(viewsets.ModelViewSet):
         通过分享码查看心愿单
         允许匿名访问，但只能查看公开的心愿单
         """
-        try:
-            wishlist = Wishlist.objects.get(share_code=share_code, is_public=True)
-        except Wishlist.DoesNotExist:
+        def build():
+            wishlist = (
+                Wishlist.objects.filter(share_code=share_code, is_public=True)
+                .prefetch_related(Prefetch('items', queryset=public_items_queryset()))
+                .first()
+            )
+            if wishlist is None:
+                return None
+            return self.get_serializer(wishlist).data
+        
+        # 分享链接访问量大，按分享码缓存序列化结果，物品变更时失效；图片为绝对URL，按访问的主机分别缓存
+        data = get_public_wishlist(share_code, build, origin=request.build_absolute_uri('/'))
+        if data is None:
             return Response(
                 {"detail": "心愿单不存在或不是公开的"},
                 status=status.HTTP_404_NOT_FOUND
             )
             
-        serializer = self.get_serializer(wishlist)
-        return Response(serializer.data)
+        return Response(data)
     
     @action(detail=False, methods=['get'])
     def list_public(self, request):
         """
         列出公开的心愿单
-        支持分页查询
+        使用键集分页（cursor参数翻页），物品不输出描述
         """
-        # 查询公开的心愿单
-        public_wishlists = Wishlist.objects.filter(is_public=True)
+        # 查询公开的心愿单，物品一次预取且不读取描述
+        public_wishlists = Wishlist.objects.filter(is_public=True).prefetch_related(
+            Prefetch('items', queryset=public_items_queryset().defer('description'))
+        )
         
         # 支持按用户名搜索
         username = request.query_params.get('username', None)
         if username:
             public_wishlists = public_wishlists.filter(user__username__icontains=username)
             
-        # 分页处理
-        page = self.paginate_queryset(public_wishlists)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-            
-        serializer = self.get_serializer(public_wishlists, many=True)
-        return Response(serializer.data)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(public_wishlists, request, view=self)
+        serializer = PublicWishlistSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
         
     @action(detail=True, methods=['post'])
     def view(self, request, pk=None):
@@ -132,20 +154,10 @@ class WishlistViewSet(viewsets.ModelViewSet):
         except Exception:
             return Response({"detail": "心愿单不存在"}, status=status.HTTP_404_NOT_FOUND)
             
-        # 记录浏览信息
-        ip_address = request.META.get('REMOTE_ADDR', '')
-        user_agent = request.META.get('HTTP_USER_AGENT', '')
-        user = request.user if request.user.is_authenticated else None
-        
-        # 创建浏览记录
-        WishlistView.objects.create(
-            wishlist=wishlist,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            user=user
-        )
+        # 浏览先计入缓存，由定时任务批量写入WishlistView，同一访客短时间内重复浏览只计一次
+        views = record_view(wishlist, request)
         
-        return Response({"success": True, "views": WishlistView.objects.filter(wishlist=wishlist).count()})
+        return Response({"success": True, "views": views})
     
     @action(detail=True, methods=['get'])
     def stats(self, request, pk=None):
@@ -158,92 +170,20 @@ class WishlistViewSet(viewsets.ModelViewSet):
         except Exception:
             return Response({"detail": "心愿单不存在"}, status=status.HTTP_404_NOT_FOUND)
             
-        # 获取浏览量
-        views_count = WishlistView.objects.filter(wishlist=wishlist).count()
-        
-        # 获取商品统计
-        items = WishlistItem.objects.filter(wishlist=wishlist)
-        
-        # 已购买商品统计
-        purchased_items = items.filter(purchased=True)
-        purchased_count = purchased_items.count()
-        purchased_amount = purchased_items.aggregate(total=Sum('price'))['total'] or 0
-        
-        # 未购买商品统计
-        unpurchased_items = items.filter(purchased=False)
-        unpurchased_count = unpurchased_items.count()
-        unpurchased_amount = unpurchased_items.aggregate(total=Sum('price'))['total'] or 0
-        
-        # 支付完成的商品统计
-        payment_completed_items = items.filter(payment_completed=True)
-        payment_completed_count = payment_completed_items.count()
-        payment_completed_amount = payment_completed_items.aggregate(total=Sum('price'))['total'] or 0
-        
-        return Response({
-            "views_count": views_count,
-            "purchased": {
-                "count": purchased_count,
-                "amount": purchased_amount
-            },
-            "unpurchased": {
-                "count": unpurchased_count,
-                "amount": unpurchased_amount
-            },
-            "payment_completed": {
-                "count": payment_completed_count,
-                "amount": payment_completed_amount
-            }
-        })
+        return Response(wishlist_stats(wishlist))
     
     @action(detail=False, methods=['get'])
     def stats_all(self, request):
         """
         获取所有心愿单的汇总统计数据
         仅限已登录用户查看自己的心愿单统计
+        wishlists 字段包含每个心愿单的明细
         """
         if not request.user.is_authenticated:
             return Response({"detail": "需要登录"}, status=status.HTTP_401_UNAUTHORIZED)
             
-        # 获取用户的所有心愿单
-        wishlists = Wishlist.objects.filter(user=request.user)
-        
-        # 获取总浏览量
-        views_count = WishlistView.objects.filter(wishlist__in=wishlists).count()
-        
-        # 获取所有心愿单商品
-        items = WishlistItem.objects.filter(wishlist__in=wishlists)
-        
-        # 已购买商品统计
-        purchased_items = items.filter(purchased=True)
-        purchased_count = purchased_items.count()
-        purchased_amount = purchased_items.aggregate(total=Sum('price'))['total'] or 0
-        
-        # 未购买商品统计
-        unpurchased_items = items.filter(purchased=False)
-        unpurchased_count = unpurchased_items.count()
-        unpurchased_amount = unpurchased_items.aggregate(total=Sum('price'))['total'] or 0
-        
-        # 支付完成的商品统计
-        payment_completed_items = items.filter(payment_completed=True)
-        payment_completed_count = payment_completed_items.count()
-        payment_completed_amount = payment_completed_items.aggregate(total=Sum('price'))['total'] or 0
-        
-        return Response({
-            "wishlists_count": wishlists.count(),
-            "views_count": views_count,
-            "purchased": {
-                "count": purchased_count,
-                "amount": purchased_amount
-            },
-            "unpurchased": {
-                "count": unpurchased_count,
-                "amount": unpurchased_amount
-            },
-            "payment_completed": {
-                "count": payment_completed_count,
-                "amount": payment_completed_amount
-            }
-        })
+        # 一条查询按心愿单分组统计，返回汇总和每个心愿单的明细
+        return Response(user_wishlist_stats(request.user))
     
     @action(detail=True, methods=['get'])
     def share_link(self, request, pk=None):
@@ -296,8 +236,8 @@ class WishlistItemViewSet(viewsets.ModelViewSet):
         # 获取当前用户的所有心愿单
         user_wishlists = Wishlist.objects.filter(user=self.request.user)
         
-        # 返回这些心愿单中的所有物品
-        return WishlistItem.objects.filter(wishlist__in=user_wishlists)
+        # 返回这些心愿单中的所有物品，心愿单随物品一起查询（权限检查和公开缓存失效都会用到）
+        return WishlistItem.objects.filter(wishlist__in=user_wishlists).select_related('wishlist')
     
     def perform_create(self, serializer):
         """创建心愿单物品"""
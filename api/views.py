@@ -1,3 +1,20 @@
 from django.shortcuts import render
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .cache import get_cache_stats, reset_cache_stats
 
 # Create your views here.
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([permissions.IsAdminUser])
+def response_cache_stats(request):
+    """
+    查看响应缓存命中/未命中计数
+    DELETE请求重置计数
+    """
+    if request.method == 'DELETE':
+        reset_cache_stats()
+    return Response(get_cache_stats())
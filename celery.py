@@ -1,17 +0,0 @@
-import os
-from celery import Celery
-
-# 设置Django设置模块
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mall.settings')
-
-app = Celery('mall')
-
-# 使用CELERY_开头的键从Django设置加载配置
-app.config_from_object('django.conf:settings', namespace='CELERY')
-
-# 自动发现任务
-app.autodiscover_tasks()
-
-@app.task(bind=True)
-def debug_task(self):
-    print(f'Request: {self.request!r}') 
\ No newline at end of file
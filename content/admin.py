@@ -8,6 +8,7 @@ from .models import Banner, HomeBlock, PageContent, SiteSettings
 class BannerAdmin(admin.ModelAdmin):
     list_display = ['title', 'display_image', 'position', 'link', 'product', 'sort_order', 'is_active', 'created_at']
     list_filter = ['position', 'is_active']
+    list_select_related = ['product']
     search_fields = ['title', 'link']
     list_editable = ['sort_order', 'is_active']
     autocomplete_fields = ['product']
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:00
+
+from django.db import migrations
+
+VISIBLE_IN_TABLES = ['content_banner', 'content_homeblock', 'content_pagecontent']
+
+
+def create_gin_indexes(apps, schema_editor):
+    """PostgreSQL下为visible_in建立GIN索引，其他数据库跳过"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in VISIBLE_IN_TABLES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_visible_in_gin '
+            f'ON {table} USING GIN (visible_in jsonb_path_ops)'
+        )
+
+
+def drop_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in VISIBLE_IN_TABLES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_visible_in_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0003_alter_pagecontent_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_gin_indexes, drop_gin_indexes),
+    ]
@@ -2,6 +2,7 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from goods.visibility import filter_visible_in_site
 from .models import PageContent, SiteSettings
 from .serializers import PageContentSerializer, PageContentListSerializer, SiteSettingsSerializer
 
@@ -30,7 +31,7 @@ class PageContentViewSet(viewsets.ModelViewSet):
         # 按站点可见性过滤
         site = self.request.query_params.get('site')
         if site:
-            queryset = queryset.filter(visible_in__contains=[site])
+            queryset = filter_visible_in_site(queryset, site)
         
         return queryset.order_by('sort_order')
     
@@ -10,6 +10,7 @@ from .models import GoodsCategory, Goods, GoodsImage
 @admin.register(GoodsCategory)
 class GoodsCategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'parent', 'level', 'is_active', 'sort_order', 'created_at']
+    list_select_related = ['parent']
     list_filter = ['level', 'is_active']
     search_fields = ['name']
     list_editable = ['sort_order', 'is_active']
@@ -42,6 +43,7 @@ class GoodsAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'price', 'original_price', 'stock', 'sales', 
                    'display_image', 'status', 'is_recommended', 'is_hot', 'is_new', 'created_at']
     list_filter = ['category', 'status', 'is_recommended', 'is_hot', 'is_new']
+    list_select_related = ['category']
     
     # 自定义方法，用于过滤站点可见性
     def get_queryset(self, request):
@@ -57,14 +59,11 @@ class GoodsAdmin(admin.ModelAdmin):
             
         # 非超级用户只能看到对应站点可见的商品
         from mall.middleware.site_middleware import get_current_site
+        from .visibility import filter_visible_in_site
         current_site = get_current_site()
         
-        # JSONField查询：visible_in为空或包含当前站点
-        return queryset.filter(
-            models.Q(visible_in__contains=current_site) | 
-            models.Q(visible_in=[]) | 
-            models.Q(visible_in__isnull=True)
-        )
+        # 通过站点可见性关系表过滤：visible_in为空或包含当前站点
+        return filter_visible_in_site(queryset, current_site)
     search_fields = ['name', 'description', 'goods_desc']
     list_editable = ['price', 'stock', 'status', 'is_recommended', 'is_hot', 'is_new']
     readonly_fields = ['sales', 'created_at', 'updated_at']
@@ -5,3 +5,6 @@ class GoodsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'goods'
     verbose_name = '商品管理'
+
+    def ready(self):
+        import goods.signals  # 导入信号处理模块
@@ -0,0 +1,112 @@
+"""
+分类商品计数维护
+
+每个已发布且有库存的商品在 (分类, 站点) 上计1，visible_in为空的商品计入通配站点'*'。
+商品保存时比较保存前后的计数键集合，只对差异部分做 count = count ± 1，
+站点商品数 = 该站点行 + '*' 行之和，读取时不需要扫描Goods表。
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import CategoryProductCount, Goods, GoodsSiteVisibility
+
+# 影响分类计数的商品字段
+COUNTED_FIELDS = {'status', 'stock', 'category', 'category_id', 'visible_in'}
+
+
+def _keys(status, stock, category_id, visible_in):
+    if status != 'published' or not stock or category_id is None:
+        return set()
+    sites = {str(code) for code in (visible_in or []) if code} or {GoodsSiteVisibility.ALL_SITES}
+    return {(category_id, site_code) for site_code in sites}
+
+
+def count_keys_of(goods):
+    """商品实例当前状态对应的计数键"""
+    return _keys(goods.status, goods.stock, goods.category_id, goods.visible_in)
+
+
+def count_keys_for(goods_id):
+    """
+    数据库中商品当前状态对应的计数键，必须在商品保存的事务中调用
+    锁定商品行直到事务结束，同一商品的并发保存依次基于上一次保存的结果计算差异
+    """
+    row = (
+        Goods.objects.select_for_update().filter(pk=goods_id)
+        .values_list('status', 'stock', 'category_id', 'visible_in').first()
+    )
+    if row is None:
+        return set()
+    return _keys(*row)
+
+
+def _adjust(category_id, site_code, delta):
+    updated = CategoryProductCount.objects.filter(
+        category_id=category_id, site_code=site_code
+    ).update(count=F('count') + delta)
+    if updated or delta <= 0:
+        return
+    try:
+        with transaction.atomic():
+            CategoryProductCount.objects.create(category_id=category_id, site_code=site_code, count=delta)
+    except IntegrityError:
+        # 并发创建，改为累加
+        CategoryProductCount.objects.filter(
+            category_id=category_id, site_code=site_code
+        ).update(count=F('count') + delta)
+
+
+def apply_count_delta(old_keys, new_keys):
+    """按保存前后的计数键差异增减计数，必须在商品保存的同一事务中调用"""
+    for category_id, site_code in sorted(old_keys - new_keys):
+        _adjust(category_id, site_code, -1)
+    for category_id, site_code in sorted(new_keys - old_keys):
+        _adjust(category_id, site_code, 1)
+
+
+def site_count_subquery(site_code, outer_ref='pk'):
+    """某分类在指定站点下的已发布有库存商品数子查询"""
+    counts = CategoryProductCount.objects.filter(
+        category=OuterRef(outer_ref),
+        site_code__in=[site_code, GoodsSiteVisibility.ALL_SITES],
+    ).values('category').annotate(total=Sum('count')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def annotate_product_counts(queryset, site_code):
+    """为分类查询集标注site_product_count"""
+    return queryset.annotate(site_product_count=site_count_subquery(site_code))
+
+
+def site_counts(site_code):
+    """返回 {category_id: 数量}，用于一次性取出整棵分类树的计数"""
+    rows = CategoryProductCount.objects.filter(
+        site_code__in=[site_code, GoodsSiteVisibility.ALL_SITES], count__gt=0
+    ).values('category_id').annotate(total=Sum('count')).values_list('category_id', 'total')
+    return dict(rows)
+
+
+def rebuild_counts(batch_size=2000):
+    """根据Goods表全量重建分类计数，返回写入的行数"""
+    totals = {}
+    rows = (
+        Goods.objects.filter(status='published', stock__gt=0)
+        .values_list('status', 'stock', 'category_id', 'visible_in')
+        .order_by()
+        .iterator(chunk_size=batch_size)
+    )
+    for row in rows:
+        for key in _keys(*row):
+            totals[key] = totals.get(key, 0) + 1
+
+    with transaction.atomic():
+        CategoryProductCount.objects.all().delete()
+        CategoryProductCount.objects.bulk_create(
+            [
+                CategoryProductCount(category_id=category_id, site_code=site_code, count=count)
+                for (category_id, site_code), count in totals.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(totals)
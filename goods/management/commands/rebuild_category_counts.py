@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from goods.counters import rebuild_counts
+
+
+class Command(BaseCommand):
+    help = '根据商品表重建(分类, 站点)已发布有库存商品计数'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            dest='batch_size',
+            help='每批读取/写入的数量',
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild_counts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'分类计数重建完成，共写入 {rows} 条计数记录'))
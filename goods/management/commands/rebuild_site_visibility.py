@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from goods.models import Goods, GoodsSiteVisibility
+
+
+class Command(BaseCommand):
+    help = '根据Goods.visible_in重建商品站点可见性关系表（用于queryset.update等绕过save的批量修改之后）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            dest='batch_size',
+            help='每批处理的商品数量',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            deleted, _ = GoodsSiteVisibility.objects.all().delete()
+            self.stdout.write(f'已清除 {deleted} 条旧的站点可见性记录')
+
+            rows = []
+            created = 0
+            for goods_id, visible_in in Goods.objects.values_list('id', 'visible_in').iterator(chunk_size=batch_size):
+                codes = {str(code) for code in (visible_in or []) if code} or {GoodsSiteVisibility.ALL_SITES}
+                rows.extend(GoodsSiteVisibility(goods_id=goods_id, site_code=code) for code in codes)
+                if len(rows) >= batch_size:
+                    GoodsSiteVisibility.objects.bulk_create(rows)
+                    created += len(rows)
+                    rows = []
+            if rows:
+                GoodsSiteVisibility.objects.bulk_create(rows)
+                created += len(rows)
+
+        self.stdout.write(self.style.SUCCESS(f'站点可见性重建完成，共写入 {created} 条记录'))
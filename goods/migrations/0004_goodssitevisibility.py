@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_site_visibility(apps, schema_editor):
+    """根据现有visible_in回填站点可见性关系表"""
+    Goods = apps.get_model('goods', 'Goods')
+    GoodsSiteVisibility = apps.get_model('goods', 'GoodsSiteVisibility')
+
+    rows = []
+    for goods_id, visible_in in Goods.objects.values_list('id', 'visible_in').iterator(chunk_size=2000):
+        codes = {str(code) for code in (visible_in or []) if code} or {'*'}
+        rows.extend(GoodsSiteVisibility(goods_id=goods_id, site_code=code) for code in codes)
+        if len(rows) >= 2000:
+            GoodsSiteVisibility.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    if rows:
+        GoodsSiteVisibility.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0003_goods_visible_in'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoodsSiteVisibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site_code', models.CharField(max_length=50, verbose_name='站点代码')),
+                ('goods', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='site_visibility', to='goods.goods', verbose_name='商品')),
+            ],
+            options={
+                'verbose_name': '商品站点可见性',
+                'verbose_name_plural': '商品站点可见性',
+                'constraints': [models.UniqueConstraint(fields=('site_code', 'goods'), name='goods_site_visibility_unique')],
+            },
+        ),
+        migrations.RunPython(populate_site_visibility, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,141 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:00
+
+import html
+import re
+
+import django.db.models.deletion
+from django.db import DatabaseError, migrations, models, transaction
+from django.utils.html import strip_tags
+
+POSTGRES_FORWARD = [
+    # 标题权重A、正文权重B，由数据库自动维护，无需在ORM中声明
+    """
+    ALTER TABLE goods_goodssearchdocument ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX goods_search_vector_gin ON goods_goodssearchdocument USING GIN (search_vector)",
+]
+
+POSTGRES_TRIGRAM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # 中文等无分词的文本依赖三元组索引支持 ILIKE '%关键词%'
+    "CREATE INDEX goods_search_title_trgm ON goods_goodssearchdocument USING GIN (title gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS goods_search_title_trgm",
+    "DROP INDEX IF EXISTS goods_search_vector_gin",
+    "ALTER TABLE goods_goodssearchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE goods_search_fts USING fts5(
+        title, body,
+        content='goods_goodssearchdocument', content_rowid='goods_id',
+        tokenize='unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER goods_search_fts_ai AFTER INSERT ON goods_goodssearchdocument BEGIN
+        INSERT INTO goods_search_fts(rowid, title, body) VALUES (new.goods_id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER goods_search_fts_ad AFTER DELETE ON goods_goodssearchdocument BEGIN
+        INSERT INTO goods_search_fts(goods_search_fts, rowid, title, body) VALUES ('delete', old.goods_id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER goods_search_fts_au AFTER UPDATE ON goods_goodssearchdocument BEGIN
+        INSERT INTO goods_search_fts(goods_search_fts, rowid, title, body) VALUES ('delete', old.goods_id, old.title, old.body);
+        INSERT INTO goods_search_fts(rowid, title, body) VALUES (new.goods_id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS goods_search_fts_au",
+    "DROP TRIGGER IF EXISTS goods_search_fts_ad",
+    "DROP TRIGGER IF EXISTS goods_search_fts_ai",
+    "DROP TABLE IF EXISTS goods_search_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    """按数据库类型建立检索索引（PostgreSQL: tsvector+GIN/三元组，SQLite: FTS5），其他数据库使用LIKE回退"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRES_FORWARD:
+            schema_editor.execute(sql)
+        # pg_trgm需要扩展权限，缺失时只使用全文索引
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                for sql in POSTGRES_TRIGRAM:
+                    schema_editor.execute(sql)
+        except DatabaseError:
+            pass
+    elif vendor == 'sqlite':
+        # 部分SQLite编译版本不包含FTS5，此时使用LIKE回退
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                for sql in SQLITE_FORWARD:
+                    schema_editor.execute(sql)
+        except DatabaseError:
+            pass
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRES_BACKWARD:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        for sql in SQLITE_BACKWARD:
+            schema_editor.execute(sql)
+
+
+def populate_search_documents(apps, schema_editor):
+    """为现有商品回填检索文档（与goods.search.build_document一致），FTS5由触发器同步、tsvector为生成列"""
+    Goods = apps.get_model('goods', 'Goods')
+    GoodsSearchDocument = apps.get_model('goods', 'GoodsSearchDocument')
+
+    documents = []
+    queryset = Goods.objects.values_list('id', 'name', 'description', 'goods_desc').order_by()
+    for goods_id, name, description, goods_desc in queryset.iterator(chunk_size=1000):
+        body = ' '.join(filter(None, [description, strip_tags(goods_desc or '')]))
+        body = html.unescape(re.sub(r'\s+', ' ', body)).strip()
+        documents.append(GoodsSearchDocument(goods_id=goods_id, title=(name or '')[:200], body=body[:20000]))
+        if len(documents) >= 1000:
+            GoodsSearchDocument.objects.bulk_create(documents, ignore_conflicts=True)
+            documents = []
+    if documents:
+        GoodsSearchDocument.objects.bulk_create(documents, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0005_goods_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoodsSearchDocument',
+            fields=[
+                ('goods', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='goods.goods', verbose_name='商品')),
+                ('title', models.CharField(max_length=200, verbose_name='检索标题')),
+                ('body', models.TextField(blank=True, verbose_name='检索正文')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '商品检索文档',
+                'verbose_name_plural': '商品检索文档',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+def populate_category_paths(apps, schema_editor):
+    """按层级回填分类物化路径"""
+    GoodsCategory = apps.get_model('goods', 'GoodsCategory')
+
+    parents = {}
+    for category_id, parent_id in GoodsCategory.objects.values_list('id', 'parent_id'):
+        parents[category_id] = parent_id
+
+    paths = {}
+
+    def resolve(category_id):
+        if category_id in paths:
+            return paths[category_id]
+        chain = []
+        current = category_id
+        while current is not None and current not in paths and current not in chain:
+            chain.append(current)
+            current = parents.get(current)
+        prefix = paths.get(current, '/') if current is not None else '/'
+        for node in reversed(chain):
+            prefix = f'{prefix}{node}/'
+            paths[node] = prefix
+        return paths[category_id]
+
+    for category_id in parents:
+        resolve(category_id)
+
+    categories = list(GoodsCategory.objects.only('id'))
+    for category in categories:
+        category.path = paths[category.id]
+    GoodsCategory.objects.bulk_update(categories, ['path'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0006_goodssearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goodscategory',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='分类路径'),
+        ),
+        migrations.AddIndex(
+            model_name='goodscategory',
+            index=models.Index(fields=['path'], name='goodscategory_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(populate_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_category_counts(apps, schema_editor):
+    """根据现有已发布且有库存的商品回填分类计数"""
+    Goods = apps.get_model('goods', 'Goods')
+    CategoryProductCount = apps.get_model('goods', 'CategoryProductCount')
+
+    totals = {}
+    rows = Goods.objects.filter(status='published', stock__gt=0).values_list('category_id', 'visible_in')
+    for category_id, visible_in in rows.iterator(chunk_size=2000):
+        sites = {str(code) for code in (visible_in or []) if code} or {'*'}
+        for site_code in sites:
+            totals[(category_id, site_code)] = totals.get((category_id, site_code), 0) + 1
+
+    CategoryProductCount.objects.bulk_create(
+        [
+            CategoryProductCount(category_id=category_id, site_code=site_code, count=count)
+            for (category_id, site_code), count in totals.items()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goods', '0007_goodscategory_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryProductCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site_code', models.CharField(max_length=50, verbose_name='站点代码')),
+                ('count', models.IntegerField(default=0, verbose_name='商品数量')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_counts', to='goods.goodscategory', verbose_name='商品分类')),
+            ],
+            options={
+                'verbose_name': '分类商品计数',
+                'verbose_name_plural': '分类商品计数',
+                'constraints': [models.UniqueConstraint(fields=('category', 'site_code'), name='category_product_count_unique')],
+            },
+        ),
+        migrations.RunPython(populate_category_counts, migrations.RunPython.noop),
+    ]
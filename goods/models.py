@@ -1,4 +1,7 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
 from django.conf import settings
 
 # 导入站点中间件函数
@@ -15,15 +18,83 @@ class GoodsCategory(models.Model):
     sort_order = models.PositiveIntegerField(default=0, verbose_name='排序')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     description = models.TextField(blank=True, verbose_name='分类描述')
+    # 物化路径，形如 /1/5/12/，子树查询为 path LIKE '/1/5/%'
+    path = models.CharField(max_length=255, blank=True, default='', editable=False, verbose_name='分类路径')
 
     class Meta:
         verbose_name = '商品分类'
         verbose_name_plural = verbose_name
         ordering = ['sort_order']
+        indexes = [
+            models.Index(fields=['path'], name='goodscategory_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return self.name
 
+    def build_path(self):
+        """根据父分类路径计算当前分类的物化路径"""
+        if self.parent_id is None:
+            return f'/{self.pk}/'
+        parent_path = self.parent.path or self.parent.build_path()
+        return f'{parent_path}{self.pk}/'
+
+    def clean(self):
+        # 后台编辑时提前提示，不允许把分类挂到自身子树下
+        if self.pk and self.path and self.parent_id:
+            parent_path = GoodsCategory.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+            if parent_path.startswith(self.path):
+                raise ValidationError({'parent': '不能将分类移动到其自身或子分类之下'})
+
+    def get_ancestor_ids(self):
+        """从物化路径解析祖先分类ID（不含自身），无需查询数据库"""
+        return [int(part) for part in self.path.strip('/').split('/')[:-1] if part]
+
+    def get_descendants(self, include_self=True):
+        """当前分类的整棵子树，一次索引前缀查询"""
+        queryset = GoodsCategory.objects.filter(path__startswith=self.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            # 以数据库中的路径为准，避免实例加载后祖先被移动导致的旧路径
+            old_path = ''
+            if self.pk:
+                old_path = GoodsCategory.objects.filter(pk=self.pk).values_list('path', flat=True).first() or ''
+                if old_path and self.parent_id:
+                    parent_path = GoodsCategory.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+                    if parent_path.startswith(old_path):
+                        raise ValueError('不能将分类移动到其自身或子分类之下')
+
+            super().save(*args, **kwargs)
+
+            if update_fields is not None and 'parent' not in update_fields and old_path:
+                return
+
+            new_path = self.build_path()
+            if new_path != old_path:
+                GoodsCategory.objects.filter(pk=self.pk).update(path=new_path)
+                self.path = new_path
+                if old_path:
+                    # 整棵子树一次性替换路径前缀
+                    GoodsCategory.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                        path=Concat(Value(new_path), Substr('path', len(old_path) + 1))
+                    )
+
+
+class GoodsQuerySet(models.QuerySet):
+    """商品查询集"""
+
+    # 列表场景不需要的大字段（goods_desc为抓取的HTML，可达数十KB）
+    HEAVY_FIELDS = ('description', 'goods_desc', 'source_url')
+
+    def for_listing(self):
+        """列表模式：延迟加载大文本字段，减少数据库传输的数据量"""
+        return self.defer(*self.HEAVY_FIELDS)
+
 
 class Goods(models.Model):
     """商品"""
@@ -52,10 +123,16 @@ class Goods(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     visible_in = models.JSONField(default=list, blank=True, verbose_name='可见站点')
 
+    objects = GoodsQuerySet.as_manager()
+
     class Meta:
         verbose_name = '商品'
         verbose_name_plural = verbose_name
         ordering = ['-created_at']
+        indexes = [
+            # 键集分页: WHERE status=... ORDER BY created_at DESC, id DESC
+            models.Index(fields=['status', '-created_at', '-id'], name='goods_status_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -68,18 +145,120 @@ class Goods(models.Model):
             return True
         # 否则只在指定站点可见
         return current_site in self.visible_in
-        
+
+    def get_visible_site_codes(self):
+        """返回站点可见性关系表中应有的站点代码集合，空列表对应通配符"""
+        if not self.visible_in:
+            return {GoodsSiteVisibility.ALL_SITES}
+        return {str(code) for code in self.visible_in if code}
+
+    def sync_site_visibility(self):
+        """将visible_in同步到GoodsSiteVisibility关系表"""
+        wanted = self.get_visible_site_codes()
+        existing = set(self.site_visibility.values_list('site_code', flat=True))
+
+        stale = existing - wanted
+        if stale:
+            self.site_visibility.filter(site_code__in=stale).delete()
+
+        missing = wanted - existing
+        if missing:
+            GoodsSiteVisibility.objects.bulk_create(
+                [GoodsSiteVisibility(goods=self, site_code=code) for code in missing],
+                ignore_conflicts=True,
+            )
+
     def save(self, *args, **kwargs):
+        from .counters import COUNTED_FIELDS, count_keys_for, count_keys_of, apply_count_delta
+
         # 如果没有设置主图，但有商品图片，则将第一张图片设为主图
         is_new = self.pk is None
-        super().save(*args, **kwargs)
-        
-        if is_new or not self.image:
-            # 检查是否有商品图片
-            main_image = self.images.filter(is_main=True).first()
-            if main_image and not self.image:
-                self.image = main_image.image
-                super().save(update_fields=['image'])
+        update_fields = kwargs.get('update_fields')
+        counts_affected = update_fields is None or bool(COUNTED_FIELDS.intersection(update_fields))
+        # 商品、站点可见性和分类计数在同一事务中写入，on_commit回调（如缓存失效）在同步完成后才执行
+        with transaction.atomic():
+            # 锁定并读取保存前的计数状态，用于增量调整分类计数
+            old_keys = set()
+            if counts_affected and not is_new:
+                old_keys = count_keys_for(self.pk)
+
+            super().save(*args, **kwargs)
+
+            # 只有visible_in可能变化时才同步站点可见性
+            if update_fields is None or 'visible_in' in update_fields:
+                self.sync_site_visibility()
+
+            if counts_affected:
+                apply_count_delta(old_keys, count_keys_of(self))
+
+            if is_new or not self.image:
+                # 检查是否有商品图片
+                main_image = self.images.filter(is_main=True).first()
+                if main_image and not self.image:
+                    self.image = main_image.image
+                    super().save(update_fields=['image'])
+
+
+class GoodsSiteVisibility(models.Model):
+    """
+    商品站点可见性关系表
+    由Goods.visible_in反规范化而来，(site_code, goods)联合索引使站点过滤可以只走索引
+    visible_in为空的商品写入一行通配符ALL_SITES
+    """
+    ALL_SITES = '*'
+
+    goods = models.ForeignKey(Goods, on_delete=models.CASCADE, related_name='site_visibility', verbose_name='商品')
+    site_code = models.CharField(max_length=50, verbose_name='站点代码')
+
+    class Meta:
+        verbose_name = '商品站点可见性'
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(fields=['site_code', 'goods'], name='goods_site_visibility_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.goods_id} - {self.site_code}"
+
+
+class CategoryProductCount(models.Model):
+    """
+    分类商品计数
+    按(分类, 站点)统计已发布且有库存的商品数量，由Goods.save/删除增量维护，
+    可通过manage.py rebuild_category_counts重建；site_code为'*'的行表示所有站点可见的商品
+    """
+    category = models.ForeignKey(GoodsCategory, on_delete=models.CASCADE, related_name='product_counts', verbose_name='商品分类')
+    site_code = models.CharField(max_length=50, verbose_name='站点代码')
+    count = models.IntegerField(default=0, verbose_name='商品数量')
+
+    class Meta:
+        verbose_name = '分类商品计数'
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'site_code'], name='category_product_count_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id} - {self.site_code}: {self.count}"
+
+
+class GoodsSearchDocument(models.Model):
+    """
+    商品全文检索文档
+    由goods.search维护，保存去除HTML后的检索文本；
+    PostgreSQL下附带数据库生成的search_vector列(GIN索引)和标题三元组索引，SQLite下同步到FTS5虚拟表
+    """
+    goods = models.OneToOneField(Goods, on_delete=models.CASCADE, primary_key=True, related_name='search_document', verbose_name='商品')
+    title = models.CharField(max_length=200, verbose_name='检索标题')
+    body = models.TextField(blank=True, verbose_name='检索正文')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '商品检索文档'
+        verbose_name_plural = verbose_name
+
+    def __str__(self):
+        return self.title
 
 
 class GoodsImage(models.Model):
@@ -0,0 +1,283 @@
+"""
+商品全文检索
+
+检索文本保存在GoodsSearchDocument中，由商品保存信号增量维护，也可通过
+manage.py reindex_goods_search 批量重建。查询按数据库类型选择实现：
+- PostgreSQL: 数据库生成的search_vector(GIN)按ts_rank_cd排序，pg_trgm可用时叠加标题三元组相似度
+- SQLite: FTS5虚拟表按bm25排序，snippet生成高亮
+- 其他数据库: 检索文档表上的LIKE回退
+"""
+import html
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection, DatabaseError
+from django.db.models import Case, FloatField, Q, Value, When
+from django.utils.html import strip_tags
+
+from .models import Goods, GoodsSearchDocument
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_TABLE = 'goods_goodssearchdocument'
+SQLITE_FTS_TABLE = 'goods_search_fts'
+
+# 影响检索文档的商品字段
+INDEXED_FIELDS = {'name', 'description', 'goods_desc'}
+
+DEFAULT_SEARCH_SETTINGS = {
+    'MAX_RESULTS': 1000,  # 单次检索最多返回的候选数量
+    'MAX_TERMS': 8,  # 查询中最多使用的关键词数量
+    'BODY_MAX_LENGTH': 20000,  # 检索正文最大长度
+    'HIGHLIGHT_START': '<mark>',
+    'HIGHLIGHT_STOP': '</mark>',
+}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# 数据库生成片段时使用的占位标记：片段整体HTML转义后再替换为HIGHLIGHT_START/STOP，正文中的HTML不会原样输出
+_MARK_START, _MARK_STOP = '\x02', '\x03'
+
+# 各数据库连接上的检索能力探测结果 {alias: {...}}
+_capabilities = {}
+
+
+def get_search_settings():
+    config = dict(DEFAULT_SEARCH_SETTINGS)
+    config.update(getattr(settings, 'GOODS_SEARCH', {}))
+    return config
+
+
+def tokenize(query):
+    """提取查询关键词，只保留单词字符，可安全拼接到tsquery/FTS5表达式中"""
+    terms = _TOKEN_RE.findall((query or '').lower())
+    return terms[:get_search_settings()['MAX_TERMS']]
+
+
+def _get_capabilities():
+    """探测当前数据库的检索能力，每个进程每个连接别名只探测一次"""
+    alias = connection.alias
+    if alias in _capabilities:
+        return _capabilities[alias]
+
+    caps = {'backend': 'like', 'trigram': False}
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                caps['backend'] = 'postgresql'
+                cursor.execute(
+                    "SELECT 1 FROM pg_indexes WHERE indexname = 'goods_search_title_trgm'"
+                )
+                caps['trigram'] = cursor.fetchone() is not None
+            elif connection.vendor == 'sqlite':
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                    [SQLITE_FTS_TABLE]
+                )
+                if cursor.fetchone() is not None:
+                    caps['backend'] = 'sqlite'
+    except DatabaseError as e:
+        logger.error(f"探测商品检索能力失败: {str(e)}")
+    _capabilities[alias] = caps
+    return caps
+
+
+def build_document(goods):
+    """根据商品生成检索文档字段（去除HTML、合并空白）"""
+    body = ' '.join(filter(None, [goods.description, strip_tags(goods.goods_desc or '')]))
+    body = html.unescape(re.sub(r'\s+', ' ', body)).strip().replace(_MARK_START, '').replace(_MARK_STOP, '')
+    return {
+        'title': (goods.name or '')[:200],
+        'body': body[:get_search_settings()['BODY_MAX_LENGTH']],
+    }
+
+
+def index_goods(goods):
+    """增量索引单个商品"""
+    GoodsSearchDocument.objects.update_or_create(goods_id=goods.pk, defaults=build_document(goods))
+
+
+def bulk_index(queryset=None, batch_size=1000):
+    """批量(重)建检索文档，返回处理的商品数量"""
+    if queryset is None:
+        queryset = Goods.objects.all()
+    queryset = queryset.only('id', 'name', 'description', 'goods_desc').order_by()
+
+    total = 0
+    batch = []
+    for goods in queryset.iterator(chunk_size=batch_size):
+        batch.append(GoodsSearchDocument(goods_id=goods.pk, **build_document(goods)))
+        if len(batch) >= batch_size:
+            _write_batch(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        _write_batch(batch)
+        total += len(batch)
+    return total
+
+
+def _write_batch(documents):
+    GoodsSearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=['goods'],
+        update_fields=['title', 'body', 'updated_at'],
+    )
+
+
+def rebuild_backend_index():
+    """重建数据库侧索引结构（SQLite FTS5 rebuild/optimize），PostgreSQL生成列无需处理"""
+    if _get_capabilities()['backend'] == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('optimize')")
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _postgres_tsquery(terms):
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def _sqlite_match(terms):
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_ids(query, limit=None):
+    """
+    执行检索，返回按相关度降序排列的 [(goods_id, rank), ...]
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    limit = limit or get_search_settings()['MAX_RESULTS']
+    caps = _get_capabilities()
+
+    if caps['backend'] == 'postgresql':
+        if caps['trigram']:
+            sql = f"""
+                SELECT goods_id,
+                       ts_rank_cd(search_vector, q) + similarity(title, %s) AS rank
+                FROM {DOCUMENT_TABLE}, to_tsquery('simple', %s) q
+                WHERE search_vector @@ q OR title ILIKE %s
+                ORDER BY rank DESC
+                LIMIT %s
+            """
+            params = [query, _postgres_tsquery(terms), f'%{_escape_like(query.strip())}%', limit]
+        else:
+            sql = f"""
+                SELECT goods_id, ts_rank_cd(search_vector, q) AS rank
+                FROM {DOCUMENT_TABLE}, to_tsquery('simple', %s) q
+                WHERE search_vector @@ q
+                ORDER BY rank DESC
+                LIMIT %s
+            """
+            params = [_postgres_tsquery(terms), limit]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+    if caps['backend'] == 'sqlite':
+        # bm25越小越相关，标题列权重更高
+        sql = f"""
+            SELECT rowid, bm25({SQLITE_FTS_TABLE}, 10.0, 1.0) AS rank
+            FROM {SQLITE_FTS_TABLE}
+            WHERE {SQLITE_FTS_TABLE} MATCH %s
+            ORDER BY rank
+            LIMIT %s
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [_sqlite_match(terms), limit])
+            return [(row[0], -float(row[1])) for row in cursor.fetchall()]
+
+    # LIKE回退：所有关键词都需出现，标题命中排在前面
+    condition = Q()
+    title_hit = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(body__icontains=term)
+        title_hit &= Q(title__icontains=term)
+    rows = (
+        GoodsSearchDocument.objects.filter(condition)
+        .annotate(rank=Case(When(title_hit, then=Value(1.0)), default=Value(0.5), output_field=FloatField()))
+        .order_by('-rank', '-goods_id')
+        .values_list('goods_id', 'rank')[:limit]
+    )
+    return list(rows)
+
+
+def apply_search(queryset, query, limit=None):
+    """
+    把检索结果应用到商品查询集：只保留命中的商品，并标注search_rank供排序
+    其他过滤条件(状态、站点可见性等)在查询集上照常生效
+    """
+    hits = search_ids(query, limit)
+    if not hits:
+        return queryset.none()
+    return queryset.filter(id__in=[goods_id for goods_id, _ in hits]).annotate(
+        search_rank=Case(
+            *[When(id=goods_id, then=Value(rank)) for goods_id, rank in hits],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
+
+
+def get_highlights(query, goods_ids):
+    """只为当前页的商品生成高亮片段，返回 {goods_id: snippet}"""
+    terms = tokenize(query)
+    goods_ids = list(goods_ids)
+    if not terms or not goods_ids:
+        return {}
+
+    config = get_search_settings()
+    start, stop = config['HIGHLIGHT_START'], config['HIGHLIGHT_STOP']
+    caps = _get_capabilities()
+
+    if caps['backend'] == 'postgresql':
+        sql = f"""
+            SELECT goods_id, ts_headline('simple', body, to_tsquery('simple', %s), %s)
+            FROM {DOCUMENT_TABLE}
+            WHERE goods_id = ANY(%s)
+        """
+        options = f'StartSel={_MARK_START}, StopSel={_MARK_STOP}, MaxWords=35, MinWords=15, MaxFragments=1'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [_postgres_tsquery(terms), options, goods_ids])
+            return {goods_id: _render_snippet(snippet, start, stop) for goods_id, snippet in cursor.fetchall()}
+
+    if caps['backend'] == 'sqlite':
+        placeholders = ', '.join(['%s'] * len(goods_ids))
+        sql = f"""
+            SELECT rowid, snippet({SQLITE_FTS_TABLE}, 1, %s, %s, '…', 16)
+            FROM {SQLITE_FTS_TABLE}
+            WHERE {SQLITE_FTS_TABLE} MATCH %s AND rowid IN ({placeholders})
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [_MARK_START, _MARK_STOP, _sqlite_match(terms), *goods_ids])
+            return {goods_id: _render_snippet(snippet, start, stop) for goods_id, snippet in cursor.fetchall()}
+
+    highlights = {}
+    for goods_id, body in GoodsSearchDocument.objects.filter(goods_id__in=goods_ids).values_list('goods_id', 'body'):
+        highlights[goods_id] = _python_snippet(body, terms, start, stop)
+    return highlights
+
+
+def _render_snippet(snippet, start, stop):
+    """转义数据库生成的片段，只把占位标记还原为高亮标签"""
+    return html.escape(snippet or '').replace(_MARK_START, start).replace(_MARK_STOP, stop)
+
+
+def _python_snippet(body, terms, start, stop, width=80):
+    """LIKE回退下的简单高亮：截取首个命中附近的文本"""
+    lowered = body.lower()
+    positions = [lowered.find(term) for term in terms if lowered.find(term) >= 0]
+    if not positions:
+        return html.escape(body[:width * 2])
+    begin = max(min(positions) - width, 0)
+    snippet = html.escape(body[begin:begin + width * 2])
+    for term in terms:
+        snippet = re.sub(f'({re.escape(html.escape(term))})', f'{start}\\1{stop}', snippet, flags=re.IGNORECASE)
+    return ('…' if begin else '') + snippet
@@ -0,0 +1,33 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Goods
+from .counters import apply_count_delta, count_keys_of
+from .search import INDEXED_FIELDS, index_goods
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Goods)
+def update_goods_search_document(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """商品保存后增量更新检索文档，只在检索相关字段可能变化时执行"""
+    if raw:
+        return
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    try:
+        # 在商品保存的事务中执行，使用保存点：失败只回滚检索文档，事务可以继续写入站点可见性和分类计数
+        with transaction.atomic():
+            index_goods(instance)
+    except Exception as e:
+        # 检索文档可通过reindex_goods_search命令补建，不影响商品保存
+        logger.error(f"更新商品检索文档失败: 商品 {instance.pk}, {str(e)}")
+
+
+@receiver(post_delete, sender=Goods)
+def decrement_category_counts(sender, instance, **kwargs):
+    """商品删除后扣减分类计数（分类被级联删除时计数行已随之删除，扣减不会产生新行）"""
+    apply_count_delta(count_keys_of(instance), set())
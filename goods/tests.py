@@ -1,3 +1,85 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+
+from .models import CategoryProductCount, Goods, GoodsCategory
+from .search import get_highlights
+
+
+class GoodsSaveTests(TestCase):
+    """商品保存：检索文档、站点可见性和分类计数在同一事务中维护"""
+
+    def setUp(self):
+        self.category = GoodsCategory.objects.create(name='分类', level=1)
+
+    def create_goods(self, **fields):
+        return Goods.objects.create(
+            name='商品', category=self.category, price=Decimal('10.00'), stock=5, status='published', **fields
+        )
+
+    def test_index_failure_does_not_abort_save(self):
+        def broken_index(goods):
+            # 数据库错误会使PostgreSQL事务进入aborted状态
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1 / 0')
+
+        with mock.patch('goods.signals.index_goods', side_effect=broken_index):
+            goods = self.create_goods(visible_in=['site2'])
+
+        self.assertTrue(Goods.objects.filter(pk=goods.pk).exists())
+        self.assertEqual(list(goods.site_visibility.values_list('site_code', flat=True)), ['site2'])
+        self.assertEqual(CategoryProductCount.objects.get(category=self.category, site_code='site2').count, 1)
+
+
+class GoodsSearchHighlightTests(TestCase):
+    """高亮片段中只有高亮标签是HTML，商品正文中的标签被转义"""
+
+    def test_highlight_escapes_document_body(self):
+        category = GoodsCategory.objects.create(name='分类', level=1)
+        goods = Goods.objects.create(
+            name='Harness', category=category, price=Decimal('10.00'), stock=5, status='published',
+            description='leather <script>alert(1)</script> <img src=x onerror=alert(1)> harness',
+        )
+
+        snippet = get_highlights('leather', [goods.id])[goods.id]
+        self.assertNotIn('<script', snippet)
+        self.assertNotIn('<img', snippet)
+        self.assertIn('&lt;img', snippet)
+        self.assertIn('<mark>leather</mark>', snippet)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentGoodsSaveTests(TransactionTestCase):
+    """同一商品的并发保存依次计算分类计数差异，计数不会漂移"""
+
+    def test_concurrent_saves_do_not_double_count(self):
+        category = GoodsCategory.objects.create(name='分类', level=1)
+        goods = Goods.objects.create(
+            name='商品', category=category, price=Decimal('10.00'), stock=5, status='published'
+        )
+        counter = CategoryProductCount.objects.filter(category=category, site_code='*')
+        self.assertEqual(counter.get().count, 1)
+
+        first = Goods.objects.get(pk=goods.pk)
+        second = Goods.objects.get(pk=goods.pk)
+        first.status = second.status = 'draft'
+
+        def save_second():
+            try:
+                second.save()
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            first.save()
+            # 第一个事务提交前，第二次保存必须等待商品行锁
+            thread = threading.Thread(target=save_second)
+            thread.start()
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+        thread.join(10)
+
+        self.assertEqual(counter.get().count, 0)
@@ -14,9 +14,9 @@ def product_list(request, category_slug=None):
     if category_slug:
         try:
             category = GoodsCategory.objects.get(name__iexact=category_slug)
-            products = Goods.objects.filter(category=category, status='published')
+            products = Goods.objects.for_listing().filter(category=category, status='published')
         except GoodsCategory.DoesNotExist:
-            products = Goods.objects.filter(status='published')
+            products = Goods.objects.for_listing().filter(status='published')
     # 处理GET参数的情况 - 从查询字符串获取分类
     else:
         category_param = request.GET.get('category', None)
@@ -25,18 +25,18 @@ def product_list(request, category_slug=None):
             try:
                 category_id = int(category_param)
                 category = GoodsCategory.objects.get(id=category_id)
-                products = Goods.objects.filter(category=category, status='published')
+                products = Goods.objects.for_listing().filter(category=category, status='published')
             except (ValueError, GoodsCategory.DoesNotExist):
                 # 如果不是ID，尝试通过名称查找
                 try:
                     category = GoodsCategory.objects.get(name__iexact=category_param)
-                    products = Goods.objects.filter(category=category, status='published')
+                    products = Goods.objects.for_listing().filter(category=category, status='published')
                 except GoodsCategory.DoesNotExist:
                     # 如果也找不到，返回所有商品
-                    products = Goods.objects.filter(status='published')
+                    products = Goods.objects.for_listing().filter(status='published')
         else:
             # 没有分类参数，返回所有商品
-            products = Goods.objects.filter(status='published')
+            products = Goods.objects.for_listing().filter(status='published')
     
     # 处理价格筛选
     min_price = request.GET.get('min_price')
@@ -84,7 +84,7 @@ def product_detail(request, product_id):
     product_images = product.images.all()
     
     # 获取相关商品（同类别的其他商品）
-    related_products = Goods.objects.filter(
+    related_products = Goods.objects.for_listing().filter(
         category=product.category, 
         status='published'
     ).exclude(pk=product.pk)[:4]
@@ -101,7 +101,7 @@ def product_detail(request, product_id):
 def home(request):
     """首页 - 使用新的模板"""
     # 获取推荐商品
-    featured_products = Goods.objects.filter(is_recommended=True, status='published')[:8]
+    featured_products = Goods.objects.for_listing().filter(is_recommended=True, status='published')[:8]
     
     # 获取所有活跃分类
     categories = GoodsCategory.objects.filter(is_active=True, parent__isnull=True)
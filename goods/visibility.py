@@ -0,0 +1,36 @@
+"""
+站点可见性过滤
+所有基于visible_in的站点过滤都应通过这里完成，避免在视图中直接对JSONField做contains查询
+"""
+import json
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Goods, GoodsSiteVisibility
+
+
+def visible_in_site_q(site_code, field='visible_in'):
+    """
+    生成JSONField可见性条件: visible_in为空或包含site_code
+    PostgreSQL使用jsonb @> (可命中GIN索引)，其他数据库退化为JSON文本匹配
+    """
+    empty = Q(**{f'{field}__isnull': True}) | Q(**{field: []})
+    if connection.vendor == 'postgresql':
+        return empty | Q(**{f'{field}__contains': [site_code]})
+    # SQLite等后端不支持JSON contains，按序列化后的字符串匹配
+    return empty | Q(**{f'{field}__icontains': json.dumps(site_code)})
+
+
+def filter_visible_in_site(queryset, site_code):
+    """
+    按站点过滤查询集
+    商品走GoodsSiteVisibility关系表，其他带visible_in字段的模型（Banner、HomeBlock、PageContent）走JSON条件
+    """
+    if not site_code:
+        return queryset
+    if queryset.model is Goods:
+        return queryset.filter(
+            site_visibility__site_code__in=[site_code, GoodsSiteVisibility.ALL_SITES]
+        )
+    return queryset.filter(visible_in_site_q(site_code))
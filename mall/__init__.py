@@ -0,0 +1,4 @@
+# 确保Django启动时加载Celery应用，@shared_task 使用本应用，任务发布/执行的信号处理（如站点消息头）在所有进程中生效
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
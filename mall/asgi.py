@@ -12,15 +12,24 @@ import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
-import telegram_bot.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mall.settings')
 
+# 先初始化Django应用，再导入依赖模型的路由和中间件
+django_asgi_app = get_asgi_application()
+
+import payment.routing  # noqa: E402
+import telegram_bot.routing  # noqa: E402
+from mall.middleware.site_middleware import SiteASGIMiddleware  # noqa: E402
+
 application = ProtocolTypeRouter({
-    'http': get_asgi_application(),
-    'websocket': AuthMiddlewareStack(
-        URLRouter(
-            telegram_bot.routing.websocket_urlpatterns
+    'http': django_asgi_app,
+    # WebSocket连接期间设置当前站点(ContextVar)，HTTP请求由SiteMiddleware处理
+    'websocket': SiteASGIMiddleware(
+        AuthMiddlewareStack(
+            URLRouter(
+                telegram_bot.routing.websocket_urlpatterns + payment.routing.websocket_urlpatterns
+            )
         )
     ),
 })
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import before_task_publish, task_prerun, task_postrun
 
 # 设置Django设置模块
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mall.settings')
@@ -14,4 +15,32 @@ app.autodiscover_tasks()
 
 @app.task(bind=True)
 def debug_task(self):
-    print(f'Request: {self.request!r}') 
\ No newline at end of file
+    print(f'Request: {self.request!r}') 
+
+
+# 当前站点随任务传递：发布时写入消息头，执行时在worker中恢复，执行完还原
+# mall/__init__.py 在Django启动时加载本模块，Web进程和worker都会注册这些信号处理；也可在任务内使用 mall.site_context.site_context 显式指定
+_site_tokens = {}
+
+
+@before_task_publish.connect
+def attach_site_header(headers=None, **kwargs):
+    from mall.site_context import SITE_HEADER, get_current_site
+    if headers is not None and SITE_HEADER not in headers:
+        headers[SITE_HEADER] = get_current_site()
+
+
+@task_prerun.connect
+def enter_task_site(task_id=None, task=None, **kwargs):
+    from mall.site_context import SITE_HEADER, set_current_site
+    site_code = task.request.get(SITE_HEADER) if task is not None else None
+    if site_code:
+        _site_tokens[task_id] = set_current_site(site_code)
+
+
+@task_postrun.connect
+def exit_task_site(task_id=None, **kwargs):
+    from mall.site_context import reset_current_site
+    token = _site_tokens.pop(task_id, None)
+    if token is not None:
+        reset_current_site(token)
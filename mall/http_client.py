@@ -0,0 +1,315 @@
+"""
+对外HTTP请求客户端
+
+调用支付渠道、Telegram、Alokai等外部服务时统一使用此模块，不要直接调用 requests.get/post：
+- 每个服务一个HttpClient，进程内复用同一个Session，按域名保持长连接池，避免每次请求重新握手
+- 所有请求都有连接超时和读取超时，外部服务变慢时不会无限期占用worker
+- 连接失败、超时以及429/502/503/504响应按指数退避加随机抖动重试；非幂等请求(POST等)
+  只在连接尚未建立时重试，避免重复创建支付单
+- 熔断器：连续失败达到阈值后在冷却时间内直接抛出CircuitOpenError，冷却结束后放行一个探测请求
+- 记录每个服务的请求数、失败数和耗时分布，可通过 client_stats() 查看
+- 日志和错误信息中的URL只保留主机和路径，并隐藏路径中的令牌(如Telegram的 /bot<token>/)和查询参数；
+  requests抛出的异常信息中同样带有URL，调用方记录或保存异常信息时应先经过 redact()
+
+用法:
+    from mall.http_client import get_client
+
+    client = get_client('coinbase', base_url='https://api.commerce.coinbase.com')
+    response = client.post('/charges', json=data, headers=headers)
+
+配置（settings.HTTP_CLIENT，SERVICES中可按服务覆盖任意一项）:
+    HTTP_CLIENT = {
+        'READ_TIMEOUT': 10,
+        'SERVICES': {'telegram': {'READ_TIMEOUT': 20}},
+    }
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HTTP_CLIENT_SETTINGS = {
+    'CONNECT_TIMEOUT': 3.05,  # 建立连接的超时(秒)
+    'READ_TIMEOUT': 10,  # 等待响应数据的超时(秒)
+    'RETRIES': 2,  # 失败后的最大重试次数
+    'BACKOFF': 0.3,  # 第n次重试前最多等待 BACKOFF * 2^(n-1) 秒（随机抖动）
+    'BACKOFF_MAX': 5,  # 单次重试等待时间上限(秒)
+    'RETRY_STATUSES': (429, 502, 503, 504),  # 需要重试的响应状态码
+    'POOL_CONNECTIONS': 10,  # 缓存连接池的域名数量
+    'POOL_MAXSIZE': 20,  # 每个域名保持的最大连接数
+    'BREAKER_FAILURES': 5,  # 连续失败多少次后熔断
+    'BREAKER_RESET': 30,  # 熔断后多少秒放行探测请求
+    'LATENCY_SAMPLES': 500,  # 用于计算耗时分位数的最近请求数量
+    'SERVICES': {},  # 按服务名覆盖以上配置
+}
+
+# 幂等方法，任何可重试的失败都可以重试
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+# 日志中需要隐藏的凭据：Telegram Bot API路径中的令牌，查询参数中的API密钥
+SECRET_PATTERNS = (
+    (re.compile(r'/bot[^/\s]+'), '/bot***'),
+    (re.compile(r'\?[^\s\'"]+'), '?***'),
+)
+
+
+def redact(text):
+    """隐藏文本（URL或带有URL的异常信息）中的凭据"""
+    for pattern, replacement in SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def loggable_url(url):
+    """日志中使用的请求地址：只保留主机和路径，并隐藏其中的凭据"""
+    parts = urlsplit(url)
+    return redact(f"{parts.netloc}{parts.path}")
+
+
+def get_http_client_settings(service=None):
+    """读取HTTP_CLIENT配置并合并服务级覆盖，未配置的项使用默认值"""
+    config = dict(DEFAULT_HTTP_CLIENT_SETTINGS)
+    config.update(getattr(settings, 'HTTP_CLIENT', {}))
+    if service:
+        config.update(config['SERVICES'].get(service, {}))
+    return config
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """服务处于熔断状态，请求未发出"""
+
+
+class CircuitBreaker:
+    """
+    连续失败计数熔断器（线程安全）
+    closed: 正常放行；open: 冷却期内拒绝请求；half_open: 冷却结束后只放行一个探测请求
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """是否放行本次请求"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                # 探测失败时重新开始冷却
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class LatencyStats:
+    """请求计数和耗时统计（线程安全），耗时分位数基于最近的samples个请求"""
+
+    def __init__(self, samples):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=samples)
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0  # 熔断拒绝的请求数
+
+    def record(self, elapsed, ok):
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.failures += 1
+            self._samples.append(elapsed)
+
+    def incr(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            data = {
+                'requests': self.requests,
+                'failures': self.failures,
+                'retries': self.retries,
+                'rejected': self.rejected,
+            }
+        if samples:
+            data.update({
+                'p50_ms': round(samples[len(samples) // 2] * 1000, 1),
+                'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1),
+                'max_ms': round(samples[-1] * 1000, 1),
+            })
+        return data
+
+
+def _connection_not_established(exc):
+    """请求是否在建立连接阶段失败（服务端未收到请求，非幂等请求也可以安全重试）"""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.ConnectionError) and exc.args:
+        reason = getattr(exc.args[0], 'reason', exc.args[0])
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+class HttpClient:
+    """
+    单个外部服务的HTTP客户端
+    base_url为空时请求需要传完整URL；传入以 http:// 或 https:// 开头的完整URL时忽略base_url
+    """
+
+    def __init__(self, name, base_url='', **overrides):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.config = get_http_client_settings(name)
+        self.config.update(overrides)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.config['POOL_CONNECTIONS'],
+            pool_maxsize=self.config['POOL_MAXSIZE'],
+            max_retries=0,
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.breaker = CircuitBreaker(self.config['BREAKER_FAILURES'], self.config['BREAKER_RESET'])
+        self.stats = LatencyStats(self.config['LATENCY_SAMPLES'])
+
+    def _url(self, path):
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _backoff(self, attempt):
+        limit = min(self.config['BACKOFF_MAX'], self.config['BACKOFF'] * (2 ** (attempt - 1)))
+        return random.uniform(0, limit)
+
+    def request(self, method, path, retry=None, **kwargs):
+        """
+        发送请求，返回requests.Response（4xx/5xx也会返回，由调用方判断）
+        retry: 是否允许重试已发出的请求，默认只有幂等方法允许；连接阶段的失败总是可以重试
+        熔断时抛出CircuitOpenError，重试用尽后抛出最后一次的requests异常
+        """
+        method = method.upper()
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        kwargs.setdefault('timeout', (self.config['CONNECT_TIMEOUT'], self.config['READ_TIMEOUT']))
+        url = self._url(path)
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.stats.incr('rejected')
+                raise CircuitOpenError(f"{self.name} 服务熔断中，请求未发出: {method} {loggable_url(url)}")
+
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                self.stats.record(time.monotonic() - started, ok=False)
+                self.breaker.record_failure()
+                can_retry = retry or _connection_not_established(e)
+                if not can_retry or attempt >= self.config['RETRIES']:
+                    logger.error(f"{self.name} 请求失败: {method} {loggable_url(url)} {redact(str(e))}")
+                    raise
+                error = redact(str(e))
+            else:
+                elapsed = time.monotonic() - started
+                server_error = response.status_code >= 500
+                self.stats.record(elapsed, ok=not server_error)
+                if server_error:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if (not retry or response.status_code not in self.config['RETRY_STATUSES']
+                        or attempt >= self.config['RETRIES']):
+                    return response
+                response.close()
+                error = f"HTTP {response.status_code}"
+
+            attempt += 1
+            self.stats.incr('retries')
+            delay = self._backoff(attempt)
+            logger.warning(
+                f"{self.name} 请求失败({error})，{delay:.2f}秒后第{attempt}次重试: {method} {loggable_url(url)}"
+            )
+            time.sleep(delay)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name, base_url='', **overrides):
+    """获取进程内共享的服务客户端，第一次调用时创建"""
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = HttpClient(name, base_url, **overrides)
+                _clients[name] = client
+    return client
+
+
+def client_stats():
+    """返回全部服务客户端的统计数据 {服务名: {...}}"""
+    return {
+        name: {**client.stats.snapshot(), 'circuit': client.breaker.state}
+        for name, client in list(_clients.items())
+    }
+
+
+def reset_clients():
+    """关闭并丢弃全部客户端（测试或修改配置后使用）"""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
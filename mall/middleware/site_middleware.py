@@ -1,55 +1,72 @@
-from django.utils.deprecation import MiddlewareMixin
-from django.conf import settings
-import threading
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 
-# 全局线程本地存储，用于在请求处理过程中存储当前站点信息
-_thread_local = threading.local()
+# get_current_site保留从本模块导入的方式（goods.models、goods.admin等在使用）
+from mall.site_context import get_current_site, set_current_site, reset_current_site
+from sites.registry import site_registry
 
-class SiteMiddleware(MiddlewareMixin):
+
+def _attach_site(request, current_site, site):
+    """将当前站点添加到请求对象，方便在视图中使用"""
+    # site_code供API视图读取，site为注册表中的站点对象（含theme、config，站点未配置时为None）
+    request.current_site = current_site
+    request.site_code = current_site
+    request.site = site
+
+
+class SiteMiddleware:
     """
     中间件用于检测当前请求所属的站点
-    基于请求的域名或者其他信息来判断当前站点
+    基于请求的域名通过站点注册表判断当前站点（注册表缓存在进程内，不访问数据库）
+    同时支持同步(WSGI)和异步(ASGI)请求，当前站点保存在ContextVar中，响应返回后还原
     """
-    
-    def process_request(self, request):
-        """
-        处理每个请求，确定当前站点并存储到线程本地变量
-        """
-        # 默认站点为 'default'
-        current_site = 'default'
-        
-        # 通过域名判断当前站点
-        host = request.get_host()
-        
-        # 示例站点映射，可以根据需要进行配置
-        # 也可以将此配置移动到 settings.py 中
-        site_mapping = getattr(settings, 'SITE_MAPPING', {
-            'us.example.com': 'us',
-            'asia.example.com': 'asia',
-            'localhost:8000': 'default',  # 本地开发环境
-            '127.0.0.1:8000': 'default',  # 本地开发环境
-        })
-        
-        # 根据域名确定站点
-        if host in site_mapping:
-            current_site = site_mapping[host]
-        else:
-            # 可以添加更多的判断逻辑，例如基于请求路径、用户地理位置等
-            # 这里使用默认站点
-            pass
-        
-        # 将当前站点存储到线程本地变量
-        _thread_local.current_site = current_site
-        
-        # 将当前站点添加到请求对象，方便在视图中使用
-        request.current_site = current_site
-        
-        # 中间件不需要返回任何响应，继续处理请求
-
-
-def get_current_site():
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        current_site, site = site_registry.resolve(request.get_host())
+        _attach_site(request, current_site, site)
+        token = set_current_site(current_site)
+        try:
+            return self.get_response(request)
+        finally:
+            reset_current_site(token)
+
+    async def __acall__(self, request):
+        current_site, site = await site_registry.aresolve(request.get_host())
+        _attach_site(request, current_site, site)
+        token = set_current_site(current_site)
+        try:
+            return await self.get_response(request)
+        finally:
+            reset_current_site(token)
+
+
+class SiteASGIMiddleware:
     """
-    获取当前请求的站点
-    可以在模型、视图、模板等地方使用
+    Channels(WebSocket)连接的站点中间件
+    根据握手请求的Host头解析站点，写入scope['site_code']，并在整个连接期间设置当前站点
     """
-    return getattr(_thread_local, 'current_site', 'default')
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        headers = dict(scope.get('headers', []))
+        host = headers.get(b'host', b'').decode('latin1')
+        current_site, site = await site_registry.aresolve(host)
+        scope = dict(scope, site_code=current_site, site=site)
+
+        token = set_current_site(current_site)
+        try:
+            return await self.inner(scope, receive, send)
+        finally:
+            reset_current_site(token)
@@ -94,6 +94,7 @@ INSTALLED_APPS = [
     'wishlist_new',
     'users',
     'tg_bot',
+    'telegram_bot',  # 心愿单Telegram通知（绑定、批量发送、通知事件发件箱）
     'channels',
     'payment',
     'order',
@@ -222,6 +223,28 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # USDT支付链上确认（见 payment/usdt.py）
+    'confirm-usdt-payments': {
+        'task': 'payment.tasks.confirm_usdt_payments',
+        'schedule': 15.0,
+    },
+    # 心愿单浏览计数写库（见 wishlist_new/view_counter.py）
+    'flush-wishlist-views': {
+        'task': 'wishlist_new.tasks.flush_wishlist_views',
+        'schedule': 60.0,
+    },
+    # Telegram通知批量发送（见 telegram_bot/dispatcher.py）
+    'dispatch-telegram-notifications': {
+        'task': 'telegram_bot.tasks.dispatch_telegram_notifications',
+        'schedule': 5.0,
+    },
+    # 通知事件发件箱转发兜底（事务提交后已触发一次，见 telegram_bot/outbox.py）
+    'relay-notification-outbox': {
+        'task': 'telegram_bot.tasks.relay_notification_outbox',
+        'schedule': 10.0,
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -370,6 +393,11 @@ SITE_NAMES = {
     'alokai': 'Alokai商城',
 }
 
+# 站点注册表配置（进程内缓存站点、主题和配置，见 sites/registry.py）
+SITE_REGISTRY = {
+    'TTL': 60,  # 缓存有效期(秒)，站点在后台修改后当前进程立即刷新，其他进程最迟TTL秒后刷新
+}
+
 # Channels配置
 ASGI_APPLICATION = 'mall.asgi.application'
 CHANNEL_LAYERS = {
@@ -383,6 +411,22 @@ CHANNEL_LAYERS = {
     },
 }
 
+# 缓存配置
+# 响应缓存失效代数、心愿单浏览缓冲和各类任务锁需要在Web进程与Celery worker之间共享，默认使用Redis；
+# 本地内存缓存只在当前进程内可见，仅用于DEBUG开发环境，manage.py check --deploy 会对其报错(api.E001)
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/1')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+    },
+}
+if DEBUG:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mall-default',
+    }
+
 # 用户登录相关设置
 LOGIN_URL = '/users/login/'
 LOGIN_REDIRECT_URL = '/'
@@ -440,6 +484,44 @@ API_RESPONSE_FORMAT = {
     'SUCCESS_MESSAGE': 'success',
 }
 
+# 公共目录接口响应缓存配置
+API_RESPONSE_CACHE = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,  # 秒，模型变更会通过代数立即失效，此处只是兜底过期时间
+    'KEY_PREFIX': 'api:resp',
+}
+
+# 接口字段投影配置（?fields=a,b,c）
+API_FIELD_PROJECTION = {
+    'ENABLED': True,
+    'QUERY_PARAM': 'fields',
+    'MAX_FIELDS': 50,
+}
+
+# 商品全文检索配置
+GOODS_SEARCH = {
+    'MAX_RESULTS': 1000,  # 单次检索最多返回的候选数量
+    'HIGHLIGHT_START': '<mark>',
+    'HIGHLIGHT_STOP': '</mark>',
+}
+
+# 订单号分配配置（见 order/numbering.py）
+ORDER_NUMBER = {
+    'BLOCK_SIZE': 50,  # 每个进程每次从数据库预留的序号数量
+}
+
+# 订单批量流转配置（见 order/transitions.py）
+ORDER_TRANSITIONS = {
+    'BATCH_SIZE': 500,  # 每批处理的订单数量，每批一个事务
+}
+
+# 对账数据导出配置（见 order/exports.py）
+ORDER_EXPORT = {
+    'CHUNK_SIZE': 2000,  # 每次从数据库游标读取的行数
+    'FLUSH_ROWS': 500,  # 每写出多少行向客户端输出一次
+}
+
 # 本地API配置 (之前的Alokai平台配置)
 LOCAL_API_CONFIG = {
     'API_URL': 'http://localhost:8000/api/v1',
@@ -451,12 +533,69 @@ LOCAL_API_CONFIG = {
 # Payment Configuration
 PAYPAL_CLIENT_ID = os.environ.get('PAYPAL_CLIENT_ID', '')
 PAYPAL_CLIENT_SECRET = os.environ.get('PAYPAL_CLIENT_SECRET', '')
+# 校验webhook签名使用的webhook ID，未配置时拒绝全部PayPal webhook
+PAYPAL_WEBHOOK_ID = os.environ.get('PAYPAL_WEBHOOK_ID', '')
 PAYPAL_SANDBOX_URL = 'https://www.sandbox.paypal.com'
 PAYPAL_LIVE_URL = 'https://www.paypal.com'
 
 COINBASE_COMMERCE_API_KEY = os.environ.get('COINBASE_COMMERCE_API_KEY', '')
+# webhook共享密钥，也可在后台支付方式配置中设置；两处都未配置时拒绝全部Coinbase webhook
+COINBASE_COMMERCE_WEBHOOK_SECRET = os.environ.get('COINBASE_COMMERCE_WEBHOOK_SECRET', '')
 COINBASE_COMMERCE_URL = 'https://commerce.coinbase.com'
 
+# 支付处理器注册表配置（进程内缓存启用的支付方式和处理器，见 payment/registry.py）
+PAYMENT_PROCESSOR_REGISTRY = {
+    'TTL': 60,  # 缓存有效期(秒)，支付方式在后台修改后当前进程立即刷新，其他进程最迟TTL秒后刷新
+}
+
+# USDT支付确认配置（Celery beat定时批量查询链上确认数，见 payment/usdt.py）
+USDT_CONFIRMATION = {
+    'CHAIN_CLIENT': 'payment.usdt.TronGridChainClient',  # 本地开发可使用 payment.usdt.FakeChainClient
+    'BATCH_SIZE': 100,
+    'TRONGRID_API_KEY': os.environ.get('TRONGRID_API_KEY', ''),
+}
+
+# 支付Webhook配置（接收后由Celery异步处理，见 payment/webhooks.py）
+PAYMENT_WEBHOOKS = {
+    'MAX_ATTEMPTS': 5,  # replay_webhooks默认跳过处理次数达到上限的事件
+}
+
+# 心愿单浏览计数配置（先写缓存，由Celery beat定时批量写库，见 wishlist_new/view_counter.py）
+WISHLIST_VIEW_COUNTER = {
+    'BUCKET_SECONDS': 1800,  # 同一访客30分钟内重复浏览只计一次
+    'BATCH_SIZE': 500,
+}
+
+# 公开心愿单缓存配置（按分享码缓存，物品变更时失效，见 wishlist_new/public_cache.py）
+WISHLIST_PUBLIC_CACHE = {
+    'TIMEOUT': 300,
+}
+
+# Telegram通知批量发送配置（全局和按聊天令牌桶限流，见 telegram_bot/dispatcher.py）
+TELEGRAM_DISPATCHER = {
+    'GLOBAL_RATE': 30,  # Bot API全局约30条/秒
+    'CHAT_RATE': 1,  # 同一聊天约1条/秒
+    'CONCURRENCY': 8,
+}
+
+# 通知事件发件箱配置（信号只写入事件，由后台任务批量转发，见 telegram_bot/outbox.py）
+TELEGRAM_OUTBOX = {
+    'BATCH_SIZE': 200,
+    'RETENTION_DAYS': 7,
+}
+
+# 对外HTTP请求配置（支付渠道、Telegram、Alokai共用，见 mall/http_client.py）
+HTTP_CLIENT = {
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'RETRIES': 2,
+    'BREAKER_FAILURES': 5,  # 连续失败5次后熔断
+    'BREAKER_RESET': 30,  # 熔断30秒后放行探测请求
+    'SERVICES': {
+        'alokai': {'READ_TIMEOUT': 5, 'RETRIES': 1},
+    },
+}
+
 # Frontend URL for redirects
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
 
@@ -0,0 +1,51 @@
+"""
+当前站点上下文
+
+当前站点保存在contextvars.ContextVar中，线程和协程各自独立：
+- WSGI/ASGI请求: mall.middleware.site_middleware.SiteMiddleware 在请求期间设置，响应后还原
+- Channels连接: mall.middleware.site_middleware.SiteASGIMiddleware 在连接期间设置
+- Celery任务: 发布任务时把当前站点写入消息头，执行任务前恢复（见 mall/celery.py），
+  也可以用 site_context 显式指定
+
+用法:
+    with site_context('us'):
+        goods.is_visible_in_current_site()
+
+    @site_context('us')
+    def rebuild():
+        ...
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sites.registry import DEFAULT_SITE_CODE
+
+# 任务消息头中保存站点代码的键
+SITE_HEADER = 'site_code'
+
+_current_site = ContextVar('current_site', default=DEFAULT_SITE_CODE)
+
+
+def get_current_site():
+    """获取当前上下文的站点代码，未设置时返回 'default'"""
+    return _current_site.get()
+
+
+def set_current_site(site_code):
+    """设置当前上下文的站点代码，返回用于 reset_current_site 的令牌"""
+    return _current_site.set(site_code or DEFAULT_SITE_CODE)
+
+
+def reset_current_site(token):
+    """还原到 set_current_site 之前的站点"""
+    _current_site.reset(token)
+
+
+@contextmanager
+def site_context(site_code):
+    """在指定站点下执行代码块，可作为上下文管理器或装饰器使用"""
+    token = set_current_site(site_code)
+    try:
+        yield site_code
+    finally:
+        reset_current_site(token)
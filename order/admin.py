@@ -1,4 +1,4 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.urls import reverse
@@ -6,6 +6,46 @@ from django.db import models
 from django.forms import Textarea, TextInput
 
 from .models import Order, OrderLog, RefundDetail
+from .transitions import InvalidTransition, run_bulk_transition, transition
+
+# 后台提示中最多列出的失败订单数量
+MAX_FAILURES_SHOWN = 20
+
+
+def _run_order_action(modeladmin, request, queryset, name):
+    """对选中的订单执行批量流转，并把成功数量和失败原因反馈给操作人"""
+    result = run_bulk_transition(queryset, name, user=request.user, note='后台批量操作')
+    level = messages.SUCCESS if not result.failed else messages.WARNING
+    modeladmin.message_user(request, result.summary(), level)
+    for order_number, reason in result.failures[:MAX_FAILURES_SHOWN]:
+        modeladmin.message_user(request, f'{order_number}: {reason}', messages.WARNING)
+    if result.failed > MAX_FAILURES_SHOWN:
+        modeladmin.message_user(request, f'另有 {result.failed - MAX_FAILURES_SHOWN} 个订单失败未列出', messages.WARNING)
+
+
+@admin.action(description='标记为处理中')
+def mark_processing(modeladmin, request, queryset):
+    _run_order_action(modeladmin, request, queryset, 'process')
+
+
+@admin.action(description='标记为已发货')
+def mark_shipped(modeladmin, request, queryset):
+    _run_order_action(modeladmin, request, queryset, 'ship')
+
+
+@admin.action(description='标记为已送达')
+def mark_delivered(modeladmin, request, queryset):
+    _run_order_action(modeladmin, request, queryset, 'deliver')
+
+
+@admin.action(description='标记为已完成')
+def mark_completed(modeladmin, request, queryset):
+    _run_order_action(modeladmin, request, queryset, 'complete')
+
+
+@admin.action(description='取消选中订单')
+def cancel_orders(modeladmin, request, queryset):
+    _run_order_action(modeladmin, request, queryset, 'cancel')
 
 
 class OrderLogInline(admin.TabularInline):
@@ -40,6 +80,7 @@ class RefundDetailInline(admin.StackedInline):
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('order_number', 'get_user', 'get_wishlist_item', 'total_amount', 'currency', 
                    'get_payer_info', 'payment_method', 'external_order_id', 'get_status_display', 'created_at')
+    list_select_related = ('user', 'wishlist_item')
     list_filter = ('status', 'is_anonymous_payer', 'payment_method', 'payment_platform', 'is_refunding', 'refund_status', 
                   'created_at', 'payment_time', 'shipped_at', 'delivered_at')
     search_fields = ('order_number', 'user__username', 'external_order_id', 'transaction_id', 
@@ -49,6 +90,7 @@ class OrderAdmin(admin.ModelAdmin):
                       'shipped_at', 'delivered_at', 'refunded_at', 'payment_time')
     inlines = [RefundDetailInline, OrderLogInline]
     date_hierarchy = 'created_at'
+    actions = [mark_processing, mark_shipped, mark_delivered, mark_completed, cancel_orders]
     
     fieldsets = (
         ('基本信息', {
@@ -121,14 +163,9 @@ class OrderAdmin(admin.ModelAdmin):
     get_wishlist_item.short_description = '心愿单物品'
     
     def save_model(self, request, obj, form, change):
-        """保存模型时记录操作日志"""
+        """保存模型时记录操作日志（原状态取自表单初始值，不再额外查询数据库）"""
         creating = not change
-        old_status = None
-        
-        if not creating:
-            # 获取修改前的状态
-            old_obj = self.model.objects.get(pk=obj.pk)
-            old_status = old_obj.status
+        old_status = form.initial.get('status') if change else None
         
         # 保存对象
         super().save_model(request, obj, form, change)
@@ -143,7 +180,7 @@ class OrderAdmin(admin.ModelAdmin):
                 user=request.user,
                 note='订单创建'
             )
-        elif old_status != obj.status:
+        elif 'status' in form.changed_data and old_status != obj.status:
             # 状态变更日志
             OrderLog.objects.create(
                 order=obj,
@@ -158,6 +195,7 @@ class OrderAdmin(admin.ModelAdmin):
 @admin.register(OrderLog)
 class OrderLogAdmin(admin.ModelAdmin):
     list_display = ('order', 'action', 'status_from', 'status_to', 'user', 'is_system', 'created_at')
+    list_select_related = ('order', 'user')
     list_filter = ('action', 'is_system', 'created_at')
     search_fields = ('order__order_number', 'note', 'user__username')
     readonly_fields = ('order', 'action', 'status_from', 'status_to', 'data', 'user', 'is_system', 'ip_address', 'created_at')
@@ -173,6 +211,7 @@ class OrderLogAdmin(admin.ModelAdmin):
 @admin.register(RefundDetail)
 class RefundDetailAdmin(admin.ModelAdmin):
     list_display = ('order', 'refund_amount', 'currency', 'refund_method', 'reason', 'status', 'processed_by', 'requested_at', 'completed_at')
+    list_select_related = ('order', 'processed_by')
     list_filter = ('status', 'refund_method', 'requested_at')
     search_fields = ('order__order_number', 'reason', 'description', 'admin_notes')
     readonly_fields = ('requested_at', 'updated_at', 'completed_at')
@@ -191,66 +230,26 @@ class RefundDetailAdmin(admin.ModelAdmin):
     )
     
     def save_model(self, request, obj, form, change):
-        """保存模型时更新相关订单状态"""
-        creating = not change
-        old_status = None
-        
-        if not creating:
-            # 获取修改前的状态
-            old_obj = self.model.objects.get(pk=obj.pk)
-            old_status = old_obj.status
+        """保存模型时通过订单状态流转更新相关订单状态"""
+        old_status = form.initial.get('status') if change else None
         
         # 保存对象
         super().save_model(request, obj, form, change)
         
-        # 更新订单状态
-        if old_status != obj.status:
-            order = obj.order
-            
-            if obj.status == 'completed':
-                # 退款完成
-                order.status = 'refunded'
-                order.refund_status = 'completed'
-                order.refunded_at = obj.completed_at
-                order.save(update_fields=['status', 'refund_status', 'refunded_at'])
-                
-                # 记录订单日志
-                OrderLog.objects.create(
-                    order=order,
-                    action='refund_completed',
-                    status_from=old_status,
-                    status_to='refunded',
-                    user=request.user,
-                    note=f'退款完成: {obj.refund_amount}{obj.currency}'
-                )
-            elif obj.status == 'rejected':
-                # 退款被拒绝
-                order.refund_status = 'rejected'
-                order.is_refunding = False
-                
-                # 恢复之前的订单状态
-                if order.status == 'refunding':
-                    order.status = 'paid'  # 默认恢复到已支付状态
-                
-                order.save(update_fields=['status', 'refund_status', 'is_refunding'])
-                
-                # 记录订单日志
-                OrderLog.objects.create(
-                    order=order,
-                    action='refund_rejected',
-                    status_to=order.status,
-                    user=request.user,
-                    note=f'退款被拒绝: {obj.admin_notes}'
-                )
-            elif obj.status == 'processing':
-                # 退款处理中
-                order.refund_status = 'processing'
-                order.save(update_fields=['refund_status'])
-                
-                # 记录订单日志
-                OrderLog.objects.create(
-                    order=order,
-                    action='refund_processing',
-                    user=request.user,
-                    note='退款处理中'
-                )
+        if old_status == obj.status:
+            return
+        
+        # 退款状态对应的订单流转
+        if obj.status == 'completed':
+            name, note = 'complete_refund', f'退款完成: {obj.refund_amount}{obj.currency}'
+        elif obj.status == 'rejected':
+            name, note = 'reject_refund', f'退款被拒绝: {obj.admin_notes}'
+        elif obj.status == 'processing':
+            name, note = 'process_refund', '退款处理中'
+        else:
+            return
+        
+        try:
+            transition(obj.order, name, user=request.user, note=note)
+        except InvalidTransition as e:
+            self.message_user(request, f'退款详情已保存，但订单状态未更新: {str(e)}', messages.WARNING)
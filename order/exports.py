@@ -0,0 +1,340 @@
+"""
+对账数据流式导出
+
+订单、退款、支付记录按 日期范围 / 站点 / 支付平台 过滤后逐行导出为CSV或XLSX：
+- 查询使用 values_list(...).iterator(chunk_size)，PostgreSQL下走服务端游标，不实例化模型，内存占用与总行数无关
+- 写出器是生成器，表头立即输出，之后每处理一批数据就输出一次，可直接交给StreamingHttpResponse
+- XLSX只使用标准库：zipfile写入不可回退的流(数据描述符模式)，工作表使用内联字符串，不需要共享字符串表
+
+用法:
+    rows = export_rows('orders', start=date(2026, 1, 1), end=date(2026, 1, 31), site_code='us')
+    for chunk in stream_csv(EXPORTS['orders'].headers, rows):
+        ...
+"""
+import csv
+import datetime
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.utils import timezone
+
+from payment.models import Payment
+from .models import Order, RefundDetail
+
+DEFAULT_EXPORT_SETTINGS = {
+    'CHUNK_SIZE': 2000,  # 每次从数据库游标读取的行数
+    'FLUSH_ROWS': 500,  # 每写出多少行向客户端输出一次
+}
+
+
+def get_export_settings():
+    """读取ORDER_EXPORT配置，未配置的项使用默认值"""
+    config = dict(DEFAULT_EXPORT_SETTINGS)
+    config.update(getattr(settings, 'ORDER_EXPORT', {}))
+    return config
+
+
+class ExportSpec:
+    """
+    一种导出数据集
+    columns: [(表头, values_list字段路径)]；date_field: 日期范围过滤的字段
+    site_field/platform_field: 站点和支付平台过滤的字段路径
+    """
+
+    def __init__(self, model, columns, date_field, site_field, platform_field):
+        self.model = model
+        self.columns = columns
+        self.date_field = date_field
+        self.site_field = site_field
+        self.platform_field = platform_field
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+    @property
+    def fields(self):
+        return [field for _, field in self.columns]
+
+
+EXPORTS = {
+    'orders': ExportSpec(
+        Order,
+        [
+            ('订单号', 'order_number'),
+            ('下单站点', 'site_code'),
+            ('用户', 'user__username'),
+            ('订单状态', 'status'),
+            ('总金额', 'total_amount'),
+            ('货币', 'currency'),
+            ('支付方式', 'payment_method'),
+            ('支付平台', 'payment_platform'),
+            ('支付状态', 'payment_status'),
+            ('外部订单号', 'external_order_id'),
+            ('交易号', 'transaction_id'),
+            ('支付账号', 'payment_account'),
+            ('支付时间', 'payment_time'),
+            ('匿名付款', 'is_anonymous_payer'),
+            ('付款人姓名', 'payer_name'),
+            ('付款人邮箱', 'payer_email'),
+            ('付款人电话', 'payer_phone'),
+            ('收件人', 'recipient_name'),
+            ('收件人电话', 'recipient_phone'),
+            ('收货地址', 'shipping_address_text'),
+            ('物流公司', 'shipping_carrier'),
+            ('物流单号', 'tracking_number'),
+            ('运费', 'shipping_cost'),
+            ('发货时间', 'shipped_at'),
+            ('送达时间', 'delivered_at'),
+            ('退款状态', 'refund_status'),
+            ('退款金额', 'refund_amount'),
+            ('退款时间', 'refunded_at'),
+            ('创建时间', 'created_at'),
+            ('完成时间', 'completed_at'),
+        ],
+        date_field='created_at',
+        site_field='site_code',
+        platform_field='payment_platform',
+    ),
+    'refunds': ExportSpec(
+        RefundDetail,
+        [
+            ('退款ID', 'id'),
+            ('订单号', 'order__order_number'),
+            ('下单站点', 'order__site_code'),
+            ('支付平台', 'order__payment_platform'),
+            ('原交易号', 'order__transaction_id'),
+            ('退款金额', 'refund_amount'),
+            ('货币', 'currency'),
+            ('退款方式', 'refund_method'),
+            ('状态', 'status'),
+            ('退款原因', 'reason'),
+            ('退款交易号', 'transaction_id'),
+            ('处理人', 'processed_by__username'),
+            ('处理时间', 'processed_at'),
+            ('申请时间', 'requested_at'),
+            ('完成时间', 'completed_at'),
+        ],
+        date_field='requested_at',
+        site_field='order__site_code',
+        platform_field='order__payment_platform',
+    ),
+    'payments': ExportSpec(
+        Payment,
+        [
+            ('支付ID', 'id'),
+            ('支付方式', 'payment_method__name'),
+            ('支付平台', 'payment_method__payment_type'),
+            ('金额', 'amount'),
+            ('货币', 'currency'),
+            ('状态', 'status'),
+            ('交易号', 'transaction_id'),
+            ('匿名支付', 'is_anonymous'),
+            ('付款人', 'payer__username'),
+            ('付款人姓名', 'payer_name'),
+            ('付款人邮箱', 'payer_email'),
+            ('创建时间', 'created_at'),
+            ('完成时间', 'completed_at'),
+        ],
+        date_field='created_at',
+        site_field='orders__site_code',
+        platform_field='payment_method__payment_type',
+    ),
+}
+
+
+def _day_bounds(value, end=False):
+    """把日期转换为当前时区当天的起点，结束日期取次日零点（不包含）"""
+    if isinstance(value, datetime.datetime):
+        return value
+    if end:
+        value = value + datetime.timedelta(days=1)
+    return timezone.make_aware(datetime.datetime.combine(value, datetime.time.min))
+
+
+def export_queryset(name, start=None, end=None, site_code=None, platform=None):
+    """按条件生成导出查询集（values_list元组，按时间和主键排序）"""
+    spec = EXPORTS[name]
+    queryset = spec.model.objects.all()
+    if start:
+        queryset = queryset.filter(**{f'{spec.date_field}__gte': _day_bounds(start)})
+    if end:
+        queryset = queryset.filter(**{f'{spec.date_field}__lt': _day_bounds(end, end=True)})
+    if site_code:
+        queryset = queryset.filter(**{spec.site_field: site_code})
+    if platform:
+        queryset = queryset.filter(**{f'{spec.platform_field}__iexact': platform})
+    if '__' in spec.site_field and site_code:
+        # 支付记录通过反向关联订单过滤站点，可能产生重复行
+        queryset = queryset.distinct()
+    return queryset.order_by(spec.date_field, 'pk').values_list(*spec.fields)
+
+
+def export_rows(name, chunk_size=None, **filters):
+    """逐行读取导出数据，PostgreSQL下使用服务端游标"""
+    chunk_size = chunk_size or get_export_settings()['CHUNK_SIZE']
+    return export_queryset(name, **filters).iterator(chunk_size=chunk_size)
+
+
+def _format_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, bool):
+        return '是' if value else '否'
+    return str(value)
+
+
+class _Echo:
+    """csv.writer的伪文件对象，write直接返回写入的内容"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(headers, rows, flush_rows=None):
+    """
+    生成CSV内容(UTF-8带BOM，Excel可直接打开)
+    以 = + - @ 开头的文本前加单引号，避免在表格软件中被当作公式执行
+    """
+    flush_rows = flush_rows or get_export_settings()['FLUSH_ROWS']
+    writer = csv.writer(_Echo())
+    yield ('\ufeff' + writer.writerow(headers)).encode('utf-8')
+
+    buffer = []
+    for row in rows:
+        values = []
+        for value in row:
+            text = _format_value(value)
+            if text[:1] in ('=', '+', '-', '@') and not isinstance(value, (int, Decimal)):
+                text = "'" + text
+            values.append(text)
+        buffer.append(writer.writerow(values))
+        if len(buffer) >= flush_rows:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+class _StreamBuffer:
+    """zipfile写入目标：只支持write，zipfile检测到不可回退后使用数据描述符逐段写出"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# XML 1.0中不允许出现的控制字符
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _xlsx_cell(value):
+    if isinstance(value, bool) or value is None or not isinstance(value, (int, float, Decimal)):
+        text = escape(_ILLEGAL_XML_CHARS.sub('', _format_value(value)))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+    return f'<c><v>{value}</v></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def stream_xlsx(headers, rows, sheet_name='Sheet1', flush_rows=None):
+    """生成XLSX内容，数字列保持数值类型，其他值写为文本"""
+    flush_rows = flush_rows or get_export_settings()['FLUSH_ROWS']
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(name=escape(sheet_name[:31])))
+        archive.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+
+        with archive.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(headers).encode('utf-8'))
+            yield buffer.drain()
+
+            pending = []
+            for row in rows:
+                pending.append(_xlsx_row(row))
+                if len(pending) >= flush_rows:
+                    sheet.write(''.join(pending).encode('utf-8'))
+                    pending = []
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            if pending:
+                sheet.write(''.join(pending).encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (stream_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def stream_export(name, file_format='csv', **filters):
+    """按数据集和格式生成导出内容"""
+    writer, _ = FORMATS[file_format]
+    return writer(EXPORTS[name].headers, export_rows(name, **filters))
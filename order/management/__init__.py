@@ -0,0 +1 @@
+# 包初始化文件
@@ -0,0 +1 @@
+# 命令包初始化文件
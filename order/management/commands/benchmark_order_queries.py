@@ -0,0 +1,182 @@
+import datetime
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from order.models import Order, OrderLog, ORDER_STATUS_CHOICES
+
+User = get_user_model()
+
+# 压测数据的订单号前缀和用户名前缀，--cleanup时据此删除
+BENCH_PREFIX = 'BENCH'
+BENCH_USER_PREFIX = 'bench_order_user_'
+
+# 本次为订单看板访问路径新增的索引
+BENCH_INDEXES = {
+    Order: [
+        'order_user_created_idx', 'order_active_status_idx', 'order_payment_status_idx',
+        'order_transaction_id_idx', 'order_external_order_id_idx', 'order_site_created_idx',
+    ],
+    OrderLog: ['orderlog_order_created_idx'],
+}
+
+
+class Command(BaseCommand):
+    help = '生成大量压测订单，输出订单看板各访问路径在有/无索引时的查询计划和耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000000, help='压测订单数量（已有压测数据时只补足差额）')
+        parser.add_argument('--users', type=int, default=1000, help='压测用户数量')
+        parser.add_argument('--batch-size', type=int, default=5000, dest='batch_size', help='批量写入的每批数量')
+        parser.add_argument('--repeat', type=int, default=5, help='每条查询执行次数，取中位数')
+        parser.add_argument('--compare', action='store_true', help='先删除索引测一遍，再重建索引测一遍')
+        parser.add_argument('--skip-seed', action='store_true', dest='skip_seed', help='不生成数据，直接测试')
+        parser.add_argument('--cleanup', action='store_true', help='删除压测数据后退出')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = Order.objects.filter(order_number__startswith=BENCH_PREFIX).delete()
+            User.objects.filter(username__startswith=BENCH_USER_PREFIX).delete()
+            self.stdout.write(self.style.SUCCESS(f'已删除压测数据 {deleted} 行'))
+            return
+
+        if not options['skip_seed']:
+            self.seed(options['orders'], options['users'], options['batch_size'])
+
+        if options['compare']:
+            self.stdout.write(self.style.MIGRATE_HEADING('== 无索引 =='))
+            self.drop_indexes()
+            try:
+                before = self.run_queries(options['repeat'])
+            finally:
+                self.create_indexes()
+            self.stdout.write(self.style.MIGRATE_HEADING('== 有索引 =='))
+            after = self.run_queries(options['repeat'])
+            self.stdout.write(self.style.MIGRATE_HEADING('== 对比(中位数毫秒) =='))
+            for name in after:
+                speedup = before[name] / after[name] if after[name] else float('inf')
+                self.stdout.write(f'{name:<24} {before[name]:>10.2f} -> {after[name]:>8.2f}  x{speedup:.1f}')
+        else:
+            self.run_queries(options['repeat'])
+
+    def seed(self, total, user_count, batch_size):
+        """批量生成订单和日志，created_at分布在过去一年内"""
+        existing = Order.objects.filter(order_number__startswith=BENCH_PREFIX).count()
+        if existing >= total:
+            self.stdout.write(f'已有 {existing} 个压测订单，跳过生成')
+            return
+
+        users = list(User.objects.filter(username__startswith=BENCH_USER_PREFIX))
+        if len(users) < user_count:
+            User.objects.bulk_create(
+                [User(username=f'{BENCH_USER_PREFIX}{index}') for index in range(len(users), user_count)],
+                batch_size=batch_size,
+            )
+            users = list(User.objects.filter(username__startswith=BENCH_USER_PREFIX))
+
+        statuses = [value for value, _ in ORDER_STATUS_CHOICES]
+        now = timezone.now()
+        random.seed(existing)
+
+        # bulk_create会用当前时间覆盖auto_now_add字段，生成期间临时关闭
+        created_fields = [Order._meta.get_field('created_at'), OrderLog._meta.get_field('created_at')]
+        for field in created_fields:
+            field.auto_now_add = False
+        started = time.perf_counter()
+        try:
+            for start in range(existing, total, batch_size):
+                orders = []
+                logs = []
+                for index in range(start, min(start + batch_size, total)):
+                    created_at = now - datetime.timedelta(seconds=random.randint(0, 365 * 24 * 3600))
+                    paid = random.random() < 0.7
+                    order = Order(
+                        order_number=f'{BENCH_PREFIX}{index:012d}',
+                        user=random.choice(users),
+                        total_amount=Decimal(random.randint(100, 100000)) / 100,
+                        status=random.choice(statuses),
+                        site_code=random.choice(['default', 'us', 'asia']),
+                        payment_platform=random.choice(['paypal', 'usdt', 'coinbase']) if paid else '',
+                        payment_status='completed' if paid else '',
+                        transaction_id=f'TX{index:014d}' if paid else '',
+                        external_order_id=f'EXT{index:013d}' if paid else '',
+                        recipient_name='压测',
+                        recipient_phone='00000000',
+                        shipping_address_text='压测地址',
+                        created_at=created_at,
+                        updated_at=created_at,
+                    )
+                    orders.append(order)
+                    logs.append(OrderLog(order=order, action='创建订单', status_to=order.status,
+                                         is_system=True, created_at=created_at))
+                Order.objects.bulk_create(orders, batch_size=batch_size)
+                OrderLog.objects.bulk_create(logs, batch_size=batch_size)
+                self.stdout.write(f'已生成 {start + len(orders)}/{total} 个订单')
+        finally:
+            for field in created_fields:
+                field.auto_now_add = True
+        self.stdout.write(self.style.SUCCESS(f'生成完成，耗时 {time.perf_counter() - started:.1f} 秒'))
+
+    def access_paths(self):
+        """订单看板/接口的访问路径，与各接口实际使用的查询一致"""
+        sample = Order.objects.filter(order_number__startswith=BENCH_PREFIX).exclude(transaction_id='').order_by('pk').first()
+        if sample is None:
+            sample = Order.objects.order_by('pk').first()
+        month_ago = timezone.now() - datetime.timedelta(days=30)
+        return {
+            # OrderViewSet.get_queryset
+            'user_orders': Order.objects.filter(user_id=sample.user_id).order_by('-created_at')[:20],
+            # 后台待办: 已支付待发货
+            'active_status': Order.objects.active().filter(status='paid').order_by('-created_at')[:20],
+            'payment_status': Order.objects.filter(payment_status='completed').order_by('-created_at')[:20],
+            # 支付回调匹配
+            'transaction_match': Order.objects.by_reference(sample.transaction_id)[:1],
+            'external_match': Order.objects.by_reference(sample.external_order_id)[:1],
+            # 对账导出
+            'site_export': Order.objects.filter(site_code='us', created_at__gte=month_ago).order_by('created_at')[:1000],
+            # OrderViewSet.logs
+            'order_logs': OrderLog.objects.filter(order_id=sample.pk).order_by('-created_at')[:20],
+        }
+
+    def run_queries(self, repeat):
+        results = {}
+        for name, queryset in self.access_paths().items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset._chain())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+            self.stdout.write(self.style.SQL_TABLE(f'[{name}] 中位数 {results[name]:.2f} ms'))
+            self.stdout.write(queryset.explain())
+        return results
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, names in BENCH_INDEXES.items():
+                for index in model._meta.indexes:
+                    if index.name in names:
+                        editor.remove_index(model, index)
+        self.analyze()
+
+    def create_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, names in BENCH_INDEXES.items():
+                for index in model._meta.indexes:
+                    if index.name in names:
+                        editor.add_index(model, index)
+        self.analyze()
+
+    def analyze(self):
+        """刷新统计信息，让查询计划反映索引变化"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('ANALYZE order_order; ANALYZE order_orderlog;')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
@@ -0,0 +1,41 @@
+import datetime
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from order.exports import EXPORTS, FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = '流式导出对账数据（订单/退款/支付记录）为CSV或XLSX，内存占用与导出行数无关'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(EXPORTS), help='导出的数据集')
+        parser.add_argument('--start', help='开始日期(YYYY-MM-DD)，包含当天')
+        parser.add_argument('--end', help='结束日期(YYYY-MM-DD)，包含当天')
+        parser.add_argument('--site', help='站点代码')
+        parser.add_argument('--platform', help='支付平台，如paypal、usdt')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv', dest='file_format', help='导出格式')
+        parser.add_argument('--output', '-o', help='输出文件路径，默认写到标准输出')
+
+    def handle(self, *args, **options):
+        filters = {'site_code': options['site'], 'platform': options['platform']}
+        try:
+            for key in ('start', 'end'):
+                if options[key]:
+                    filters[key] = datetime.date.fromisoformat(options[key])
+        except ValueError:
+            raise CommandError('日期格式应为YYYY-MM-DD')
+
+        chunks = stream_export(options['dataset'], options['file_format'], **filters)
+        if options['output']:
+            size = 0
+            with open(options['output'], 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            self.stderr.write(self.style.SUCCESS(f"导出完成: {options['output']} ({size} 字节)"))
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,82 @@
+import datetime
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from order.models import OrderNumberSequence
+from order.numbering import OrderNumberAllocator
+
+
+class Command(BaseCommand):
+    help = '订单号分配压测：模拟多个进程并发分配订单号，检查是否重复并统计每秒分配数量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='并发工作线程数，每个线程模拟一个独立进程的分配器')
+        parser.add_argument('--count', type=int, default=20000, help='总共分配的订单号数量')
+        parser.add_argument('--block-size', type=int, default=None, dest='block_size', help='号段大小，默认使用ORDER_NUMBER配置')
+        parser.add_argument('--target-rate', type=int, default=1000, dest='target_rate', help='期望达到的每秒分配数量')
+        parser.add_argument(
+            '--day',
+            default='2000-01-01',
+            help='压测使用的日期(YYYY-MM-DD)，默认使用过去的日期以免占用当天的真实序号，结束后删除该日序列',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        per_worker = options['count'] // workers
+        if workers < 1 or per_worker < 1:
+            raise CommandError('workers和count必须为正数，且count不小于workers')
+        try:
+            day = datetime.date.fromisoformat(options['day'])
+        except ValueError:
+            raise CommandError(f"日期格式错误: {options['day']}")
+
+        OrderNumberSequence.objects.filter(day=day).delete()
+        results = [[] for _ in range(workers)]
+        errors = []
+        barrier = threading.Barrier(workers)
+
+        def run(index):
+            allocator = OrderNumberAllocator(block_size=options['block_size'], date_func=lambda: day)
+            numbers = results[index]
+            try:
+                barrier.wait()
+                for _ in range(per_worker):
+                    numbers.append(allocator.allocate())
+            except Exception as e:
+                errors.append(f'工作线程{index}: {str(e)}')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        OrderNumberSequence.objects.filter(day=day).delete()
+        if errors:
+            raise CommandError('分配过程中出错:\n' + '\n'.join(errors))
+
+        allocated = [number for numbers in results for number in numbers]
+        duplicates = len(allocated) - len(set(allocated))
+        # 同一个分配器（进程）内订单号必须严格递增
+        non_monotonic = sum(
+            1 for numbers in results for prev, cur in zip(numbers, numbers[1:]) if cur <= prev
+        )
+        rate = len(allocated) / elapsed if elapsed else float('inf')
+
+        self.stdout.write(
+            f'分配 {len(allocated)} 个订单号，{workers} 个并发，耗时 {elapsed:.2f} 秒，'
+            f'每秒 {rate:.0f} 个；重复 {duplicates} 个，非递增 {non_monotonic} 个'
+        )
+        if duplicates or non_monotonic:
+            raise CommandError('压测失败：订单号出现重复或非递增')
+        if rate < options['target_rate']:
+            self.stdout.write(self.style.WARNING(f"未达到期望速率 {options['target_rate']}/秒"))
+        else:
+            self.stdout.write(self.style.SUCCESS('压测通过：无重复，单进程内严格递增'))
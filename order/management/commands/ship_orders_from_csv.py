@@ -0,0 +1,53 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from order.models import Order
+from order.transitions import bulk_transition
+
+
+class Command(BaseCommand):
+    help = '根据物流公司回传的CSV批量标记订单已发货（列: order_number, tracking_number, shipping_carrier）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help='CSV文件路径，第一行为表头')
+        parser.add_argument('--carrier', default='', help='CSV中没有shipping_carrier列时使用的物流公司')
+        parser.add_argument('--batch-size', type=int, default=500, dest='batch_size', help='每条UPDATE/INSERT语句处理的订单数量')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_path'], newline='', encoding='utf-8-sig') as f:
+                rows = list(csv.DictReader(f))
+        except OSError as e:
+            raise CommandError(f"读取CSV失败: {str(e)}")
+        if rows and 'order_number' not in rows[0]:
+            raise CommandError('CSV缺少order_number列')
+
+        shipments = {}
+        for row in rows:
+            order_number = (row.get('order_number') or '').strip()
+            if order_number:
+                shipments[order_number] = {
+                    'tracking_number': (row.get('tracking_number') or '').strip(),
+                    'shipping_carrier': (row.get('shipping_carrier') or options['carrier']).strip(),
+                }
+
+        # 一次查询读取全部订单，只读取流转和日志需要的字段
+        orders = Order.objects.filter(order_number__in=list(shipments)).only(
+            'id', 'order_number', 'status', 'tracking_number', 'shipping_carrier', 'shipped_at', 'updated_at'
+        )
+        pk_by_number = dict(orders.values_list('order_number', 'id'))
+        params_by_pk = {pk_by_number[number]: params for number, params in shipments.items() if number in pk_by_number}
+
+        logs, failures = bulk_transition(
+            orders, 'ship', params_by_pk=params_by_pk, is_system=True,
+            note='物流CSV批量发货', batch_size=options['batch_size'],
+        )
+
+        for number in sorted(set(shipments) - set(pk_by_number)):
+            self.stdout.write(self.style.WARNING(f'订单不存在: {number}'))
+        for order, reason in failures:
+            self.stdout.write(self.style.WARNING(reason))
+        self.stdout.write(self.style.SUCCESS(
+            f'发货完成: 成功 {len(logs)} 个，状态不符 {len(failures)} 个，未找到 {len(set(shipments) - set(pk_by_number))} 个'
+        ))
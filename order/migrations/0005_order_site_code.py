@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0004_ordernumbersequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='site_code',
+            field=models.CharField(blank=True, default='default', max_length=50, verbose_name='下单站点'),
+        ),
+    ]
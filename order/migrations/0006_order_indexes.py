@@ -0,0 +1,57 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0005_order_site_code'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(
+                condition=models.Q(('status__in', ['pending', 'paid', 'processing', 'shipped', 'refunding'])),
+                fields=['status', '-created_at'],
+                name='order_active_status_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(
+                condition=models.Q(('payment_status', ''), _negated=True),
+                fields=['payment_status', '-created_at'],
+                name='order_payment_status_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(
+                condition=models.Q(('transaction_id', ''), _negated=True),
+                fields=['transaction_id'],
+                name='order_transaction_id_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(
+                condition=models.Q(('external_order_id', ''), _negated=True),
+                fields=['external_order_id'],
+                name='order_external_order_id_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['site_code', 'created_at'], name='order_site_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderlog',
+            index=models.Index(fields=['order', '-created_at'], name='orderlog_order_created_idx'),
+        ),
+    ]
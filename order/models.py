@@ -8,6 +8,7 @@ from payment.models import Payment
 from wishlist_new.models import WishlistItem
 from users.models import ShippingAddress
 from goods.models import Goods
+from mall.site_context import get_current_site
 
 User = get_user_model()
 
@@ -24,6 +25,12 @@ ORDER_STATUS_CHOICES = [
     ('refunded', _('已退款')),
 ]
 
+# 未结束的订单状态（看板待办，部分索引只覆盖这些状态）
+ACTIVE_ORDER_STATUSES = ['pending', 'paid', 'processing', 'shipped', 'refunding']
+
+# 这些字段变化时需要重新同步订单上的收货/支付快照字段
+SNAPSHOT_SOURCE_FIELDS = {'shipping_address', 'shipping_address_id', 'payment', 'payment_id'}
+
 # 退款状态选项
 REFUND_STATUS_CHOICES = [
     ('pending', _('待处理')),
@@ -34,6 +41,23 @@ REFUND_STATUS_CHOICES = [
 ]
 
 
+class OrderQuerySet(models.QuerySet):
+    """订单查询集，条件与部分索引的WHERE一致，保证SQLite/PostgreSQL都能命中部分索引"""
+
+    def active(self):
+        """未结束的订单（命中order_active_status_idx）"""
+        return self.filter(status__in=ACTIVE_ORDER_STATUSES)
+
+    def by_reference(self, reference):
+        """按交易号或外部订单号匹配订单（支付回调对账）"""
+        if not reference:
+            return self.none()
+        return self.filter(
+            (models.Q(transaction_id=reference) & ~models.Q(transaction_id=''))
+            | (models.Q(external_order_id=reference) & ~models.Q(external_order_id=''))
+        )
+
+
 class Order(models.Model):
     """订单模型"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -46,6 +70,7 @@ class Order(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='总金额')
     currency = models.CharField(max_length=3, default='USD', verbose_name='货币')
     status = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES, default='pending', verbose_name='订单状态')
+    site_code = models.CharField(max_length=50, blank=True, default='default', verbose_name=_('下单站点'))
     
     # 付款人信息（匿名付款者）
     is_anonymous_payer = models.BooleanField(default=False, verbose_name=_('匿名付款'))
@@ -95,156 +120,177 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     completed_at = models.DateTimeField(null=True, blank=True, verbose_name=_('完成时间'))
     
+    objects = OrderQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('订单')
         verbose_name_plural = _('订单')
         ordering = ['-created_at']
+        indexes = [
+            # 用户订单列表: WHERE user_id=... ORDER BY created_at DESC
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # 后台/看板按状态处理的待办订单，只索引未结束的状态
+            models.Index(
+                fields=['status', '-created_at'], name='order_active_status_idx',
+                condition=models.Q(status__in=ACTIVE_ORDER_STATUSES),
+            ),
+            # 支付状态、交易号、外部订单号匹配(支付回调对账)，空值不进索引
+            models.Index(
+                fields=['payment_status', '-created_at'], name='order_payment_status_idx',
+                condition=~models.Q(payment_status=''),
+            ),
+            models.Index(
+                fields=['transaction_id'], name='order_transaction_id_idx',
+                condition=~models.Q(transaction_id=''),
+            ),
+            models.Index(
+                fields=['external_order_id'], name='order_external_order_id_idx',
+                condition=~models.Q(external_order_id=''),
+            ),
+            # 对账导出: WHERE site_code=... AND created_at BETWEEN ...
+            models.Index(fields=['site_code', 'created_at'], name='order_site_created_idx'),
+        ]
         
     def __str__(self):
         return f"订单 {self.order_number}"
     
     def save(self, *args, **kwargs):
-        # 如果没有订单号，则生成一个基于时间的唯一订单号
+        update_fields = kwargs.get('update_fields')
+        
+        # 新订单记录下单时所在的站点
+        if self._state.adding and (not self.site_code or self.site_code == 'default'):
+            self.site_code = get_current_site()
+        
+        # 如果没有订单号，则分配一个按日期递增的唯一订单号
         if not self.order_number:
             self.order_number = self.generate_order_number()
+            if update_fields is not None:
+                update_fields = set(update_fields) | {'order_number'}
         
         # 如果订单完成，记录完成时间
         if self.status == 'completed' and not self.completed_at:
             self.completed_at = timezone.now()
-            
+            if update_fields is not None:
+                update_fields = set(update_fields) | {'completed_at'}
+        
+        # 只有完整保存或更换了收货地址/支付记录时才同步快照字段，
+        # 状态流转等只更新少量字段的保存不会访问关联对象
+        if update_fields is None or SNAPSHOT_SOURCE_FIELDS.intersection(update_fields):
+            synced = self.sync_snapshot_fields()
+            if update_fields is not None:
+                update_fields = set(update_fields) | set(synced)
+        
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+    
+    def sync_snapshot_fields(self):
+        """
+        从收货地址和支付记录复制快照字段（只填充空字段），返回发生变化的字段名列表
+        支付记录和支付方式用一次select_related查询读取
+        """
+        changed = []
+        
+        def fill(field, value, condition=True):
+            if condition and value and not getattr(self, field):
+                setattr(self, field, value)
+                changed.append(field)
+        
         # 复制收货地址信息，防止原地址被删除或修改
-        if self.shipping_address and not self.shipping_address_text:
-            self.recipient_name = self.shipping_address.recipient_name
-            self.recipient_phone = self.shipping_address.phone
-            self.shipping_address_text = self.shipping_address.get_full_address()
+        if self.shipping_address_id and not self.shipping_address_text:
+            address = self.shipping_address
+            if address:
+                self.recipient_name = address.recipient_name
+                self.recipient_phone = address.phone
+                self.shipping_address_text = address.get_full_address()
+                changed.extend(['recipient_name', 'recipient_phone', 'shipping_address_text'])
         
         # 从支付记录同步支付信息
-        if self.payment:
-            # 同步交易ID和支付状态
-            if not self.transaction_id and self.payment.transaction_id:
-                self.transaction_id = self.payment.transaction_id
-            
-            if not self.payment_status:
-                self.payment_status = self.payment.status
-                
-            if not self.payment_time and self.payment.completed_at:
-                self.payment_time = self.payment.completed_at
-            
-            # 获取支付方式信息
-            if hasattr(self.payment, 'payment_method') and self.payment.payment_method:
-                if not self.payment_method:
-                    self.payment_method = self.payment.payment_method.name
-                
-                if not self.payment_platform and self.payment.payment_method.payment_type:
-                    self.payment_platform = self.payment.payment_method.payment_type
-            
-            # 同步付款人信息
-            if self.payment.is_anonymous and not self.is_anonymous_payer:
-                self.is_anonymous_payer = True
-                
-            if not self.payer_name and self.payment.payer_name:
-                self.payer_name = self.payment.payer_name
-                
-            if not self.payer_email and self.payment.payer_email:
-                self.payer_email = self.payment.payer_email
-            
-            # 提取支付数据中可能包含的外部订单号
-            if not self.external_order_id and hasattr(self.payment, 'payment_data'):
-                payment_data = self.payment.payment_data
-                
-                # 从不同支付方式中提取外部订单号
-                if self.payment_platform == 'paypal' and 'paypal_order_id' in payment_data:
-                    self.external_order_id = payment_data.get('paypal_order_id')
-                elif self.payment_platform == 'usdt' and 'transaction_hash' in payment_data:
-                    self.external_order_id = payment_data.get('transaction_hash')
-                elif 'order_id' in payment_data:
-                    self.external_order_id = payment_data.get('order_id')
-                    
-        super().save(*args, **kwargs)
+        if not self.payment_id:
+            return changed
+        if not Order.payment.is_cached(self):
+            self.payment = Payment.objects.select_related('payment_method').filter(pk=self.payment_id).first()
+        payment = self.payment
+        if payment is None:
+            return changed
+        
+        # 同步交易ID和支付状态
+        fill('transaction_id', payment.transaction_id)
+        fill('payment_status', payment.status)
+        fill('payment_time', payment.completed_at)
+        
+        # 获取支付方式信息
+        payment_method = payment.payment_method
+        if payment_method:
+            fill('payment_method', payment_method.name)
+            fill('payment_platform', payment_method.payment_type)
+        
+        # 同步付款人信息
+        fill('is_anonymous_payer', payment.is_anonymous)
+        fill('payer_name', payment.payer_name)
+        fill('payer_email', payment.payer_email)
+        
+        # 提取支付数据中可能包含的外部订单号
+        payment_data = payment.payment_data or {}
+        if not self.external_order_id:
+            if self.payment_platform == 'paypal' and 'paypal_order_id' in payment_data:
+                fill('external_order_id', payment_data.get('paypal_order_id'))
+            elif self.payment_platform == 'usdt' and 'transaction_hash' in payment_data:
+                fill('external_order_id', payment_data.get('transaction_hash'))
+            elif 'order_id' in payment_data:
+                fill('external_order_id', payment_data.get('order_id'))
+        
+        return changed
     
     def generate_order_number(self):
-        """生成订单号"""
-        import random
-        prefix = timezone.now().strftime('%Y%m%d')
-        suffix = ''.join(random.choices('0123456789', k=8))
-        return f"{prefix}{suffix}"
+        """生成订单号（日期 + 当日递增序号，由号段分配器保证多进程下不重复）"""
+        from .numbering import order_number_allocator
+        return order_number_allocator.allocate()
     
-    def mark_as_paid(self):
-        """标记为已支付"""
-        self.status = 'paid'
-        self.save(update_fields=['status', 'updated_at'])
+    def _transition(self, name, **kwargs):
+        from .transitions import transition
+        transition(self, name, **kwargs)
         return True
     
-    def mark_as_shipped(self, tracking_number='', shipping_carrier=''):
+    def mark_as_paid(self, **kwargs):
+        """标记为已支付"""
+        return self._transition('pay', **kwargs)
+    
+    def mark_as_shipped(self, tracking_number='', shipping_carrier='', **kwargs):
         """标记为已发货"""
-        self.status = 'shipped'
-        self.tracking_number = tracking_number
-        self.shipping_carrier = shipping_carrier
-        self.shipped_at = timezone.now()
-        self.save(update_fields=['status', 'tracking_number', 'shipping_carrier', 'shipped_at', 'updated_at'])
-        return True
+        return self._transition('ship', tracking_number=tracking_number, shipping_carrier=shipping_carrier, **kwargs)
     
-    def mark_as_delivered(self):
+    def mark_as_delivered(self, **kwargs):
         """标记为已送达"""
-        self.status = 'delivered'
-        self.delivered_at = timezone.now()
-        self.save(update_fields=['status', 'delivered_at', 'updated_at'])
-        return True
+        return self._transition('deliver', **kwargs)
     
-    def mark_as_completed(self):
+    def mark_as_completed(self, **kwargs):
         """标记为已完成"""
-        self.status = 'completed'
-        self.completed_at = timezone.now()
-        self.save(update_fields=['status', 'completed_at', 'updated_at'])
-        return True
+        return self._transition('complete', **kwargs)
     
-    def cancel(self, reason=''):
+    def cancel(self, reason='', **kwargs):
         """取消订单"""
-        self.status = 'cancelled'
-        if reason:
-            self.admin_notes += f"\n取消原因: {reason}"
-        self.save(update_fields=['status', 'admin_notes', 'updated_at'])
-        return True
+        return self._transition('cancel', reason=reason, **kwargs)
     
-    def request_refund(self, amount, reason=''):
+    def request_refund(self, amount, reason='', **kwargs):
         """申请退款"""
-        self.is_refunding = True
-        self.refund_status = 'pending'
-        self.refund_amount = amount
-        self.refund_reason = reason
-        self.status = 'refunding'
-        self.save(update_fields=['is_refunding', 'refund_status', 'refund_amount', 'refund_reason', 'status', 'updated_at'])
-        return True
+        return self._transition('request_refund', amount=amount, reason=reason, **kwargs)
     
-    def process_refund(self):
+    def process_refund(self, **kwargs):
         """处理退款"""
-        self.refund_status = 'processing'
-        self.save(update_fields=['refund_status', 'updated_at'])
-        return True
+        return self._transition('process_refund', **kwargs)
     
-    def approve_refund(self):
+    def approve_refund(self, **kwargs):
         """批准退款"""
-        self.refund_status = 'approved'
-        self.save(update_fields=['refund_status', 'updated_at'])
-        return True
+        return self._transition('approve_refund', **kwargs)
     
-    def complete_refund(self):
+    def complete_refund(self, **kwargs):
         """完成退款"""
-        self.refund_status = 'completed'
-        self.status = 'refunded'
-        self.refunded_at = timezone.now()
-        self.save(update_fields=['refund_status', 'status', 'refunded_at', 'updated_at'])
-        return True
+        return self._transition('complete_refund', **kwargs)
     
-    def reject_refund(self, reason=''):
+    def reject_refund(self, reason='', **kwargs):
         """拒绝退款"""
-        self.refund_status = 'rejected'
-        self.is_refunding = False
-        self.status = self.prev_status if hasattr(self, 'prev_status') else 'paid'
-        if reason:
-            self.admin_notes += f"\n拒绝退款原因: {reason}"
-        self.save(update_fields=['refund_status', 'is_refunding', 'status', 'admin_notes', 'updated_at'])
-        return True
+        return self._transition('reject_refund', reason=reason, **kwargs)
     
     def get_order_status_display_html(self):
         """获取订单状态HTML显示"""
@@ -284,6 +330,10 @@ class OrderLog(models.Model):
         verbose_name = _('订单日志')
         verbose_name_plural = _('订单日志')
         ordering = ['-created_at']
+        indexes = [
+            # 订单日志列表: WHERE order_id=... ORDER BY created_at DESC
+            models.Index(fields=['order', '-created_at'], name='orderlog_order_created_idx'),
+        ]
         
     def __str__(self):
         return f"{self.order.order_number} - {self.action} - {self.created_at}"
@@ -372,3 +422,17 @@ class OrderItem(models.Model):
     @property
     def total_price(self):
         return self.price * self.quantity
+
+
+class OrderNumberSequence(models.Model):
+    """订单号日序列，每天一行，last_value为当天已分配出去的最大序号（见 order/numbering.py）"""
+    day = models.DateField(unique=True, verbose_name=_('日期'))
+    last_value = models.BigIntegerField(default=0, verbose_name=_('已分配序号'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('更新时间'))
+
+    class Meta:
+        verbose_name = _('订单号序列')
+        verbose_name_plural = _('订单号序列')
+
+    def __str__(self):
+        return f"{self.day} - {self.last_value}"
@@ -0,0 +1,119 @@
+"""
+订单号分配
+
+订单号格式: YYYYMMDD + 9位当日序号（共17位），例如 20261018000000001
+- 每天一行OrderNumberSequence，分配时用一条 UPDATE last_value = last_value + N 预留一段序号，
+  数据库行锁保证多个gunicorn/Celery进程拿到的号段互不重叠
+- 每个进程缓存一段号段(BLOCK_SIZE)，号段用完或跨天时才访问数据库，同一进程内当天的订单号按号段递增
+- 进程重启时未用完的号段会被跳过（订单号可能不连续，但不会重复）；BLOCK_SIZE设为1时全局严格递增
+- 旧的随机订单号为16位，与新格式长度不同，不会发生冲突
+
+压测: python manage.py loadtest_order_numbers --workers 8 --count 20000
+"""
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OrderNumberSequence
+
+DEFAULT_ORDER_NUMBER_SETTINGS = {
+    'BLOCK_SIZE': 50,  # 每次从数据库预留的序号数量
+    'SEQUENCE_DIGITS': 9,  # 当日序号位数
+}
+
+
+def get_order_number_settings():
+    """读取ORDER_NUMBER配置，未配置的项使用默认值"""
+    config = dict(DEFAULT_ORDER_NUMBER_SETTINGS)
+    config.update(getattr(settings, 'ORDER_NUMBER', {}))
+    return config
+
+
+def reserve_block(day, size):
+    """
+    为指定日期预留size个序号，返回 (起始序号, 结束序号)，两端都包含
+    UPDATE持有行锁直到事务提交，并发进程会排队依次拿到相邻且不重叠的号段
+    """
+    with transaction.atomic():
+        updated = OrderNumberSequence.objects.filter(day=day).update(last_value=F('last_value') + size)
+        if not updated:
+            try:
+                # 当天第一次分配，并发创建时只有一个进程成功，其余进程回到UPDATE
+                with transaction.atomic():
+                    OrderNumberSequence.objects.create(day=day, last_value=size)
+            except IntegrityError:
+                OrderNumberSequence.objects.filter(day=day).update(last_value=F('last_value') + size)
+        last_value = OrderNumberSequence.objects.filter(day=day).values_list('last_value', flat=True).get()
+    return last_value - size + 1, last_value
+
+
+def format_order_number(day, sequence, digits=None):
+    digits = digits or get_order_number_settings()['SEQUENCE_DIGITS']
+    return f"{day.strftime('%Y%m%d')}{sequence:0{digits}d}"
+
+
+class OrderNumberAllocator:
+    """
+    进程内号段分配器（线程安全）
+    用法:
+        order_number = order_number_allocator.allocate()
+
+    在事务中分配时，新预留的号段要等事务提交后才放入进程缓存：
+    事务回滚会连同序列行的更新一起撤销，此时缓存号段会与其他进程重新预留的号段重复
+    """
+
+    def __init__(self, block_size=None, date_func=None):
+        self._lock = threading.Lock()
+        self._block_size = block_size
+        # 返回当前日期的函数，压测时可指定固定日期，避免占用当天的真实序号
+        self._date_func = date_func or timezone.localdate
+        self._day = None
+        self._next = 1
+        self._end = 0
+
+    @property
+    def block_size(self):
+        return self._block_size or get_order_number_settings()['BLOCK_SIZE']
+
+    def _take(self, today):
+        """从缓存号段中取一个序号，号段用完或跨天时返回None（调用方需持有锁）"""
+        if today != self._day or self._next > self._end:
+            return None
+        sequence = self._next
+        self._next += 1
+        return sequence
+
+    def _install(self, day, start, end):
+        """放入新号段，当前号段仍可用时丢弃新号段（只产生空号，不会重复）"""
+        with self._lock:
+            if day != self._day or self._next > self._end:
+                self._day, self._next, self._end = day, start, end
+
+    def allocate(self):
+        """分配一个订单号"""
+        today = self._date_func()
+        with self._lock:
+            sequence = self._take(today)
+            if sequence is None and not transaction.get_connection().in_atomic_block:
+                start, end = reserve_block(today, self.block_size)
+                self._day, self._next, self._end = today, start + 1, end
+                sequence = start
+        if sequence is not None:
+            return format_order_number(today, sequence)
+
+        start, end = reserve_block(today, self.block_size)
+        if end > start:
+            transaction.on_commit(lambda: self._install(today, start + 1, end))
+        return format_order_number(today, start)
+
+    def reset(self):
+        """丢弃进程内缓存的号段（测试或切换数据库后使用）"""
+        with self._lock:
+            self._day = None
+            self._next, self._end = 1, 0
+
+
+order_number_allocator = OrderNumberAllocator()
@@ -1,3 +1,147 @@
+import datetime
+import io
+import zipfile
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Order, OrderLog, OrderNumberSequence
+from .numbering import OrderNumberAllocator, reserve_block
+from .transitions import InvalidTransition, bulk_transition, run_bulk_transition, transition
+
+
+class OrderNumberAllocatorTests(TestCase):
+    day = datetime.date(2000, 1, 1)
+
+    def make_allocator(self, block_size=5, day=None):
+        return OrderNumberAllocator(block_size=block_size, date_func=lambda: day or self.day)
+
+    def test_numbers_are_unique_and_increasing(self):
+        allocator = self.make_allocator()
+        numbers = [allocator.allocate() for _ in range(23)]
+        self.assertEqual(len(set(numbers)), len(numbers))
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertTrue(all(number.startswith('20000101') and len(number) == 17 for number in numbers))
+
+    def test_allocators_never_share_blocks(self):
+        first = self.make_allocator(block_size=3)
+        second = self.make_allocator(block_size=4)
+        numbers = []
+        for _ in range(10):
+            numbers.append(first.allocate())
+            numbers.append(second.allocate())
+        self.assertEqual(len(set(numbers)), len(numbers))
+
+    def test_reserve_block_advances_sequence(self):
+        self.assertEqual(reserve_block(self.day, 10), (1, 10))
+        self.assertEqual(reserve_block(self.day, 5), (11, 15))
+        self.assertEqual(OrderNumberSequence.objects.get(day=self.day).last_value, 15)
+
+    def test_new_day_restarts_sequence(self):
+        current = {'day': self.day}
+        allocator = OrderNumberAllocator(block_size=5, date_func=lambda: current['day'])
+        self.assertEqual(allocator.allocate(), '20000101000000001')
+        current['day'] = self.day + datetime.timedelta(days=1)
+        self.assertEqual(allocator.allocate(), '20000102000000001')
+
+
+class OrderTransitionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', password='pass')
+
+    def make_order(self, status='paid'):
+        return Order.objects.create(
+            user=self.user,
+            total_amount=Decimal('20.00'),
+            status=status,
+            recipient_name='张三',
+            recipient_phone='13800000000',
+            shipping_address_text='测试地址',
+        )
+
+    def test_transition_updates_order_and_writes_log(self):
+        order = self.make_order()
+        with CaptureQueriesContext(connection) as queries:
+            order.mark_as_shipped(tracking_number='SF001', shipping_carrier='顺丰', user=self.user)
+        # 只有一条UPDATE和一条日志INSERT，不读取支付记录、收货地址等关联对象
+        statements = [query['sql'].split()[0].upper() for query in queries.captured_queries]
+        self.assertEqual([sql for sql in statements if sql in ('SELECT', 'UPDATE', 'INSERT')], ['UPDATE', 'INSERT'])
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'shipped')
+        self.assertEqual(order.tracking_number, 'SF001')
+        self.assertIsNotNone(order.shipped_at)
+        log = order.logs.get()
+        self.assertEqual((log.status_from, log.status_to), ('paid', 'shipped'))
+
+    def test_invalid_transition_is_rejected(self):
+        order = self.make_order(status='pending')
+        with self.assertRaises(InvalidTransition):
+            transition(order, 'deliver')
+        self.assertFalse(OrderLog.objects.exists())
+
+    def test_bulk_transition_skips_invalid_orders(self):
+        orders = [self.make_order() for _ in range(3)]
+        cancelled = self.make_order(status='cancelled')
+        params_by_pk = {order.pk: {'tracking_number': f'SF{index}'} for index, order in enumerate(orders)}
+
+        logs, failures = bulk_transition(Order.objects.all(), 'ship', params_by_pk=params_by_pk)
+
+        self.assertEqual(len(logs), 3)
+        self.assertEqual([order.pk for order, _ in failures], [cancelled.pk])
+        self.assertEqual(Order.objects.filter(status='shipped').count(), 3)
+        self.assertEqual(OrderLog.objects.count(), 3)
+        self.assertEqual(Order.objects.get(pk=orders[1].pk).tracking_number, 'SF1')
+
+    def test_run_bulk_transition_batches_and_reports_failures(self):
+        for _ in range(5):
+            self.make_order(status='delivered')
+        pending = self.make_order(status='pending')
+
+        result = run_bulk_transition(Order.objects.all(), 'complete', batch_size=2, user=self.user)
+
+        self.assertEqual(result.succeeded, 5)
+        self.assertEqual(result.failures[0][0], pending.order_number)
+        self.assertEqual(result.failed, 1)
+        self.assertEqual(Order.objects.filter(status='completed').count(), 5)
+        self.assertEqual(OrderLog.objects.filter(action='完成订单').count(), 5)
+
+
+class ReconciliationExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='finance', password='pass')
+        for index, site_code in enumerate(['us', 'us', 'asia']):
+            Order.objects.create(
+                user=cls.admin,
+                total_amount=Decimal('10.00') + index,
+                site_code=site_code,
+                payment_platform='paypal',
+                recipient_name='李四',
+                recipient_phone='13900000000',
+                shipping_address_text='测试地址',
+            )
+
+    def test_csv_export_streams_filtered_rows(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('order:export', args=['orders']), {'site': 'us', 'platform': 'PayPal'})
+
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 3)  # 表头 + 2个us站点订单
+        self.assertTrue(lines[0].startswith('订单号,下单站点'))
+
+    def test_xlsx_export_is_valid_archive(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('order:export', args=['orders']), {'format': 'xlsx'})
 
-# Create your tests here.
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.read('xl/worksheets/sheet1.xml').count(b'<row>'), 4)
@@ -0,0 +1,261 @@
+"""
+订单状态流转
+
+每种流转定义允许的原状态、目标状态以及需要同时修改的字段。执行流转时只写入实际变化的字段，
+订单更新和对应的OrderLog在同一个事务中完成：
+- transition(order, 'ship', tracking_number=..., user=...)  单个订单，save(update_fields) + 一条日志
+- bulk_transition(queryset, 'ship', params_by_pk={...})     批量订单，bulk_update + bulk_create(OrderLog)
+- run_bulk_transition(queryset, 'ship')                    按批次执行批量流转并汇总每个订单的失败原因（后台动作使用）
+
+用法:
+    from order.transitions import transition, InvalidTransition
+    try:
+        transition(order, 'cancel', user=request.user, reason='不想要了')
+    except InvalidTransition as e:
+        ...
+"""
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .models import Order, OrderLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRANSITION_SETTINGS = {
+    'BATCH_SIZE': 500,  # 批量流转每批处理的订单数量（每批一个事务）
+}
+
+
+def get_transition_settings():
+    """读取ORDER_TRANSITIONS配置，未配置的项使用默认值"""
+    config = dict(DEFAULT_TRANSITION_SETTINGS)
+    config.update(getattr(settings, 'ORDER_TRANSITIONS', {}))
+    return config
+
+
+class InvalidTransition(ValueError):
+    """订单当前状态不允许执行该流转"""
+
+
+class Transition:
+    """
+    一种订单状态流转
+    sources: 允许的原状态；target: 目标状态，为None时不修改订单状态(只修改退款状态等字段)
+    timestamp_field: 流转时记录当前时间的字段；updater: 返回需要额外修改的字段 {字段名: 新值}
+    """
+
+    def __init__(self, name, label, sources, target=None, timestamp_field=None, updater=None):
+        self.name = name
+        self.label = label
+        self.sources = frozenset(sources)
+        self.target = target
+        self.timestamp_field = timestamp_field
+        self.updater = updater
+
+    def check(self, order):
+        if order.status not in self.sources:
+            raise InvalidTransition(
+                f"订单 {order.order_number} 当前状态为 {order.get_status_display()}，不能执行{self.label}"
+            )
+
+    def apply(self, order, now=None, **params):
+        """校验并修改订单属性（不写数据库），返回实际发生变化的字段名列表"""
+        self.check(order)
+        changes = {}
+        if self.target:
+            changes['status'] = self.target
+        if self.timestamp_field:
+            changes[self.timestamp_field] = now or timezone.now()
+        if self.updater:
+            changes.update(self.updater(order, **params))
+
+        changed = []
+        for field, value in changes.items():
+            if getattr(order, field) != value:
+                setattr(order, field, value)
+                changed.append(field)
+        return changed
+
+
+def _append_note(order, prefix, reason):
+    if not reason:
+        return {}
+    return {'admin_notes': f"{order.admin_notes}\n{prefix}: {reason}"}
+
+
+def _ship_fields(order, tracking_number=None, shipping_carrier=None, **params):
+    fields = {}
+    if tracking_number is not None:
+        fields['tracking_number'] = tracking_number
+    if shipping_carrier is not None:
+        fields['shipping_carrier'] = shipping_carrier
+    return fields
+
+
+def _cancel_fields(order, reason='', **params):
+    return _append_note(order, '取消原因', reason)
+
+
+def _refund_request_fields(order, amount=None, reason='', **params):
+    fields = {'is_refunding': True, 'refund_status': 'pending', 'refund_reason': reason}
+    if amount is not None:
+        fields['refund_amount'] = amount
+    return fields
+
+
+def _refund_reject_fields(order, reason='', **params):
+    fields = {'refund_status': 'rejected', 'is_refunding': False}
+    fields.update(_append_note(order, '拒绝退款原因', reason))
+    return fields
+
+
+TRANSITIONS = {
+    spec.name: spec
+    for spec in [
+        Transition('pay', '标记已支付', ['pending'], 'paid'),
+        Transition('process', '处理订单', ['paid'], 'processing'),
+        Transition('ship', '发货', ['paid', 'processing'], 'shipped', 'shipped_at', _ship_fields),
+        Transition('deliver', '确认收货', ['shipped'], 'delivered', 'delivered_at'),
+        Transition('complete', '完成订单', ['delivered'], 'completed', 'completed_at'),
+        Transition('cancel', '取消订单', ['pending', 'paid', 'processing'], 'cancelled', updater=_cancel_fields),
+        Transition(
+            'request_refund', '申请退款', ['paid', 'processing', 'shipped', 'delivered'], 'refunding',
+            updater=_refund_request_fields
+        ),
+        Transition(
+            'process_refund', '处理退款', ['refunding'],
+            updater=lambda order, **params: {'refund_status': 'processing'}
+        ),
+        Transition(
+            'approve_refund', '批准退款', ['refunding'],
+            updater=lambda order, **params: {'refund_status': 'approved'}
+        ),
+        Transition(
+            'complete_refund', '退款完成', ['refunding'], 'refunded', 'refunded_at',
+            lambda order, **params: {'refund_status': 'completed'}
+        ),
+        Transition('reject_refund', '拒绝退款', ['refunding'], 'paid', updater=_refund_reject_fields),
+    ]
+}
+
+
+def get_transition(name):
+    try:
+        return TRANSITIONS[name]
+    except KeyError:
+        raise ValueError(f"未知的订单流转: {name}")
+
+
+def _build_log(order, spec, status_from, changed, user=None, note='', is_system=False, data=None):
+    return OrderLog(
+        order=order,
+        action=spec.label,
+        status_from=status_from,
+        status_to=order.status,
+        data={'transition': spec.name, 'fields': changed, **(data or {})},
+        note=note,
+        user=user,
+        is_system=is_system,
+    )
+
+
+def transition(order, name, user=None, note='', is_system=False, data=None, **params):
+    """
+    执行单个订单的流转，返回写入的OrderLog
+    只保存发生变化的字段，订单更新与日志写入在同一事务中
+    """
+    spec = get_transition(name)
+    status_from = order.status
+    now = timezone.now()
+    changed = spec.apply(order, now=now, **params)
+
+    with transaction.atomic():
+        order.save(update_fields=changed + ['updated_at'])
+        log = _build_log(order, spec, status_from, changed, user, note, is_system, data)
+        log.save(force_insert=True)
+    return log
+
+
+def bulk_transition(orders, name, params_by_pk=None, user=None, note='', is_system=False,
+                    batch_size=500, **params):
+    """
+    批量执行流转，返回 (OrderLog列表, 失败列表[(订单, 原因)])
+    orders可以是查询集或订单列表；传入查询集时在事务内加行锁读取，避免与并发流转冲突
+    params对所有订单生效，params_by_pk按订单主键提供各自的参数（如每个订单的物流单号）
+    状态不允许流转的订单跳过并记入失败列表，其余订单用bulk_update + bulk_create写入
+    """
+    spec = get_transition(name)
+    params_by_pk = params_by_pk or {}
+    now = timezone.now()
+
+    with transaction.atomic():
+        if hasattr(orders, 'select_for_update'):
+            orders = orders.select_for_update()
+        logs = []
+        updated = []
+        failures = []
+        changed_fields = set()
+
+        for order in orders:
+            status_from = order.status
+            try:
+                changed = spec.apply(order, now=now, **{**params, **params_by_pk.get(order.pk, {})})
+            except InvalidTransition as e:
+                failures.append((order, str(e)))
+                continue
+            order.updated_at = now
+            changed_fields.update(changed)
+            updated.append(order)
+            logs.append(_build_log(order, spec, status_from, changed, user, note, is_system))
+
+        if updated:
+            Order.objects.bulk_update(updated, sorted(changed_fields | {'updated_at'}), batch_size=batch_size)
+            OrderLog.objects.bulk_create(logs, batch_size=batch_size)
+
+    logger.info(f"批量{spec.label}: 成功 {len(updated)} 个订单，跳过 {len(failures)} 个")
+    return logs, failures
+
+
+class BulkTransitionResult:
+    """批量流转结果：成功数量和每个失败订单的原因"""
+
+    def __init__(self, transition_name):
+        self.transition = get_transition(transition_name)
+        self.succeeded = 0
+        self.failures = []  # [(订单号, 原因)]
+
+    @property
+    def failed(self):
+        return len(self.failures)
+
+    def summary(self):
+        return f"{self.transition.label}: 成功 {self.succeeded} 个，失败 {self.failed} 个"
+
+
+def run_bulk_transition(queryset, name, batch_size=None, **kwargs):
+    """
+    按批次对查询集中的订单执行流转，返回BulkTransitionResult
+    每批一个事务：单批写入失败只影响该批订单，不会回滚已完成的批次
+    kwargs透传给bulk_transition（user、note、params_by_pk及流转参数）
+    """
+    batch_size = batch_size or get_transition_settings()['BATCH_SIZE']
+    result = BulkTransitionResult(name)
+    pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+
+    for start in range(0, len(pks), batch_size):
+        batch = Order.objects.filter(pk__in=pks[start:start + batch_size])
+        try:
+            logs, failures = bulk_transition(batch, name, batch_size=batch_size, **kwargs)
+        except DatabaseError as e:
+            logger.error(f"批量{result.transition.label}第{start // batch_size + 1}批写入失败: {str(e)}")
+            result.failures.extend(
+                (order_number, f"写入失败: {str(e)}")
+                for order_number in batch.values_list('order_number', flat=True)
+            )
+            continue
+        result.succeeded += len(logs)
+        result.failures.extend((order.order_number, reason) for order, reason in failures)
+    return result
@@ -8,4 +8,5 @@ urlpatterns = [
     path('create/', views.create_order, name='create'),
     path('detail/<int:order_id>/', views.order_detail, name='detail'),
     path('cancel/<int:order_id>/', views.cancel_order, name='cancel'),
+    path('export/<str:dataset>/', views.export_reconciliation, name='export'),
 ] 
\ No newline at end of file
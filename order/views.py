@@ -1,7 +1,11 @@
+import datetime
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, HttpResponseBadRequest, HttpResponseForbidden, Http404
 from .models import Order, OrderItem
+from .exports import EXPORTS, FORMATS, stream_export
 from goods.models import Goods
 
 @login_required
@@ -33,3 +37,42 @@ def cancel_order(request, order_id):
         order.save()
         return redirect('order:detail', order_id=order.id)
     return render(request, 'order/cancel_order.html', {'order': order})
+
+
+@staff_member_required
+def export_reconciliation(request, dataset):
+    """
+    流式导出对账数据（orders/refunds/payments）
+    查询参数: start、end(YYYY-MM-DD，包含当天)、site、platform、format(csv/xlsx，默认csv)
+    """
+    spec = EXPORTS.get(dataset)
+    if spec is None:
+        raise Http404
+    if not request.user.has_perm(f'{spec.model._meta.app_label}.view_{spec.model._meta.model_name}'):
+        return HttpResponseForbidden('没有导出该数据的权限')
+    
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in FORMATS:
+        return HttpResponseBadRequest('format只支持csv或xlsx')
+    
+    filters = {}
+    try:
+        for key in ('start', 'end'):
+            if request.GET.get(key):
+                filters[key] = datetime.date.fromisoformat(request.GET[key])
+    except ValueError:
+        return HttpResponseBadRequest('日期格式应为YYYY-MM-DD')
+    filters['site_code'] = request.GET.get('site') or None
+    filters['platform'] = request.GET.get('platform') or None
+    
+    response = StreamingHttpResponse(
+        stream_export(dataset, file_format, **filters),
+        content_type=FORMATS[file_format][1],
+    )
+    period = '_'.join(str(filters[key]) for key in ('start', 'end') if key in filters)
+    filename = f"{dataset}_{period or 'all'}.{file_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-cache'
+    # 告知nginx不要缓冲，第一批数据生成后立即发送给客户端
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -100,6 +100,7 @@ class CoinbaseCommercePaymentDetailInline(admin.StackedInline):
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ('id', 'payment_method', 'amount', 'currency', 'status', 'transaction_id', 'created_at')
+    list_select_related = ('payment_method',)
     list_filter = ('status', 'payment_method', 'currency', 'is_anonymous')
     search_fields = ('id', 'payer_email', 'payer_name', 'transaction_id')
     readonly_fields = ('id', 'created_at', 'updated_at', 'completed_at', 'payment_data', 'transaction_id')
@@ -129,7 +130,20 @@ class PaymentAdmin(admin.ModelAdmin):
 
 @admin.register(PaymentWebhookLog)
 class PaymentWebhookLogAdmin(admin.ModelAdmin):
-    list_display = ('id', 'event_type', 'status', 'created_at')
-    list_filter = ('event_type', 'status', 'created_at')
-    search_fields = ('id', 'event_type', 'payload')
-    readonly_fields = ('id', 'created_at', 'payload', 'response')
+    list_display = ('id', 'provider', 'event_type', 'status', 'payment', 'attempts', 'created_at', 'processed_at')
+    list_filter = ('provider', 'status', 'created_at')
+    search_fields = ('id', 'event_id', 'ordering_key', 'event_type')
+    readonly_fields = (
+        'id', 'provider', 'event_id', 'ordering_key', 'payment', 'created_at', 'processed_at',
+        'attempts', 'payload', 'headers', 'response',
+    )
+    list_select_related = ('payment__payment_method',)
+    actions = ['replay_events']
+
+    @admin.action(description='重放选中的Webhook事件')
+    def replay_events(self, request, queryset):
+        """把选中的事件重新置为待处理并按支付分组投递处理任务"""
+        from .webhooks import replay
+        count = replay(queryset)
+        self.message_user(request, f"已重新投递 {count} 个Webhook事件")
+
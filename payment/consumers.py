@@ -0,0 +1,30 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .usdt import get_cached_status
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentStatusConsumer(AsyncJsonWebsocketConsumer):
+    """推送单个支付的状态变化，代替客户端轮询 check_payment_status_api"""
+
+    async def connect(self):
+        self.payment_id = self.scope['url_route']['kwargs']['payment_id']
+        self.group_name = f"payment_status_{self.payment_id}"
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        # 连接时先发送一次当前状态（只读缓存，不访问数据库）
+        status = await sync_to_async(get_cached_status)(self.payment_id)
+        if status is not None:
+            await self.send_json(status)
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def payment_status(self, event):
+        """处理 payment.status 事件（见 payment/usdt.py publish_status）"""
+        await self.send_json(event['status'])
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from payment.models import PaymentMethod
+from payment.registry import PROCESSOR_CLASSES, payment_processor_registry
+
+
+class Command(BaseCommand):
+    help = '支付处理器获取压测：对比每次查询PaymentMethod与注册表缓存两种方式的耗时和查询次数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10000, help='每种方式获取处理器的次数')
+        parser.add_argument('--code', default=None, help='支付方式代码，默认使用第一个启用的支付方式')
+
+    def count_queries(self, func, times=1):
+        """执行func并返回 (耗时秒数, 查询次数)"""
+        counter = []
+
+        def wrapper(execute, sql, params, many, context):
+            counter.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(wrapper):
+            started = time.perf_counter()
+            for _ in range(times):
+                func()
+            elapsed = time.perf_counter() - started
+        return elapsed, len(counter)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        code = options['code']
+        if code is None:
+            code = PaymentMethod.objects.filter(is_active=True).values_list('code', flat=True).first()
+        if code is None:
+            raise CommandError('没有启用的支付方式，请先执行 setup_payment_methods')
+
+        def legacy():
+            # 注册表之前的实现：每次查询支付方式并创建新的处理器
+            method = PaymentMethod.objects.get(code=code, is_active=True)
+            return PROCESSOR_CLASSES[method.payment_type](method)
+
+        payment_processor_registry.invalidate()
+        _, cold_queries = self.count_queries(lambda: payment_processor_registry.get(code))
+        if payment_processor_registry.get(code) is None:
+            raise CommandError(f'支付方式 {code} 未启用或没有注册处理器')
+        self.stdout.write(f'注册表冷启动: {cold_queries} 次查询')
+
+        for name, func in [('每次查询', legacy), ('注册表缓存', lambda: payment_processor_registry.get(code))]:
+            elapsed, queries = self.count_queries(func, iterations)
+            self.stdout.write(
+                f'{name:<8} {iterations}次 耗时 {elapsed * 1000:.1f} ms，'
+                f'平均 {elapsed / iterations * 1e6:.1f} µs/次，查询 {queries} 次'
+            )
@@ -0,0 +1,81 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from payment.models import PaymentWebhookLog
+from payment.webhooks import PROVIDERS, get_webhook_settings, replay
+
+
+class Command(BaseCommand):
+    help = '重放处理失败或未匹配到支付的Webhook事件，以及投递任务失败后长时间未处理的事件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', help='指定要重放的事件ID，不指定时按条件筛选失败和未匹配的事件')
+        parser.add_argument('--provider', choices=sorted(PROVIDERS), help='只重放指定支付平台的事件')
+        parser.add_argument('--since', help='只重放该时间之后接收的事件(YYYY-MM-DD 或 ISO格式时间)')
+        parser.add_argument(
+            '--stale-pending', type=int, default=None, dest='stale_pending', metavar='MINUTES',
+            help='同时重放接收超过指定分钟数仍未处理的事件',
+        )
+        parser.add_argument('--limit', type=int, default=500, help='最多重放的事件数量')
+        parser.add_argument('--force', action='store_true', help='包含处理次数已达MAX_ATTEMPTS的事件')
+        parser.add_argument('--async', action='store_true', dest='use_celery', help='投递Celery任务处理，默认在当前进程中处理')
+        parser.add_argument('--dry-run', action='store_true', dest='dry_run', help='只列出将要重放的事件')
+
+    def handle(self, *args, **options):
+        queryset = PaymentWebhookLog.objects.all()
+        if options['ids']:
+            queryset = queryset.filter(pk__in=options['ids'])
+        else:
+            condition = Q(status__in=['failed', 'unmatched'])
+            if options['stale_pending'] is not None:
+                cutoff = timezone.now() - datetime.timedelta(minutes=options['stale_pending'])
+                condition |= Q(status='pending', created_at__lt=cutoff)
+            queryset = queryset.filter(condition).exclude(provider='')
+
+        if options['provider']:
+            queryset = queryset.filter(provider=options['provider'])
+        if options['since']:
+            since = self.parse_since(options['since'])
+            queryset = queryset.filter(created_at__gte=since)
+        if not options['force']:
+            queryset = queryset.filter(attempts__lt=get_webhook_settings()['MAX_ATTEMPTS'])
+
+        logs = list(queryset.order_by('created_at')[:options['limit']])
+        if not logs:
+            self.stdout.write('没有需要重放的事件')
+            return
+
+        for log in logs:
+            self.stdout.write(
+                f'{log.id} {log.provider} {log.event_type} {log.status} '
+                f'已处理{log.attempts}次 {log.response.get("message", "")}'
+            )
+        if options['dry_run']:
+            self.stdout.write(f'共 {len(logs)} 个事件（未执行）')
+            return
+
+        count = replay(
+            PaymentWebhookLog.objects.filter(pk__in=[log.pk for log in logs]),
+            inline=not options['use_celery'],
+        )
+        if options['use_celery']:
+            self.stdout.write(self.style.SUCCESS(f'已投递 {count} 个事件'))
+            return
+
+        results = PaymentWebhookLog.objects.filter(pk__in=[log.pk for log in logs]).values_list('status', flat=True)
+        summary = {}
+        for status in results:
+            summary[status] = summary.get(status, 0) + 1
+        self.stdout.write(self.style.SUCCESS(f'已重放 {count} 个事件: {summary}'))
+
+    def parse_since(self, value):
+        try:
+            since = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'时间格式错误: {value}')
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
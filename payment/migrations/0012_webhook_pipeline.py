@@ -0,0 +1,60 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0011_coinbasecommercepaymentdetail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentwebhooklog',
+            name='provider',
+            field=models.CharField(blank=True, default='', help_text='支付平台', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhooklog',
+            name='event_id',
+            field=models.CharField(blank=True, default='', help_text='支付平台事件ID，用于去重', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhooklog',
+            name='ordering_key',
+            field=models.CharField(blank=True, default='', help_text='同一支付的事件按接收顺序处理', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhooklog',
+            name='headers',
+            field=models.JSONField(blank=True, default=dict, help_text='请求头'),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhooklog',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, help_text='处理次数'),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhooklog',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, help_text='处理完成时间', null=True),
+        ),
+        migrations.AlterField(
+            model_name='paymentwebhooklog',
+            name='status',
+            field=models.CharField(choices=[('pending', '待处理'), ('completed', '已完成'), ('skipped', '无需处理'), ('failed', '失败')], default='pending', help_text='处理状态', max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='paymentwebhooklog',
+            constraint=models.UniqueConstraint(condition=models.Q(('event_id', ''), _negated=True), fields=('provider', 'event_id'), name='uniq_webhook_provider_event'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentwebhooklog',
+            index=models.Index(fields=['provider', 'ordering_key', 'created_at'], name='webhook_ordering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentwebhooklog',
+            index=models.Index(fields=['status', 'created_at'], name='webhook_status_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def backfill_references(apps, schema_editor):
+    """为已有的PayPal订单和Coinbase Charge写入外部ID索引"""
+    PaymentExternalReference = apps.get_model('payment', 'PaymentExternalReference')
+    PayPalPaymentDetail = apps.get_model('payment', 'PayPalPaymentDetail')
+    CoinbaseCommercePaymentDetail = apps.get_model('payment', 'CoinbaseCommercePaymentDetail')
+
+    rows = []
+
+    def add(provider, kind, external_id, payment_id):
+        if external_id:
+            rows.append(PaymentExternalReference(
+                provider=provider, kind=kind, external_id=str(external_id), payment_id=payment_id
+            ))
+        if len(rows) >= BATCH_SIZE:
+            PaymentExternalReference.objects.bulk_create(rows, ignore_conflicts=True)
+            rows.clear()
+
+    for payment_id, paypal_order_id in PayPalPaymentDetail.objects.values_list('payment_id', 'paypal_order_id').iterator():
+        add('paypal', 'payment', payment_id, payment_id)
+        add('paypal', 'paypal_order', paypal_order_id, payment_id)
+
+    details = CoinbaseCommercePaymentDetail.objects.values_list('payment_id', 'charge_id', 'charge_code')
+    for payment_id, charge_id, charge_code in details.iterator():
+        add('coinbase', 'payment', payment_id, payment_id)
+        add('coinbase', 'coinbase_charge', charge_id, payment_id)
+        add('coinbase', 'coinbase_code', charge_code, payment_id)
+
+    PaymentExternalReference.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0012_webhook_pipeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentExternalReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(help_text='支付平台', max_length=20)),
+                ('external_id', models.CharField(help_text='外部ID', max_length=255)),
+                ('kind', models.CharField(choices=[('payment', '本站支付ID'), ('paypal_order', 'PayPal订单ID'), ('coinbase_charge', 'Coinbase Charge ID'), ('coinbase_code', 'Coinbase Charge Code')], help_text='外部ID类型', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='创建时间')),
+                ('payment', models.ForeignKey(help_text='支付记录', on_delete=django.db.models.deletion.CASCADE, related_name='external_references', to='payment.payment')),
+            ],
+            options={
+                'verbose_name': '支付外部ID',
+                'verbose_name_plural': '支付外部ID',
+                'constraints': [models.UniqueConstraint(fields=('provider', 'external_id'), name='uniq_payment_external_reference')],
+            },
+        ),
+        migrations.AddField(
+            model_name='paymentwebhooklog',
+            name='payment',
+            field=models.ForeignKey(blank=True, help_text='匹配到的支付记录', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='webhook_logs', to='payment.payment'),
+        ),
+        migrations.AlterField(
+            model_name='paymentwebhooklog',
+            name='status',
+            field=models.CharField(choices=[('pending', '待处理'), ('completed', '已完成'), ('skipped', '无需处理'), ('unmatched', '未匹配支付'), ('failed', '失败')], default='pending', help_text='处理状态', max_length=20),
+        ),
+        migrations.RunPython(backfill_references, migrations.RunPython.noop),
+    ]
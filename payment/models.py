@@ -167,19 +167,113 @@ class CreditCardPaymentDetail(models.Model):
         return f"信用卡 - {self.payment.id}"
 
 
+# 外部ID类型选项
+EXTERNAL_REFERENCE_KIND_CHOICES = [
+    ('payment', '本站支付ID'),
+    ('paypal_order', 'PayPal订单ID'),
+    ('coinbase_charge', 'Coinbase Charge ID'),
+    ('coinbase_code', 'Coinbase Charge Code'),
+]
+
+
+class PaymentExternalReferenceManager(models.Manager):
+    def record(self, payment_id, provider, references):
+        """
+        记录支付平台侧的ID，references为 [(类型, 外部ID)]，空ID忽略，已存在的记录保持不变
+        """
+        rows = [
+            self.model(provider=provider, kind=kind, external_id=str(external_id), payment_id=payment_id)
+            for kind, external_id in references
+            if external_id
+        ]
+        if rows:
+            self.bulk_create(rows, ignore_conflicts=True)
+
+    def resolve(self, provider, external_ids):
+        """按候选外部ID的先后顺序返回第一个匹配的支付记录，只执行一次查询"""
+        external_ids = [str(value) for value in external_ids if value]
+        if not external_ids:
+            return None
+        matches = {
+            reference.external_id: reference.payment
+            for reference in self.filter(provider=provider, external_id__in=external_ids).select_related('payment')
+        }
+        for external_id in external_ids:
+            if external_id in matches:
+                return matches[external_id]
+        return None
+
+
+class PaymentExternalReference(models.Model):
+    """
+    支付平台外部ID索引
+    创建支付、PayPal订单或Coinbase Charge时写入，webhook按 (provider, external_id) 一次索引查询定位支付记录
+    """
+    provider = models.CharField(max_length=20, help_text="支付平台")
+    external_id = models.CharField(max_length=255, help_text="外部ID")
+    kind = models.CharField(max_length=20, choices=EXTERNAL_REFERENCE_KIND_CHOICES, help_text="外部ID类型")
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='external_references', help_text="支付记录")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="创建时间")
+
+    objects = PaymentExternalReferenceManager()
+
+    class Meta:
+        verbose_name = "支付外部ID"
+        verbose_name_plural = "支付外部ID"
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'external_id'], name='uniq_payment_external_reference'),
+        ]
+
+    def __str__(self):
+        return f"{self.provider}:{self.external_id}"
+
+
+# Webhook处理状态选项
+WEBHOOK_STATUS_CHOICES = [
+    ('pending', '待处理'),
+    ('completed', '已完成'),
+    ('skipped', '无需处理'),
+    ('unmatched', '未匹配支付'),
+    ('failed', '失败'),
+]
+
+
 class PaymentWebhookLog(models.Model):
-    """支付Webhook日志"""
+    """
+    支付Webhook日志
+    接收时只做签名校验并写入本表，由Celery任务按ordering_key分组、按接收顺序处理（见 payment/webhooks.py）
+    """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    provider = models.CharField(max_length=20, blank=True, default='', help_text="支付平台")
+    event_id = models.CharField(max_length=255, blank=True, default='', help_text="支付平台事件ID，用于去重")
+    ordering_key = models.CharField(max_length=255, blank=True, default='', help_text="同一支付的事件按接收顺序处理")
     event_type = models.CharField(max_length=100, help_text="事件类型")
     payload = models.JSONField(default=dict, help_text="原始请求数据")
+    headers = models.JSONField(default=dict, blank=True, help_text="请求头")
     response = models.JSONField(default=dict, help_text="响应数据")
-    status = models.CharField(max_length=20, default='pending', help_text="处理状态")
+    status = models.CharField(max_length=20, choices=WEBHOOK_STATUS_CHOICES, default='pending', help_text="处理状态")
+    attempts = models.PositiveIntegerField(default=0, help_text="处理次数")
+    payment = models.ForeignKey(
+        Payment, on_delete=models.SET_NULL, null=True, blank=True, related_name='webhook_logs', help_text="匹配到的支付记录"
+    )
     created_at = models.DateTimeField(auto_now_add=True, help_text="创建时间")
+    processed_at = models.DateTimeField(null=True, blank=True, help_text="处理完成时间")
     
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Webhook日志"
         verbose_name_plural = "Webhook日志"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['provider', 'event_id'],
+                condition=~models.Q(event_id=''),
+                name='uniq_webhook_provider_event',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['provider', 'ordering_key', 'created_at'], name='webhook_ordering_idx'),
+            models.Index(fields=['status', 'created_at'], name='webhook_status_idx'),
+        ]
         
     def __str__(self):
         return f"{self.event_type} - {self.created_at}"
@@ -1,21 +1,23 @@
 import logging
 import uuid
 import json
-import requests
 from abc import ABC, abstractmethod
 from decimal import Decimal
 from django.conf import settings
 from django.urls import reverse
 from django.utils import timezone
 
+from mall.http_client import get_client
+
 from .models import (
     Payment, 
-    PaymentMethod, 
     USDTPaymentDetail, 
     PayPalPaymentDetail,
     CreditCardPaymentDetail,
     CoinbaseCommercePaymentDetail
 )
+from .registry import register_processor, payment_processor_registry
+from .usdt import get_cached_status, publish_status, status_payload
 
 logger = logging.getLogger(__name__)
 
@@ -68,6 +70,7 @@ class PaymentProcessorBase(ABC):
         return payment
 
 
+@register_processor('usdt')
 class USDTPaymentProcessor(PaymentProcessorBase):
     """USDT支付处理器"""
     
@@ -123,13 +126,11 @@ class USDTPaymentProcessor(PaymentProcessorBase):
             usdt_details.sender_address = sender_address
             usdt_details.save(update_fields=['transaction_hash', 'sender_address'])
             
-            # 更新支付状态为处理中
+            # 更新支付状态为处理中，链上确认由定时任务完成（见 payment/usdt.py）
             payment.status = 'processing'
             payment.status_message = '已提交交易哈希，等待确认中'
             payment.save(update_fields=['status', 'status_message'])
-            
-            # 在实际应用中，这里应该调用区块链API验证交易
-            # 为了简化示例，我们假设交易已经有效
+            publish_status(payment)
             
             return {
                 'success': True,
@@ -145,39 +146,16 @@ class USDTPaymentProcessor(PaymentProcessorBase):
     
     def check_payment_status(self, payment):
         """检查USDT支付状态
-        在实际应用中，这应该连接到区块链API检查交易状态
+        只读取确认任务写入的缓存，不访问区块链也不写数据库；缓存过期时按支付记录返回当前状态
         """
+        cached = get_cached_status(payment.pk)
+        if cached is not None:
+            return cached
         try:
-            usdt_details = payment.usdt_details
-            
-            # 这里应该调用区块链API检查交易状态
-            # 为了简化示例，我们假设交易已经确认
-            if usdt_details.transaction_hash and payment.status == 'processing':
-                # 模拟区块确认增加
-                usdt_details.block_confirmation += 1
-                usdt_details.save(update_fields=['block_confirmation'])
-                
-                if usdt_details.block_confirmation >= 1:  # 通常需要更多确认
-                    payment.mark_as_completed(transaction_id=usdt_details.transaction_hash)
-                    return {
-                        'success': True,
-                        'status': 'completed',
-                        'message': '支付已完成'
-                    }
-            
-            return {
-                'success': True,
-                'status': payment.status,
-                'message': payment.status_message or '正在检查交易状态'
-            }
-            
-        except Exception as e:
-            logger.error(f"检查USDT支付状态时出错: {str(e)}")
-            return {
-                'success': False,
-                'status': 'error',
-                'message': f"检查支付状态时出错: {str(e)}"
-            }
+            confirmations = payment.usdt_details.confirmation_count
+        except USDTPaymentDetail.DoesNotExist:
+            confirmations = 0
+        return status_payload(payment, confirmations)
     
     def process_webhook(self, request):
         """处理USDT支付的webhook
@@ -191,6 +169,7 @@ class USDTPaymentProcessor(PaymentProcessorBase):
         }
 
 
+@register_processor('paypal')
 class PayPalPaymentProcessor(PaymentProcessorBase):
     """PayPal支付处理器"""
     
@@ -380,6 +359,7 @@ class PayPalPaymentProcessor(PaymentProcessorBase):
             }
 
 
+@register_processor('credit_card')
 class CreditCardPaymentProcessor(PaymentProcessorBase):
     """信用卡支付处理器"""
     
@@ -564,6 +544,7 @@ class CreditCardPaymentProcessor(PaymentProcessorBase):
             }
 
 
+@register_processor('coinbase_commerce')
 class CoinbaseCommercePaymentProcessor(PaymentProcessorBase):
     """Coinbase Commerce支付处理器"""
     
@@ -574,6 +555,7 @@ class CoinbaseCommercePaymentProcessor(PaymentProcessorBase):
         self.webhook_secret = payment_method.get_config('webhook_secret', '')
         self.checkout_style = payment_method.get_config('checkout_style', 'hosted')
         self.base_url = 'https://api.commerce.coinbase.com'
+        self.http = get_client('coinbase', base_url=self.base_url)
         
     def create_payment(self, wishlist_item, amount, currency='USD', payer=None, **kwargs):
         """创建Coinbase Commerce支付记录"""
@@ -636,11 +618,7 @@ class CoinbaseCommercePaymentProcessor(PaymentProcessorBase):
                         'X-CC-Version': '2018-03-22',
                         'Content-Type': 'application/json'
                     }
-                    response = requests.post(
-                        f"{self.base_url}/charges",
-                        headers=headers,
-                        json=charge_data
-                    )
+                    response = self.http.post('/charges', headers=headers, json=charge_data)
                     
                     if response.status_code == 201:
                         data = response.json()['data']
@@ -729,10 +707,7 @@ class CoinbaseCommercePaymentProcessor(PaymentProcessorBase):
                     'X-CC-Api-Key': self.api_key,
                     'X-CC-Version': '2018-03-22'
                 }
-                response = requests.get(
-                    f"{self.base_url}/charges/{coinbase_details.charge_id}",
-                    headers=headers
-                )
+                response = self.http.get(f"/charges/{coinbase_details.charge_id}", headers=headers)
                 
                 if response.status_code == 200:
                     data = response.json()['data']
@@ -886,20 +861,10 @@ class CoinbaseCommercePaymentProcessor(PaymentProcessorBase):
 
 
 def get_payment_processor(payment_method_code):
-    """根据支付方式代码获取对应的处理器"""
-    try:
-        payment_method = PaymentMethod.objects.get(code=payment_method_code, is_active=True)
-    except PaymentMethod.DoesNotExist:
-        return None
-    
-    # 根据支付类型返回对应的处理器
-    if payment_method.payment_type == 'usdt':
-        return USDTPaymentProcessor(payment_method)
-    elif payment_method.payment_type == 'paypal':
-        return PayPalPaymentProcessor(payment_method)
-    elif payment_method.payment_type == 'credit_card':
-        return CreditCardPaymentProcessor(payment_method)
-    elif payment_method.payment_type == 'coinbase_commerce':
-        return CoinbaseCommercePaymentProcessor(payment_method)
-    else:
-        return None 
\ No newline at end of file
+    """根据支付方式代码获取对应的处理器（从注册表缓存中获取，不访问数据库）"""
+    return payment_processor_registry.get(payment_method_code)
+
+
+def get_payment_processor_for(payment):
+    """获取支付记录所用支付方式的处理器，支付方式已停用时返回None"""
+    return payment_processor_registry.get_by_id(payment.payment_method_id)
@@ -0,0 +1,150 @@
+"""
+支付处理器注册表
+
+- 处理器类按支付类型注册: @register_processor('usdt')，新增支付渠道时不需要修改查找逻辑
+- 进程内缓存全部启用的支付方式，按代码或主键获取处理器时不访问数据库
+- 处理器实例按 (支付方式主键, updated_at) 缓存，重新加载后只有配置变化的支付方式会重新创建处理器
+- 支付方式保存或删除后当前进程立即失效（见 payment/signals.py），其他进程在TTL到期后重新加载
+
+注册表中的支付方式对象和处理器在多个请求之间共享，只能读取，不要修改或保存。
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROCESSOR_REGISTRY_SETTINGS = {
+    'TTL': 60,  # 注册表有效期(秒)，到期后下一次获取时重新加载
+    'RETRY_INTERVAL': 5,  # 加载失败(如尚未迁移)时的重试间隔(秒)
+}
+
+# {支付类型: 处理器类}
+PROCESSOR_CLASSES = {}
+
+
+def get_processor_registry_settings():
+    """读取PAYMENT_PROCESSOR_REGISTRY配置，未配置的项使用默认值"""
+    config = dict(DEFAULT_PROCESSOR_REGISTRY_SETTINGS)
+    config.update(getattr(settings, 'PAYMENT_PROCESSOR_REGISTRY', {}))
+    return config
+
+
+def register_processor(payment_type):
+    """
+    注册支付类型对应的处理器类
+    用法:
+        @register_processor('usdt')
+        class USDTPaymentProcessor(PaymentProcessorBase):
+            ...
+    """
+    def decorator(cls):
+        PROCESSOR_CLASSES[payment_type] = cls
+        return cls
+    return decorator
+
+
+class _RegistryState:
+    """一次加载的支付方式快照，加载完成后整体替换，读取时无需加锁"""
+
+    def __init__(self, methods, by_code, by_id, expires_at):
+        self.methods = methods  # 按Meta.ordering排序的启用支付方式
+        self.by_code = by_code  # {code: PaymentMethod}
+        self.by_id = by_id  # {pk: PaymentMethod}
+        self.expires_at = expires_at
+
+
+class PaymentProcessorRegistry:
+    """
+    支付处理器注册表
+    用法:
+        processor = payment_processor_registry.get('usdt_trc20')
+        processor = payment_processor_registry.get_by_id(payment.payment_method_id)
+        methods = payment_processor_registry.active_methods()
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+        self._processors = {}  # {pk: (updated_at, 处理器)}
+
+    def _load(self):
+        from .models import PaymentMethod
+
+        config = get_processor_registry_settings()
+        try:
+            methods = list(PaymentMethod.objects.filter(is_active=True))
+        except DatabaseError as e:
+            logger.error(f"加载支付方式失败: {str(e)}")
+            return _RegistryState([], {}, {}, time.monotonic() + config['RETRY_INTERVAL'])
+
+        by_id = {method.pk: method for method in methods}
+        # 丢弃已停用、已删除或配置已变化的支付方式的处理器
+        self._processors = {
+            pk: entry for pk, entry in self._processors.items()
+            if pk in by_id and entry[0] == by_id[pk].updated_at
+        }
+        logger.info(f"支付处理器注册表已加载: {len(methods)}个支付方式")
+        return _RegistryState(
+            methods, {method.code: method for method in methods}, by_id, time.monotonic() + config['TTL']
+        )
+
+    def _is_fresh(self, state):
+        return state is not None and state.expires_at > time.monotonic()
+
+    def _get_state(self):
+        state = self._state
+        if self._is_fresh(state):
+            return state
+        with self._lock:
+            # 等待锁期间可能已被其他线程加载
+            state = self._state
+            if not self._is_fresh(state):
+                state = self._load()
+                self._state = state
+        return state
+
+    def invalidate(self):
+        """使注册表失效，下一次获取时重新加载"""
+        self._state = None
+
+    def _processor_for(self, method):
+        if method is None:
+            return None
+        entry = self._processors.get(method.pk)
+        if entry is not None and entry[0] == method.updated_at:
+            return entry[1]
+
+        # 处理器类在processors模块中注册
+        from . import processors  # noqa: F401
+
+        processor_class = PROCESSOR_CLASSES.get(method.payment_type)
+        if processor_class is None:
+            logger.warning(f"支付方式 {method.code} 的支付类型 {method.payment_type} 没有注册处理器")
+            return None
+        processor = processor_class(method)
+        with self._lock:
+            self._processors[method.pk] = (method.updated_at, processor)
+        return processor
+
+    def get(self, code):
+        """按支付方式代码获取处理器，支付方式不存在、未启用或类型未注册时返回None"""
+        return self._processor_for(self._get_state().by_code.get(code))
+
+    def get_by_id(self, pk):
+        """按支付方式主键获取处理器（Payment.payment_method_id），不需要加载关联的支付方式"""
+        return self._processor_for(self._get_state().by_id.get(pk))
+
+    def get_method(self, code):
+        """按代码获取启用的支付方式对象"""
+        return self._get_state().by_code.get(code)
+
+    def active_methods(self):
+        """返回全部启用的支付方式"""
+        return list(self._get_state().methods)
+
+
+payment_processor_registry = PaymentProcessorRegistry()
@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import CoinbaseCommercePaymentDetail, PaymentExternalReference, PaymentMethod, PayPalPaymentDetail
+from .registry import payment_processor_registry
+
+
+@receiver(post_save, sender=PaymentMethod)
+@receiver(post_delete, sender=PaymentMethod)
+def invalidate_payment_processor_registry(sender, **kwargs):
+    """支付方式变更提交后使当前进程的处理器注册表失效"""
+    transaction.on_commit(payment_processor_registry.invalidate)
+
+
+@receiver(post_save, sender=PayPalPaymentDetail)
+def record_paypal_references(sender, instance, created=False, update_fields=None, **kwargs):
+    """记录PayPal订单ID和作为custom_id发送给PayPal的支付ID"""
+    if not created and update_fields is not None and 'paypal_order_id' not in update_fields:
+        return
+    PaymentExternalReference.objects.record(instance.payment_id, 'paypal', [
+        ('payment', instance.payment_id),
+        ('paypal_order', instance.paypal_order_id),
+    ])
+
+
+@receiver(post_save, sender=CoinbaseCommercePaymentDetail)
+def record_coinbase_references(sender, instance, created=False, update_fields=None, **kwargs):
+    """记录Coinbase Charge ID、Charge Code和写入metadata的支付ID"""
+    if not created and update_fields is not None and not {'charge_id', 'charge_code'} & set(update_fields):
+        return
+    PaymentExternalReference.objects.record(instance.payment_id, 'coinbase', [
+        ('payment', instance.payment_id),
+        ('coinbase_charge', instance.charge_id),
+        ('coinbase_code', instance.charge_code),
+    ])
@@ -0,0 +1,23 @@
+import logging
+
+from celery import shared_task
+from django.db import DatabaseError
+
+from .webhooks import process_events
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=5)
+def process_webhook_events(provider, ordering_key):
+    """按接收顺序处理同一支付的待处理webhook事件"""
+    count = process_events(provider, ordering_key)
+    logger.info(f"已处理{provider} webhook事件 {count} 个: {ordering_key}")
+    return count
+
+
+@shared_task(ignore_result=True)
+def confirm_usdt_payments():
+    """由Celery beat定时执行，批量确认处理中的USDT支付"""
+    from .usdt import confirm_usdt_payments as run
+    return run()
@@ -1,3 +1,422 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import threading
+import uuid
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from mall.http_client import CircuitOpenError, HttpClient, reset_clients
+
+from .models import (
+    Payment, PaymentExternalReference, PaymentMethod, PaymentWebhookLog, PayPalPaymentDetail, USDTPaymentDetail
+)
+from .processors import PayPalPaymentProcessor, USDTPaymentProcessor, get_payment_processor
+from .registry import payment_processor_registry
+from .usdt import FakeChainClient, confirm_batch, confirm_usdt_payments, get_cached_status
+from .webhooks import process_events, replay
+
+
+class PaymentProcessorRegistryTests(TestCase):
+    def setUp(self):
+        payment_processor_registry.invalidate()
+        self.usdt = PaymentMethod.objects.create(
+            name='USDT', code='usdt_trc20', payment_type='usdt', config={'wallet_address': 'T-old'}
+        )
+        PaymentMethod.objects.create(name='PayPal', code='paypal', payment_type='paypal')
+        PaymentMethod.objects.create(name='停用', code='disabled', payment_type='paypal', is_active=False)
+        payment_processor_registry.invalidate()
+
+    def tearDown(self):
+        payment_processor_registry.invalidate()
+
+    def test_processor_is_resolved_by_payment_type(self):
+        self.assertIsInstance(get_payment_processor('usdt_trc20'), USDTPaymentProcessor)
+        self.assertIsInstance(get_payment_processor('paypal'), PayPalPaymentProcessor)
+        self.assertIsNone(get_payment_processor('disabled'))
+        self.assertIsNone(get_payment_processor('missing'))
+
+    def test_warm_checkout_path_makes_no_queries(self):
+        get_payment_processor('usdt_trc20')
+        with self.assertNumQueries(0):
+            processor = get_payment_processor('usdt_trc20')
+            self.assertIs(processor, get_payment_processor('usdt_trc20'))
+            self.assertIs(processor, payment_processor_registry.get_by_id(self.usdt.pk))
+            self.assertEqual([method.code for method in payment_processor_registry.active_methods()],
+                             ['paypal', 'usdt_trc20'])
+
+    def test_saving_payment_method_rebuilds_processor(self):
+        paypal = get_payment_processor('paypal')
+        old = get_payment_processor('usdt_trc20')
+        self.assertEqual(old.wallet_address, 'T-old')
+
+        self.usdt.set_config('wallet_address', 'T-new')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usdt.save()
+
+        new = get_payment_processor('usdt_trc20')
+        self.assertIsNot(new, old)
+        self.assertEqual(new.wallet_address, 'T-new')
+        # 未修改的支付方式继续使用缓存的处理器
+        self.assertIs(get_payment_processor('paypal'), paypal)
+
+    def test_deactivated_payment_method_is_removed(self):
+        get_payment_processor('usdt_trc20')
+        self.usdt.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usdt.save()
+        self.assertIsNone(get_payment_processor('usdt_trc20'))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """按server.statuses依次返回状态码，记录每个请求使用的客户端端口"""
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self.server.requests.append((self.command, self.path, self.client_address[1]))
+        if self.path == '/slow':
+            threading.Event().wait(0.5)
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        body = json.dumps({'ok': status < 400}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _respond
+    do_POST = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpClientTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        cls.server.daemon_threads = True
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests = []
+        self.server.statuses = []
+
+    def make_client(self, **overrides):
+        options = {'BACKOFF': 0, 'RETRIES': 2, 'BREAKER_FAILURES': 3, 'BREAKER_RESET': 60}
+        options.update(overrides)
+        client = HttpClient('stub', self.base_url, **options)
+        self.addCleanup(client.close)
+        return client
+
+    def test_connections_are_reused(self):
+        client = self.make_client()
+        for _ in range(5):
+            self.assertEqual(client.get('/ping').status_code, 200)
+        ports = {port for _, _, port in self.server.requests}
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(len(ports), 1)
+
+    def test_idempotent_request_is_retried(self):
+        client = self.make_client()
+        self.server.statuses = [503, 502]
+        self.assertEqual(client.get('/ping').status_code, 200)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(client.stats.snapshot()['retries'], 2)
+
+    def test_post_is_not_retried_after_it_was_sent(self):
+        client = self.make_client()
+        self.server.statuses = [503]
+        self.assertEqual(client.post('/charges', json={}).status_code, 503)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_read_timeout(self):
+        client = self.make_client(READ_TIMEOUT=0.1, RETRIES=0)
+        with self.assertRaises(requests.ReadTimeout):
+            client.get('/slow')
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        client = self.make_client(RETRIES=0)
+        self.server.statuses = [500, 500, 500]
+        for _ in range(3):
+            self.assertEqual(client.get('/ping').status_code, 500)
+        with self.assertRaises(CircuitOpenError):
+            client.get('/ping')
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(client.breaker.state, 'open')
+        self.assertEqual(client.stats.snapshot()['rejected'], 1)
+
+    def test_logs_do_not_contain_credentials(self):
+        client = self.make_client(RETRIES=1, BREAKER_FAILURES=2)
+        self.server.statuses = [503, 503]
+        path = '/bot123456:SECRET-TOKEN/getMe?api_key=KEY'
+        with self.assertLogs('mall.http_client', level='WARNING') as logs:
+            self.assertEqual(client.get(path).status_code, 503)
+            with self.assertRaises(CircuitOpenError) as raised:
+                client.get(path)
+
+            # 连接失败时requests的异常信息中也带有URL
+            closed = HttpClient('closed', 'http://127.0.0.1:9', RETRIES=0)
+            self.addCleanup(closed.close)
+            with self.assertRaises(requests.ConnectionError):
+                closed.get(path)
+
+        output = '\n'.join(logs.output + [str(raised.exception)])
+        self.assertNotIn('SECRET-TOKEN', output)
+        self.assertNotIn('KEY', output)
+        self.assertIn('/bot***/getMe', output)
+
+    def test_half_open_probe_closes_circuit(self):
+        client = self.make_client(RETRIES=0, BREAKER_FAILURES=1, BREAKER_RESET=0)
+        self.server.statuses = [500]
+        client.get('/ping')
+        self.assertEqual(client.breaker.state, 'half_open')
+        self.assertEqual(client.get('/ping').status_code, 200)
+        self.assertEqual(client.breaker.state, 'closed')
+
+
+class FakePayPalHandler(BaseHTTPRequestHandler):
+    """模拟PayPal的OAuth和verify-webhook-signature接口，签名为 valid-sig 且webhook ID匹配时校验通过"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.requests.append(self.path)
+        if self.path == '/v1/oauth2/token':
+            payload = {'access_token': 'token', 'expires_in': 3600}
+        else:
+            data = json.loads(body)
+            valid = (
+                self.headers.get('Authorization') == 'Bearer token'
+                and data['webhook_id'] == 'WH-ID'
+                and data['transmission_sig'] == 'valid-sig'
+                and data['webhook_event'].get('id')
+            )
+            payload = {'verification_status': 'SUCCESS' if valid else 'FAILURE'}
+        response = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@mock.patch('payment.webhooks.enqueue')
+class WebhookPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakePayPalHandler)
+        cls.server.daemon_threads = True
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        reset_clients()
+        self.addCleanup(reset_clients)
+        self.server.requests = []
+        self.settings = override_settings(
+            PAYPAL_CLIENT_ID='client', PAYPAL_CLIENT_SECRET='secret', PAYPAL_WEBHOOK_ID='WH-ID',
+            PAYMENT_WEBHOOKS={'PAYPAL_API_URL': f'http://127.0.0.1:{self.server.server_address[1]}'},
+        )
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.method = PaymentMethod.objects.create(name='PayPal', code='paypal', payment_type='paypal')
+        self.payment = Payment.objects.create(payment_method=self.method, amount=Decimal('10.00'))
+        PayPalPaymentDetail.objects.create(payment=self.payment, paypal_order_id='PPORD-1')
+
+    def post_paypal(self, event_id, event_type, custom_id=None, signature='valid-sig'):
+        body = {
+            'id': event_id,
+            'event_type': event_type,
+            'resource': {'id': f'CAPTURE-{event_id}', 'custom_id': str(custom_id or self.payment.id)},
+        }
+        headers = {
+            'HTTP_PAYPAL_AUTH_ALGO': 'SHA256withRSA',
+            'HTTP_PAYPAL_CERT_URL': 'https://api.paypal.com/v1/notifications/certs/CERT',
+            'HTTP_PAYPAL_TRANSMISSION_ID': f'T-{event_id}',
+            'HTTP_PAYPAL_TRANSMISSION_SIG': signature,
+            'HTTP_PAYPAL_TRANSMISSION_TIME': '2026-10-18T10:00:00Z',
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('paypal-webhook'), data=json.dumps(body), content_type='application/json', **headers
+            )
+
+    def test_paypal_signature_is_verified(self, enqueue):
+        response = self.post_paypal('WH-1', 'PAYMENT.CAPTURE.COMPLETED', signature='forged')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentWebhookLog.objects.exists())
+        enqueue.assert_not_called()
+
+        # 访问令牌缓存，第二次只调用校验接口
+        self.assertEqual(self.post_paypal('WH-1', 'PAYMENT.CAPTURE.COMPLETED').status_code, 200)
+        self.assertEqual(self.server.requests, [
+            '/v1/oauth2/token',
+            '/v1/notifications/verify-webhook-signature',
+            '/v1/notifications/verify-webhook-signature',
+        ])
+
+    def test_paypal_rejected_without_webhook_id(self, enqueue):
+        with override_settings(PAYPAL_WEBHOOK_ID=''):
+            response = self.post_paypal('WH-1', 'PAYMENT.CAPTURE.COMPLETED')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentWebhookLog.objects.exists())
+        self.assertEqual(self.server.requests, [])
+
+    def test_webhook_is_acknowledged_and_deduplicated(self, enqueue):
+        response = self.post_paypal('WH-1', 'PAYMENT.CAPTURE.COMPLETED')
+        self.assertEqual(response.json()['status'], 'accepted')
+        enqueue.assert_called_once_with('paypal', str(self.payment.id))
+
+        response = self.post_paypal('WH-1', 'PAYMENT.CAPTURE.COMPLETED')
+        self.assertEqual(response.json()['status'], 'duplicate')
+        self.assertEqual(PaymentWebhookLog.objects.count(), 1)
+        self.assertEqual(enqueue.call_count, 1)
+        # 接收时不处理事件
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+
+    def test_events_are_processed_in_order_per_payment(self, enqueue):
+        self.post_paypal('WH-1', 'PAYMENT.CAPTURE.PENDING')
+        self.post_paypal('WH-2', 'PAYMENT.CAPTURE.COMPLETED')
+        self.post_paypal('WH-3', 'PAYMENT.CAPTURE.COMPLETED')
+
+        self.assertEqual(process_events('paypal', str(self.payment.id)), 3)
+        statuses = list(PaymentWebhookLog.objects.order_by('created_at').values_list('event_id', 'status'))
+        self.assertEqual(statuses, [('WH-1', 'skipped'), ('WH-2', 'completed'), ('WH-3', 'skipped')])
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertEqual(self.payment.transaction_id, 'CAPTURE-WH-2')
+        self.assertEqual(process_events('paypal', str(self.payment.id)), 0)
+
+    def test_failed_event_can_be_replayed(self, enqueue):
+        missing_id = uuid.uuid4()
+        self.post_paypal('WH-9', 'PAYMENT.CAPTURE.COMPLETED', custom_id=missing_id)
+        process_events('paypal', str(missing_id))
+        log = PaymentWebhookLog.objects.get(event_id='WH-9')
+        self.assertEqual(log.status, 'unmatched')
+        self.assertEqual(PaymentWebhookLog.objects.filter(status='unmatched').count(), 1)
+
+        payment = Payment.objects.create(id=missing_id, payment_method=self.method, amount=Decimal('5.00'))
+        PayPalPaymentDetail.objects.create(payment=payment, paypal_order_id='PPORD-9')
+        self.assertEqual(replay(PaymentWebhookLog.objects.filter(status='unmatched'), inline=True), 1)
+        log.refresh_from_db()
+        self.assertEqual((log.status, log.attempts, log.payment_id), ('completed', 2, missing_id))
+
+    def test_references_resolve_in_one_query(self, enqueue):
+        self.assertEqual(
+            set(self.payment.external_references.values_list('kind', 'external_id')),
+            {('payment', str(self.payment.id)), ('paypal_order', 'PPORD-1')},
+        )
+        with self.assertNumQueries(1):
+            payment = PaymentExternalReference.objects.resolve('paypal', ['', 'unknown', 'PPORD-1'])
+            self.assertEqual(payment, self.payment)
+        self.assertIsNone(PaymentExternalReference.objects.resolve('coinbase', ['PPORD-1']))
+
+    @override_settings(COINBASE_COMMERCE_WEBHOOK_SECRET='secret')
+    def test_coinbase_signature_is_checked(self, enqueue):
+        body = json.dumps({'event': {'id': 'evt-1', 'type': 'charge:confirmed', 'data': {'id': 'charge-1'}}}).encode()
+        url = reverse('coinbase-webhook')
+        response = self.client.post(url, data=body, content_type='application/json', HTTP_X_CC_WEBHOOK_SIGNATURE='bad')
+        self.assertEqual(response.status_code, 400)
+
+        signature = hmac.new(b'secret', body, hashlib.sha256).hexdigest()
+        response = self.client.post(url, data=body, content_type='application/json', HTTP_X_CC_WEBHOOK_SIGNATURE=signature)
+        self.assertEqual(response.json()['status'], 'accepted')
+        self.assertEqual(PaymentWebhookLog.objects.get().ordering_key, 'charge-1')
+
+    @override_settings(COINBASE_COMMERCE_WEBHOOK_SECRET='')
+    def test_coinbase_rejected_without_secret(self, enqueue):
+        body = json.dumps({'event': {'id': 'evt-2', 'type': 'charge:confirmed', 'data': {'id': 'charge-2'}}}).encode()
+        response = self.client.post(
+            reverse('coinbase-webhook'), data=body, content_type='application/json', HTTP_X_CC_WEBHOOK_SIGNATURE='any'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentWebhookLog.objects.exists())
+        enqueue.assert_not_called()
+
+
+@override_settings(USDT_CONFIRMATION={'CHAIN_CLIENT': 'payment.usdt.FakeChainClient', 'REQUIRED_CONFIRMATIONS': 6})
+class UsdtConfirmationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        FakeChainClient.reset()
+        self.addCleanup(FakeChainClient.reset)
+        self.method = PaymentMethod.objects.create(
+            name='USDT', code='usdt_trc20', payment_type='usdt', config={'wallet_address': 'T-wallet'}
+        )
+        self.payments = []
+        for index in range(3):
+            payment = Payment.objects.create(
+                payment_method=self.method, amount=Decimal('10.00'), currency='USDT', status='processing'
+            )
+            USDTPaymentDetail.objects.create(
+                payment=payment, wallet_address='T-wallet', transaction_hash=f'HASH{index}'
+            )
+            self.payments.append(payment)
+
+    def test_confirmations_are_updated_in_batches(self):
+        FakeChainClient.set_transaction('HASH0', 2)
+        FakeChainClient.set_transaction('HASH1', 6)
+        FakeChainClient.set_transaction('HASH2', 1, success=False)
+
+        stats = confirm_usdt_payments()
+        self.assertEqual(stats, {'checked': 3, 'updated': 2, 'completed': 1, 'failed': 1})
+
+        statuses = dict(Payment.objects.filter(pk__in=[p.pk for p in self.payments]).values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[payment.pk] for payment in self.payments], ['processing', 'completed', 'failed']
+        )
+        self.assertEqual(USDTPaymentDetail.objects.get(transaction_hash='HASH0').confirmation_count, 2)
+
+        # 确认数没有变化时不再写入
+        stats = confirm_usdt_payments()
+        self.assertEqual(stats, {'checked': 1, 'updated': 0, 'completed': 0, 'failed': 0})
+
+    def test_payment_completed_elsewhere_is_not_failed(self):
+        FakeChainClient.set_transaction('HASH0', 1, success=False)
+        detail = USDTPaymentDetail.objects.select_related('payment').get(transaction_hash='HASH0')
+        # 取出待确认支付后，webhook或后台已将支付标记为完成
+        Payment.objects.filter(pk=detail.payment_id).update(status='completed')
+
+        self.assertEqual(confirm_batch([detail], FakeChainClient(), 6), (0, 0, 0))
+        self.assertEqual(Payment.objects.get(pk=detail.payment_id).status, 'completed')
+        self.assertEqual(get_cached_status(detail.payment_id)['status'], 'completed')
+
+    def test_status_check_reads_cache_without_queries(self):
+        FakeChainClient.set_transaction('HASH0', 3)
+        confirm_usdt_payments()
+        processor = USDTPaymentProcessor(self.method)
+
+        with self.assertNumQueries(0):
+            result = processor.check_payment_status(self.payments[0])
+        self.assertEqual((result['status'], result['confirmations'], result['required_confirmations']),
+                         ('processing', 3, 6))
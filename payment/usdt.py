@@ -0,0 +1,257 @@
+"""
+USDT支付确认
+
+由Celery beat定时执行 confirm_usdt_payments（见 CELERY_BEAT_SCHEDULE），客户端不再触发任何数据库写入：
+- 收集全部已提交交易哈希、处于processing状态的USDT支付，按网络分组后批量向链上查询确认数
+- 确认数变化的记录用bulk_update一次写入；达到所需确认数的支付标记为完成，链上失败的交易标记为失败
+- 状态写入缓存并通过Channels推送到 ws/payments/<payment_id>/status/，
+  check_payment_status_api 只读缓存
+
+链上查询通过可替换的客户端完成（USDT_CONFIRMATION['CHAIN_CLIENT']）：
+- TronGridChainClient: TRC20，通过TronGrid接口查询（默认）
+- FakeChainClient: 进程内模拟数据，用于测试和本地开发
+"""
+import logging
+from dataclasses import dataclass
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from mall.http_client import get_client
+
+from .config import USDT_CONFIG
+from .models import Payment, USDTPaymentDetail
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USDT_CONFIRMATION_SETTINGS = {
+    'CHAIN_CLIENT': 'payment.usdt.TronGridChainClient',
+    'BATCH_SIZE': 100,  # 每批查询的交易数量
+    'REQUIRED_CONFIRMATIONS': None,  # 为None时使用USDT_CONFIRMATION_COUNT
+    'STATUS_CACHE_TIMEOUT': 3600,  # 支付状态缓存时间(秒)
+    'LOCK_TIMEOUT': 300,  # 防止多个beat周期重叠执行的锁时间(秒)
+    'TRONGRID_URL': 'https://api.trongrid.io',
+    'TRONGRID_API_KEY': '',
+}
+
+STATUS_CACHE_KEY = 'payment:usdt:status:{}'
+LOCK_CACHE_KEY = 'payment:usdt:confirm-lock'
+
+
+def get_confirmation_settings():
+    """读取USDT_CONFIRMATION配置，未配置的项使用默认值"""
+    config = dict(DEFAULT_USDT_CONFIRMATION_SETTINGS)
+    config.update(getattr(settings, 'USDT_CONFIRMATION', {}))
+    if config['REQUIRED_CONFIRMATIONS'] is None:
+        config['REQUIRED_CONFIRMATIONS'] = USDT_CONFIG['confirmation_count']
+    return config
+
+
+@dataclass
+class ChainTransaction:
+    """链上交易的确认状态"""
+    confirmations: int
+    success: bool = True
+
+
+class ChainClient:
+    """链上查询客户端基类"""
+
+    def get_transactions(self, network, hashes):
+        """批量查询交易，返回 {交易哈希: ChainTransaction}，链上尚未找到的交易不包含在结果中"""
+        raise NotImplementedError
+
+
+class FakeChainClient(ChainClient):
+    """进程内模拟的链上数据，测试时用 set_transaction 设置交易状态"""
+    transactions = {}
+
+    @classmethod
+    def set_transaction(cls, transaction_hash, confirmations, success=True):
+        cls.transactions[transaction_hash] = ChainTransaction(confirmations, success)
+
+    @classmethod
+    def reset(cls):
+        cls.transactions = {}
+
+    def get_transactions(self, network, hashes):
+        return {value: self.transactions[value] for value in hashes if value in self.transactions}
+
+
+class TronGridChainClient(ChainClient):
+    """
+    TRC20交易确认查询
+    每批先查询一次最新区块高度，再在同一长连接上逐个查询交易所在区块，确认数 = 最新高度 - 交易高度 + 1
+    """
+
+    def __init__(self):
+        config = get_confirmation_settings()
+        headers = {'TRON-PRO-API-KEY': config['TRONGRID_API_KEY']} if config['TRONGRID_API_KEY'] else {}
+        self.headers = headers
+        self.http = get_client('trongrid', base_url=config['TRONGRID_URL'])
+
+    def get_transactions(self, network, hashes):
+        if network != 'trc20':
+            logger.warning(f"TronGrid不支持 {network} 网络，跳过 {len(hashes)} 笔交易")
+            return {}
+
+        # 只读接口，允许重试
+        response = self.http.post('/walletsolidity/getnowblock', headers=self.headers, retry=True)
+        response.raise_for_status()
+        latest = response.json()['block_header']['raw_data']['number']
+
+        results = {}
+        for value in hashes:
+            response = self.http.post(
+                '/walletsolidity/gettransactioninfobyid', json={'value': value}, headers=self.headers, retry=True
+            )
+            response.raise_for_status()
+            info = response.json()
+            if not info.get('blockNumber'):
+                continue
+            success = info.get('receipt', {}).get('result', 'SUCCESS') == 'SUCCESS'
+            results[value] = ChainTransaction(max(0, latest - info['blockNumber'] + 1), success)
+        return results
+
+
+def get_chain_client():
+    return import_string(get_confirmation_settings()['CHAIN_CLIENT'])()
+
+
+def status_payload(payment, confirmations=0, required=None):
+    required = required or get_confirmation_settings()['REQUIRED_CONFIRMATIONS']
+    return {
+        'success': True,
+        'payment_id': str(payment.pk),
+        'status': payment.status,
+        'message': '支付已完成' if payment.status == 'completed' else (payment.status_message or ''),
+        'confirmations': confirmations,
+        'required_confirmations': required,
+    }
+
+
+def publish_status(payment, confirmations=0, required=None):
+    """写入状态缓存并推送给订阅了该支付的WebSocket客户端"""
+    payload = status_payload(payment, confirmations, required)
+    cache.set(STATUS_CACHE_KEY.format(payment.pk), payload, get_confirmation_settings()['STATUS_CACHE_TIMEOUT'])
+    try:
+        from channels.layers import get_channel_layer
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            async_to_sync(channel_layer.group_send)(
+                f"payment_status_{payment.pk}", {'type': 'payment.status', 'status': payload}
+            )
+    except Exception as e:
+        logger.error(f"推送支付状态失败 {payment.pk}: {str(e)}")
+    return payload
+
+
+def get_cached_status(payment_id):
+    """读取缓存的支付状态，未缓存时返回None"""
+    return cache.get(STATUS_CACHE_KEY.format(payment_id))
+
+
+def _complete(payment, transaction_hash):
+    """
+    加行锁后再标记完成，避免与webhook、后台操作重复处理
+    返回 (数据库中最新的支付, 是否由本次标记完成)
+    """
+    with transaction.atomic():
+        locked = Payment.objects.select_for_update().get(pk=payment.pk)
+        if locked.status != 'processing':
+            return locked, False
+        locked.mark_as_completed(transaction_id=transaction_hash)
+        return locked, True
+
+
+def _fail(payment, message):
+    """
+    只把仍在处理中的支付标记为失败，已被webhook或后台完成的支付保持原状态
+    返回 (数据库中最新的支付, 是否由本次标记失败)
+    """
+    if Payment.objects.filter(pk=payment.pk, status='processing').update(status='failed', status_message=message):
+        payment.status, payment.status_message = 'failed', message
+        return payment, True
+    payment.refresh_from_db(fields=['status', 'status_message'])
+    return payment, False
+
+
+def confirm_batch(details, client, required):
+    """确认一批USDT支付详情，返回 (更新确认数的数量, 完成数量, 失败数量)"""
+    by_network = {}
+    for detail in details:
+        by_network.setdefault(detail.network, []).append(detail)
+
+    changed = []
+    completed = failed = 0
+    for network, group in by_network.items():
+        try:
+            transactions = client.get_transactions(network, [detail.transaction_hash for detail in group])
+        except Exception as e:
+            logger.error(f"查询{network}链上交易失败，本批跳过: {str(e)}")
+            continue
+
+        for detail in group:
+            tx = transactions.get(detail.transaction_hash)
+            if tx is None:
+                continue
+            payment = detail.payment
+            if not tx.success:
+                payment, changed_status = _fail(payment, '链上交易失败')
+                failed += changed_status
+                # 推送数据库中的实际状态
+                publish_status(payment, tx.confirmations, required)
+                continue
+
+            progressed = tx.confirmations != detail.confirmation_count
+            if progressed:
+                detail.confirmation_count = tx.confirmations
+                changed.append(detail)
+            if tx.confirmations >= required:
+                payment, changed_status = _complete(payment, detail.transaction_hash)
+                completed += changed_status
+                publish_status(payment, tx.confirmations, required)
+            elif progressed:
+                publish_status(payment, tx.confirmations, required)
+
+    if changed:
+        USDTPaymentDetail.objects.bulk_update(changed, ['confirmation_count'])
+    return len(changed), completed, failed
+
+
+def confirm_usdt_payments(client=None):
+    """
+    确认全部处理中的USDT支付，返回统计 {'checked', 'updated', 'completed', 'failed'}
+    同一时间只允许一个进程执行（缓存锁），上一轮未结束时本轮直接跳过
+    """
+    config = get_confirmation_settings()
+    if not cache.add(LOCK_CACHE_KEY, 1, config['LOCK_TIMEOUT']):
+        logger.info("上一轮USDT确认尚未结束，跳过本轮")
+        return None
+
+    try:
+        client = client or get_chain_client()
+        stats = {'checked': 0, 'updated': 0, 'completed': 0, 'failed': 0}
+        queryset = (
+            USDTPaymentDetail.objects.filter(payment__status='processing', transaction_hash__gt='')
+            .select_related('payment')
+            .order_by('pk')
+        )
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:config['BATCH_SIZE']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            updated, completed, failed = confirm_batch(batch, client, config['REQUIRED_CONFIRMATIONS'])
+            stats['checked'] += len(batch)
+            stats['updated'] += updated
+            stats['completed'] += completed
+            stats['failed'] += failed
+        logger.info(f"USDT支付确认完成: {stats}")
+        return stats
+    finally:
+        cache.delete(LOCK_CACHE_KEY)
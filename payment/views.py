@@ -13,8 +13,10 @@ from django.utils.translation import gettext as _
 from django.conf import settings
 
 from wishlist_new.models import WishlistItem
-from .models import Payment, PaymentMethod, PaymentWebhookLog, PayPalPaymentDetail, CoinbaseCommercePaymentDetail
-from .processors import get_payment_processor, CoinbaseCommercePaymentProcessor
+from .models import Payment
+from .processors import get_payment_processor, get_payment_processor_for, CoinbaseCommercePaymentProcessor
+from .registry import payment_processor_registry
+from . import webhooks
 
 logger = logging.getLogger(__name__)
 
@@ -28,8 +30,8 @@ def payment_method_list(request, wishlist_item_id):
         messages.warning(request, _('该心愿单物品已被购买'))
         return redirect('wishlist_detail', pk=wishlist_item.wishlist.id)
     
-    # 获取可用的支付方式
-    payment_methods = PaymentMethod.objects.filter(is_active=True)
+    # 获取可用的支付方式（注册表缓存）
+    payment_methods = payment_processor_registry.active_methods()
     
     # 检查是否是匿名支付
     is_anonymous = not request.user.is_authenticated
@@ -158,7 +160,7 @@ def usdt_payment_detail(request, payment_id):
             return redirect('usdt_payment_detail', payment_id=payment_id)
         
         # 获取支付处理器
-        processor = get_payment_processor(payment.payment_method.code)
+        processor = get_payment_processor_for(payment)
         if not processor:
             messages.error(request, _('支付方式不可用'))
             return redirect('payment_method_list', wishlist_item_id=payment.wishlist_item.id)
@@ -200,7 +202,7 @@ def paypal_checkout(request, payment_id):
         })
     
     # 获取支付处理器
-    processor = get_payment_processor(payment.payment_method.code)
+    processor = get_payment_processor_for(payment)
     if not processor:
         messages.error(request, _('支付方式不可用'))
         return redirect('payment_method_list', wishlist_item_id=payment.wishlist_item.id)
@@ -273,7 +275,7 @@ def payment_status(request, payment_id):
         return redirect('payment_success', wishlist_item_id=payment.wishlist_item.id)
     
     # 获取支付处理器
-    processor = get_payment_processor(payment.payment_method.code)
+    processor = get_payment_processor_for(payment)
     if not processor:
         messages.error(request, _('支付方式不可用'))
         return redirect('payment_method_list', wishlist_item_id=payment.wishlist_item.id)
@@ -335,258 +337,25 @@ def payment_cancel(request, wishlist_item_id):
 
 
 @csrf_exempt
+@require_POST
 def webhook_handler(request, payment_type):
     """
     通用Webhook处理器，处理各种支付平台的回调
     支持的payment_type:
     - paypal: PayPal支付回调
     - coinbase: Coinbase Commerce回调
+    只校验签名并写入PaymentWebhookLog，立即返回；事件由Celery任务处理（见 payment/webhooks.py）
     """
-    # 记录原始请求数据
-    request_body = request.body.decode('utf-8')
-    
-    # 创建Webhook日志记录
-    webhook_log = PaymentWebhookLog.objects.create(
-        event_type=f"{payment_type}_webhook",
-        payload=json.loads(request_body) if request_body else {},
-        status='pending'
-    )
-    
-    # 记录请求头信息
-    request_headers = {}
-    for key, value in request.headers.items():
-        request_headers[key] = value
-    webhook_log.payload['headers'] = request_headers
-    webhook_log.save(update_fields=['payload'])
-    
-    logger.info(f"收到{payment_type}支付Webhook: {request_body[:200]}...")
-    
-    if payment_type == 'paypal':
-        return handle_paypal_webhook(request, webhook_log)
-    elif payment_type == 'coinbase':
-        return handle_coinbase_webhook(request, webhook_log)
-    else:
-        logger.warning(f"不支持的支付类型Webhook: {payment_type}")
-        webhook_log.status = 'failed'
-        webhook_log.response = {'error': f'不支持的支付类型: {payment_type}'}
-        webhook_log.save(update_fields=['status', 'response'])
-        return JsonResponse({'status': 'error', 'message': f'不支持的支付类型: {payment_type}'})
-
-
-def handle_paypal_webhook(request, webhook_log):
-    """处理PayPal Webhook"""
     try:
-        # 获取PayPal发送的事件通知
-        event_type = request.headers.get('Paypal-Event-Type', '')
-        event_body = json.loads(request.body.decode('utf-8'))
-        
-        # 更新webhook日志
-        webhook_log.event_type = f"paypal_{event_type}"
-        webhook_log.save(update_fields=['event_type'])
-        
-        # 验证webhook签名（实际项目中应该验证）
-        # TODO: 实现验证逻辑
-        
-        # 提取PayPal事件数据
-        resource_type = event_body.get('resource_type', '')
-        event_data = event_body.get('resource', {})
-        
-        # 根据事件类型处理
-        if event_type == 'PAYMENT.CAPTURE.COMPLETED':
-            # 支付捕获完成
-            transaction_id = event_data.get('id', '')
-            payment_id = None
-            
-            # 尝试从custom_id或invoice_id找到对应的支付记录
-            custom_id = event_data.get('custom_id', '')
-            if custom_id:
-                try:
-                    payment = Payment.objects.get(id=custom_id)
-                    payment_id = payment.id
-                except Payment.DoesNotExist:
-                    pass
-            
-            # 如果找不到custom_id，尝试通过invoice_id查找
-            if not payment_id:
-                invoice_id = event_data.get('invoice_id', '')
-                if invoice_id:
-                    try:
-                        payment = Payment.objects.get(id=invoice_id)
-                        payment_id = payment.id
-                    except Payment.DoesNotExist:
-                        pass
-            
-            # 如果找不到通过invoice_id，尝试通过关联的PayPal详情查找
-            if not payment_id:
-                paypal_order_id = event_data.get('supplementary_data', {}).get('related_ids', {}).get('order_id', '')
-                if paypal_order_id:
-                    try:
-                        paypal_detail = PayPalPaymentDetail.objects.get(paypal_order_id=paypal_order_id)
-                        payment = paypal_detail.payment
-                        payment_id = payment.id
-                    except PayPalPaymentDetail.DoesNotExist:
-                        pass
-            
-            # 如果找到了支付记录，更新其状态
-            if payment_id:
-                payment = Payment.objects.get(id=payment_id)
-                payment.mark_as_completed(transaction_id)
-                
-                # 如果有PayPal支付详情，更新其中的信息
-                try:
-                    paypal_detail = payment.paypal_details
-                    paypal_detail.paypal_payer_id = event_data.get('payer', {}).get('payer_id', '')
-                    paypal_detail.save(update_fields=['paypal_payer_id'])
-                except:
-                    pass
-                
-                webhook_log.status = 'completed'
-                webhook_log.response = {
-                    'status': 'success',
-                    'message': '支付已完成',
-                    'payment_id': str(payment_id)
-                }
-                webhook_log.save(update_fields=['status', 'response'])
-                
-                logger.info(f"PayPal支付完成: {payment_id}, 交易ID: {transaction_id}")
-                return JsonResponse({'status': 'success', 'message': '支付已处理'})
-            else:
-                webhook_log.status = 'failed'
-                webhook_log.response = {
-                    'status': 'error',
-                    'message': '找不到对应的支付记录'
-                }
-                webhook_log.save(update_fields=['status', 'response'])
-                
-                logger.warning(f"PayPal支付完成，但找不到对应的支付记录: {transaction_id}")
-                return JsonResponse({'status': 'error', 'message': '找不到对应的支付记录'})
-        
-        # 其他PayPal事件类型
-        webhook_log.status = 'skipped'
-        webhook_log.response = {
-            'status': 'success',
-            'message': f'事件类型 {event_type} 不需要处理'
-        }
-        webhook_log.save(update_fields=['status', 'response'])
-        
-        return JsonResponse({'status': 'success', 'message': f'事件类型 {event_type} 不需要处理'})
-    
-    except Exception as e:
-        logger.exception(f"处理PayPal webhook时出错: {str(e)}")
-        webhook_log.status = 'failed'
-        webhook_log.response = {
-            'status': 'error',
-            'message': f'处理PayPal webhook时出错: {str(e)}'
-        }
-        webhook_log.save(update_fields=['status', 'response'])
-        
-        return JsonResponse({'status': 'error', 'message': '内部服务器错误'})
+        webhook_log, created = webhooks.ingest(payment_type, request)
+    except webhooks.InvalidWebhook as e:
+        logger.warning(f"拒绝{payment_type}支付Webhook: {str(e)}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
-
-def handle_coinbase_webhook(request, webhook_log):
-    """处理Coinbase Commerce Webhook"""
-    try:
-        # 获取Coinbase发送的事件通知
-        signature = request.headers.get('X-CC-Webhook-Signature', '')
-        event_body = json.loads(request.body.decode('utf-8'))
-        
-        # 获取事件类型和ID
-        event_type = event_body.get('event', {}).get('type', '')
-        event_id = event_body.get('event', {}).get('id', '')
-        
-        # 更新webhook日志
-        webhook_log.event_type = f"coinbase_{event_type}"
-        webhook_log.save(update_fields=['event_type'])
-        
-        # 获取Coinbase API密钥用于验证
-        webhook_secret = getattr(settings, 'COINBASE_COMMERCE_WEBHOOK_SECRET', '')
-        
-        # 验证webhook签名（实际项目中应该验证）
-        # TODO: 实现验证逻辑
-        # from coinbase_commerce.webhook import Webhook
-        # if webhook_secret:
-        #     try:
-        #         event = Webhook.construct_event(request.body, signature, webhook_secret)
-        #     except Exception as e:
-        #         logger.warning(f"Coinbase webhook签名验证失败: {str(e)}")
-        #         return JsonResponse({'status': 'error', 'message': 'Invalid signature'}, status=400)
-        # 但这里我们先跳过验证
-        
-        # 提取charge和支付数据
-        charge_data = event_body.get('event', {}).get('data', {})
-        charge_id = charge_data.get('id', '')
-        charge_code = charge_data.get('code', '')
-        
-        # 从metadata中获取payment_id
-        metadata = charge_data.get('metadata', {})
-        payment_id = metadata.get('payment_id', '')
-        
-        # 如果metadata中没有payment_id，尝试通过charge_id查找
-        if not payment_id and charge_id:
-            try:
-                coinbase_detail = CoinbaseCommercePaymentDetail.objects.get(charge_id=charge_id)
-                payment = coinbase_detail.payment
-                payment_id = payment.id
-            except CoinbaseCommercePaymentDetail.DoesNotExist:
-                pass
-        
-        # 根据事件类型处理
-        if event_type == 'charge:confirmed':
-            # 支付确认
-            if payment_id:
-                payment = Payment.objects.get(id=payment_id)
-                payment.mark_as_completed(charge_id)
-                
-                # 更新Coinbase支付详情
-                try:
-                    coinbase_detail = payment.coinbase_details
-                    coinbase_detail.status = 'CONFIRMED'
-                    coinbase_detail.crypto_used = charge_data.get('payments', [{}])[0].get('currency', '')
-                    coinbase_detail.save(update_fields=['status', 'crypto_used'])
-                except:
-                    pass
-                
-                webhook_log.status = 'completed'
-                webhook_log.response = {
-                    'status': 'success',
-                    'message': '支付已确认',
-                    'payment_id': str(payment_id)
-                }
-                webhook_log.save(update_fields=['status', 'response'])
-                
-                logger.info(f"Coinbase支付确认: {payment_id}, Charge ID: {charge_id}")
-                return JsonResponse({'status': 'success', 'message': '支付已处理'})
-            else:
-                webhook_log.status = 'failed'
-                webhook_log.response = {
-                    'status': 'error',
-                    'message': '找不到对应的支付记录'
-                }
-                webhook_log.save(update_fields=['status', 'response'])
-                
-                logger.warning(f"Coinbase支付确认，但找不到对应的支付记录: {charge_id}")
-                return JsonResponse({'status': 'error', 'message': '找不到对应的支付记录'})
-        
-        # 其他事件类型
-        webhook_log.status = 'skipped'
-        webhook_log.response = {
-            'status': 'success',
-            'message': f'事件类型 {event_type} 不需要处理'
-        }
-        webhook_log.save(update_fields=['status', 'response'])
-        
-        return JsonResponse({'status': 'success', 'message': f'事件类型 {event_type} 不需要处理'})
-    
-    except Exception as e:
-        logger.exception(f"处理Coinbase webhook时出错: {str(e)}")
-        webhook_log.status = 'failed'
-        webhook_log.response = {
-            'status': 'error',
-            'message': f'处理Coinbase webhook时出错: {str(e)}'
-        }
-        webhook_log.save(update_fields=['status', 'response'])
-        
-        return JsonResponse({'status': 'error', 'message': '内部服务器错误'})
+    return JsonResponse({
+        'status': 'accepted' if created else 'duplicate',
+        'id': str(webhook_log.id),
+    })
 
 
 @require_POST
@@ -596,7 +365,7 @@ def check_payment_status_api(request, payment_id):
     payment = get_object_or_404(Payment, id=payment_id)
     
     # 获取支付处理器
-    processor = get_payment_processor(payment.payment_method.code)
+    processor = get_payment_processor_for(payment)
     if not processor:
         return JsonResponse({'success': False, 'message': '支付方式不可用'})
     
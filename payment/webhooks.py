@@ -0,0 +1,370 @@
+"""
+支付平台Webhook处理
+
+接收和处理分离，支付平台在回调变慢时不会因为超时而堆积重试：
+- 接收(webhook_handler视图): 校验签名，写入PaymentWebhookLog后立即返回200，事务提交后投递Celery任务
+- 去重: (provider, event_id) 唯一，支付平台重复推送的同一事件只写入一次
+- 顺序: 同一支付的事件使用相同的ordering_key，任务锁定该key下全部待处理事件并按接收顺序逐个处理
+- 定位支付: 创建支付时把支付平台侧的ID写入PaymentExternalReference，处理时一次索引查询定位支付；
+  找不到支付的事件记为unmatched，可按状态直接统计
+- 失败: 单个事件在独立的保存点中处理，失败只回滚该事件并记为failed，可用 replay_webhooks 命令重放
+- 投递任务失败(如Redis不可用)时事件保持pending，由 replay_webhooks --stale-pending 补处理
+
+新增支付平台: 继承WebhookProvider实现 describe/handle(必要时 verify)，并加入PROVIDERS
+"""
+import hashlib
+import hmac
+import json
+import logging
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from mall.http_client import get_client
+
+from .models import CoinbaseCommercePaymentDetail, PaymentExternalReference, PaymentWebhookLog, PayPalPaymentDetail
+from .registry import payment_processor_registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEBHOOK_SETTINGS = {
+    'MAX_ATTEMPTS': 5,  # 重放时跳过处理次数已达上限的事件（--force 除外）
+    'PAYPAL_API_URL': '',  # 为空时按PayPal环境(sandbox/live)选择，可指向本地模拟服务用于测试
+}
+
+PAYPAL_API_URLS = {
+    'sandbox': 'https://api-m.sandbox.paypal.com',
+    'live': 'https://api-m.paypal.com',
+}
+PAYPAL_TOKEN_CACHE_KEY = 'payment:paypal:token:{}'
+
+# PayPal校验签名需要的请求头
+PAYPAL_SIGNATURE_HEADERS = {
+    'auth_algo': 'Paypal-Auth-Algo',
+    'cert_url': 'Paypal-Cert-Url',
+    'transmission_id': 'Paypal-Transmission-Id',
+    'transmission_sig': 'Paypal-Transmission-Sig',
+    'transmission_time': 'Paypal-Transmission-Time',
+}
+
+
+def get_webhook_settings():
+    """读取PAYMENT_WEBHOOKS配置，未配置的项使用默认值"""
+    config = dict(DEFAULT_WEBHOOK_SETTINGS)
+    config.update(getattr(settings, 'PAYMENT_WEBHOOKS', {}))
+    return config
+
+
+class InvalidWebhook(ValueError):
+    """请求格式错误或签名校验失败"""
+
+
+class WebhookProvider:
+    """支付平台Webhook处理基类"""
+    name = ''
+
+    def verify(self, request):
+        """校验请求签名，失败时抛出InvalidWebhook"""
+
+    def describe(self, payload, headers):
+        """返回 (事件ID, 事件类型, ordering_key)"""
+        raise NotImplementedError
+
+    def references(self, payload):
+        """事件中可用于定位支付的外部ID，按优先级排列"""
+        return []
+
+    def handle(self, log):
+        """处理一个事件，返回 (状态, 响应数据)；在保存点内执行，抛出异常时该事件的修改全部回滚"""
+        raise NotImplementedError
+
+    def find_payment(self, log):
+        """通过外部ID索引定位支付记录（一次索引查询），并记录到事件上"""
+        log.payment = PaymentExternalReference.objects.resolve(self.name, self.references(log.payload))
+        return log.payment
+
+    def unmatched(self, log, external_id):
+        logger.warning(f"{self.name} webhook事件 {log.event_id} 找不到对应的支付记录: {external_id}")
+        return 'unmatched', {'status': 'error', 'message': '找不到对应的支付记录'}
+
+    def complete_payment(self, payment, transaction_id):
+        """标记支付完成；支付已完成时不重复处理（支付平台可能对同一支付推送多个事件）"""
+        if payment.status == 'completed':
+            return 'skipped', {'status': 'success', 'message': '支付此前已完成', 'payment_id': str(payment.id)}
+        payment.mark_as_completed(transaction_id)
+        return 'completed', {'status': 'success', 'message': '支付已完成', 'payment_id': str(payment.id)}
+
+
+class PayPalWebhookProvider(WebhookProvider):
+    """
+    PayPal Webhook
+    签名通过PayPal的 verify-webhook-signature 接口校验；未配置webhook ID或API凭据时拒绝全部事件
+    """
+    name = 'paypal'
+
+    def credentials(self):
+        """返回 (client_id, client_secret, 环境, webhook_id)，优先使用settings，其次是后台支付方式配置"""
+        config = {
+            'client_id': getattr(settings, 'PAYPAL_CLIENT_ID', ''),
+            'client_secret': getattr(settings, 'PAYPAL_CLIENT_SECRET', ''),
+            'mode': getattr(settings, 'PAYPAL_MODE', ''),
+            'webhook_id': getattr(settings, 'PAYPAL_WEBHOOK_ID', ''),
+        }
+        # 从处理器注册表读取，不访问数据库
+        for method in payment_processor_registry.active_methods():
+            if method.payment_type == 'paypal':
+                for key, value in config.items():
+                    if not value:
+                        config[key] = method.get_config(key, '')
+        return config['client_id'], config['client_secret'], config['mode'] or 'sandbox', config['webhook_id']
+
+    def api_client(self, mode):
+        api_url = get_webhook_settings()['PAYPAL_API_URL'] or PAYPAL_API_URLS.get(mode, PAYPAL_API_URLS['sandbox'])
+        return get_client('paypal', base_url=api_url.rstrip('/'))
+
+    def access_token(self, client, client_id, client_secret):
+        """获取OAuth令牌，按有效期缓存"""
+        key = PAYPAL_TOKEN_CACHE_KEY.format(hashlib.sha256(client_id.encode('utf-8')).hexdigest()[:16])
+        token = cache.get(key)
+        if token:
+            return token
+        response = client.post(
+            '/v1/oauth2/token',
+            auth=(client_id, client_secret),
+            data={'grant_type': 'client_credentials'},
+            retry=True,
+        )
+        response.raise_for_status()
+        data = response.json()
+        cache.set(key, data['access_token'], max(int(data.get('expires_in', 0)) - 60, 60))
+        return data['access_token']
+
+    def verify(self, request):
+        client_id, client_secret, mode, webhook_id = self.credentials()
+        if not (client_id and client_secret and webhook_id):
+            raise InvalidWebhook('未配置PayPal webhook ID或API凭据，无法校验签名')
+
+        body = {field: request.headers.get(header, '') for field, header in PAYPAL_SIGNATURE_HEADERS.items()}
+        missing = [PAYPAL_SIGNATURE_HEADERS[field] for field, value in body.items() if not value]
+        if missing:
+            raise InvalidWebhook(f'PayPal webhook缺少签名请求头: {", ".join(missing)}')
+        body['webhook_id'] = webhook_id
+        body['webhook_event'] = json.loads(request.body.decode('utf-8'))
+
+        client = self.api_client(mode)
+        try:
+            token = self.access_token(client, client_id, client_secret)
+            # 校验接口没有副作用，请求已发出后也可以重试
+            response = client.post(
+                '/v1/notifications/verify-webhook-signature',
+                json=body,
+                headers={'Authorization': f'Bearer {token}'},
+                retry=True,
+            )
+            data = response.json() if response.status_code == 200 else {}
+        except (requests.RequestException, ValueError, KeyError) as e:
+            # 拒绝后PayPal会稍后重新推送
+            raise InvalidWebhook(f'调用PayPal签名校验接口失败: {str(e)}')
+        if data.get('verification_status') != 'SUCCESS':
+            raise InvalidWebhook('PayPal webhook签名校验失败')
+
+    def describe(self, payload, headers):
+        event_type = payload.get('event_type') or headers.get('Paypal-Event-Type', '')
+        event_id = payload.get('id') or headers.get('Paypal-Transmission-Id', '')
+        resource = payload.get('resource') or {}
+        ordering_key = (
+            resource.get('custom_id')
+            or resource.get('invoice_id')
+            or self._related_order_id(resource)
+            or resource.get('id', '')
+        )
+        return event_id, event_type, str(ordering_key)
+
+    @staticmethod
+    def _related_order_id(resource):
+        return (resource.get('supplementary_data') or {}).get('related_ids', {}).get('order_id', '')
+
+    def references(self, payload):
+        resource = payload.get('resource') or {}
+        return [resource.get('custom_id'), resource.get('invoice_id'), self._related_order_id(resource)]
+
+    def handle(self, log):
+        event_type = log.event_type
+        if event_type != 'PAYMENT.CAPTURE.COMPLETED':
+            return 'skipped', {'status': 'success', 'message': f'事件类型 {event_type} 不需要处理'}
+
+        resource = log.payload.get('resource') or {}
+        transaction_id = resource.get('id', '')
+        payment = self.find_payment(log)
+        if payment is None:
+            return self.unmatched(log, transaction_id)
+
+        status, response = self.complete_payment(payment, transaction_id)
+        payer_id = (resource.get('payer') or {}).get('payer_id', '')
+        if payer_id:
+            PayPalPaymentDetail.objects.filter(payment=payment).update(paypal_payer_id=payer_id)
+        logger.info(f"PayPal支付完成: {payment.id}, 交易ID: {transaction_id}")
+        return status, response
+
+
+class CoinbaseWebhookProvider(WebhookProvider):
+    """Coinbase Commerce Webhook，X-CC-Webhook-Signature 为请求体的 HMAC-SHA256"""
+    name = 'coinbase'
+
+    def webhook_secret(self):
+        secret = getattr(settings, 'COINBASE_COMMERCE_WEBHOOK_SECRET', '')
+        if secret:
+            return secret
+        # 后台支付方式中配置的密钥，从处理器注册表读取，不访问数据库
+        for method in payment_processor_registry.active_methods():
+            if method.payment_type == 'coinbase_commerce' and method.get_config('webhook_secret'):
+                return method.get_config('webhook_secret')
+        return ''
+
+    def verify(self, request):
+        secret = self.webhook_secret()
+        if not secret:
+            raise InvalidWebhook('未配置Coinbase webhook密钥，无法校验签名')
+        signature = request.headers.get('X-CC-Webhook-Signature', '')
+        expected = hmac.new(secret.encode('utf-8'), request.body, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(signature, expected):
+            raise InvalidWebhook('Coinbase webhook签名校验失败')
+
+    def describe(self, payload, headers):
+        event = payload.get('event') or {}
+        charge = event.get('data') or {}
+        ordering_key = (charge.get('metadata') or {}).get('payment_id') or charge.get('id', '')
+        return event.get('id', ''), event.get('type', ''), str(ordering_key)
+
+    def references(self, payload):
+        charge = (payload.get('event') or {}).get('data') or {}
+        return [(charge.get('metadata') or {}).get('payment_id'), charge.get('id'), charge.get('code')]
+
+    def handle(self, log):
+        event_type = log.event_type
+        if event_type != 'charge:confirmed':
+            return 'skipped', {'status': 'success', 'message': f'事件类型 {event_type} 不需要处理'}
+
+        charge = (log.payload.get('event') or {}).get('data') or {}
+        charge_id = charge.get('id', '')
+        payment = self.find_payment(log)
+        if payment is None:
+            return self.unmatched(log, charge_id)
+
+        status, response = self.complete_payment(payment, charge_id)
+        CoinbaseCommercePaymentDetail.objects.filter(payment=payment).update(
+            status='CONFIRMED',
+            crypto_used=((charge.get('payments') or [{}])[0] or {}).get('currency', ''),
+        )
+        logger.info(f"Coinbase支付确认: {payment.id}, Charge ID: {charge_id}")
+        return status, response
+
+
+PROVIDERS = {provider.name: provider for provider in [PayPalWebhookProvider(), CoinbaseWebhookProvider()]}
+
+
+def get_provider(name):
+    try:
+        return PROVIDERS[name]
+    except KeyError:
+        raise InvalidWebhook(f'不支持的支付类型: {name}')
+
+
+def enqueue(provider, ordering_key):
+    """投递处理任务，失败时事件保持pending，等待重放"""
+    from .tasks import process_webhook_events
+    try:
+        process_webhook_events.delay(provider, ordering_key)
+    except Exception as e:
+        logger.error(f"投递{provider} webhook处理任务失败，事件保持待处理: {str(e)}")
+
+
+def ingest(provider_name, request):
+    """
+    校验并保存webhook，返回 (PaymentWebhookLog, 是否新事件)
+    重复推送的事件直接返回已有记录，不会再次处理
+    """
+    provider = get_provider(provider_name)
+    try:
+        payload = json.loads(request.body.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        raise InvalidWebhook('请求体不是有效的JSON')
+    if not isinstance(payload, dict):
+        raise InvalidWebhook('请求体不是有效的JSON对象')
+    provider.verify(request)
+
+    headers = dict(request.headers)
+    event_id, event_type, ordering_key = provider.describe(payload, headers)
+    try:
+        with transaction.atomic():
+            log = PaymentWebhookLog.objects.create(
+                provider=provider.name,
+                event_id=event_id,
+                ordering_key=ordering_key,
+                event_type=event_type,
+                payload=payload,
+                headers=headers,
+            )
+    except IntegrityError:
+        log = PaymentWebhookLog.objects.filter(provider=provider.name, event_id=event_id).first()
+        if log is None:
+            raise
+        logger.info(f"收到重复的{provider.name} webhook事件: {event_id}")
+        return log, False
+
+    transaction.on_commit(lambda: enqueue(provider.name, ordering_key))
+    logger.info(f"收到{provider.name} webhook事件: {event_type} {event_id}")
+    return log, True
+
+
+def process_log(log):
+    """处理单个事件并保存结果（调用方持有该事件的行锁）"""
+    log.attempts += 1
+    try:
+        with transaction.atomic():
+            status, response = get_provider(log.provider).handle(log)
+    except Exception as e:
+        logger.exception(f"处理{log.provider} webhook事件 {log.id} 时出错: {str(e)}")
+        status, response = 'failed', {'status': 'error', 'message': f'处理webhook时出错: {str(e)}'}
+
+    log.status = status
+    log.response = response
+    log.processed_at = timezone.now()
+    log.save(update_fields=['status', 'response', 'attempts', 'processed_at', 'payment'])
+    return log
+
+
+def process_events(provider, ordering_key):
+    """
+    按接收顺序处理同一ordering_key下的全部待处理事件，返回处理数量
+    行锁保证同一支付的事件不会被多个worker并发处理，后到的任务等待后只会看到剩余的待处理事件
+    """
+    with transaction.atomic():
+        logs = list(
+            PaymentWebhookLog.objects.select_for_update()
+            .filter(provider=provider, ordering_key=ordering_key, status='pending')
+            .order_by('created_at')
+        )
+        for log in logs:
+            process_log(log)
+    return len(logs)
+
+
+def replay(logs, inline=False):
+    """
+    重放事件：重新置为待处理，按 (provider, ordering_key) 分组投递处理任务，返回重放的事件数量
+    inline=True 时在当前进程中直接处理（命令行重放、未启动Celery worker时使用）
+    """
+    ids = list(logs.values_list('pk', flat=True))
+    queryset = PaymentWebhookLog.objects.filter(pk__in=ids)
+    count = queryset.update(status='pending', processed_at=None)
+    groups = queryset.values_list('provider', 'ordering_key').distinct().order_by()
+    for provider, ordering_key in list(groups):
+        if inline:
+            process_events(provider, ordering_key)
+        else:
+            enqueue(provider, ordering_key)
+    return count
@@ -1,9 +1,10 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
+from django.http import Http404
 
 from .models import Site, SiteTheme, SiteSlide, SiteConfig
+from .registry import site_registry
 from .serializers import (
     SiteSerializer, SiteDetailSerializer, SiteThemeSerializer, 
     SiteSlideSerializer, SiteConfigSerializer
@@ -14,7 +15,7 @@ class SiteViewSet(viewsets.ReadOnlyModelViewSet):
     """
     站点API视图集
     """
-    queryset = Site.objects.filter(is_active=True)
+    queryset = Site.objects.filter(is_active=True).select_related('theme', 'config')
     permission_classes = [permissions.AllowAny]
     
     def get_serializer_class(self):
@@ -76,7 +77,10 @@ class SiteViewSet(viewsets.ReadOnlyModelViewSet):
                 'data': None
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        site = get_object_or_404(Site, code=code, is_active=True)
+        # 站点、主题、配置直接取自进程内的站点注册表，只需查询幻灯片
+        site = site_registry.get(code)
+        if site is None:
+            raise Http404
         serializer = SiteDetailSerializer(site)
         
         return Response({
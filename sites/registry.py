@@ -0,0 +1,175 @@
+"""
+站点注册表
+
+进程内缓存全部启用的站点（连同SiteTheme、SiteConfig），中间件按请求域名解析当前站点时不访问数据库。
+- 精确域名和 settings.SITE_MAPPING 放在字典中直接查找
+- 泛域名（Site.domain 填写 *.example.com）按域名后缀逐级查找，查找次数只与域名层级数有关
+- 站点、主题、配置保存或删除后当前进程立即失效（见 sites/signals.py），其他进程在TTL到期后重新加载
+
+注册表中的站点对象在多个请求之间共享，只能读取，不要修改或保存。
+"""
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+from django.http.request import split_domain_port
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SITE_CODE = 'default'
+
+DEFAULT_REGISTRY_SETTINGS = {
+    'TTL': 60,  # 注册表有效期(秒)，到期后下一次解析时重新加载
+    'RETRY_INTERVAL': 5,  # 加载失败(如尚未迁移)时的重试间隔(秒)
+}
+
+
+def get_registry_settings():
+    """读取SITE_REGISTRY配置，未配置的项使用默认值"""
+    config = dict(DEFAULT_REGISTRY_SETTINGS)
+    config.update(getattr(settings, 'SITE_REGISTRY', {}))
+    return config
+
+
+def normalize_host(value):
+    """统一域名格式：去掉协议和路径，转为小写"""
+    value = (value or '').strip().lower()
+    if '://' in value:
+        value = value.split('://', 1)[1]
+    return value.split('/', 1)[0].rstrip('.')
+
+
+class _RegistryState:
+    """一次加载的注册表快照，加载完成后整体替换，读取时无需加锁"""
+
+    def __init__(self, sites, exact_hosts, wildcard_hosts, expires_at):
+        self.sites = sites  # {code: Site}
+        self.exact_hosts = exact_hosts  # {host 或 host:port: code}
+        self.wildcard_hosts = wildcard_hosts  # {后缀域名: code}
+        self.expires_at = expires_at
+
+
+class SiteRegistry:
+    """
+    站点注册表
+    用法:
+        code, site = site_registry.resolve(request.get_host())
+        site = site_registry.get('us')
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def _load(self):
+        from .models import Site
+
+        config = get_registry_settings()
+        sites = {}
+        exact_hosts = {}
+        wildcard_hosts = {}
+
+        # settings中的映射优先级最低，数据库中配置了域名的站点会覆盖它
+        for host, code in getattr(settings, 'SITE_MAPPING', {}).items():
+            if '/' in host:
+                # 形如 localhost:8000/alokai 的条目按路径区分站点，无法通过域名解析
+                continue
+            exact_hosts[normalize_host(host)] = code
+
+        try:
+            queryset = Site.objects.filter(is_active=True).select_related('theme', 'config')
+            for site in queryset:
+                sites[site.code] = site
+                domain = normalize_host(site.domain)
+                if not domain:
+                    continue
+                if domain.startswith('*.'):
+                    wildcard_hosts[domain[2:]] = site.code
+                else:
+                    exact_hosts[domain] = site.code
+        except DatabaseError as e:
+            logger.error(f"加载站点注册表失败，暂时只使用SITE_MAPPING: {str(e)}")
+            return _RegistryState({}, exact_hosts, {}, time.monotonic() + config['RETRY_INTERVAL'])
+
+        logger.info(f"站点注册表已加载: {len(sites)}个站点, {len(exact_hosts)}个域名, {len(wildcard_hosts)}个泛域名")
+        return _RegistryState(sites, exact_hosts, wildcard_hosts, time.monotonic() + config['TTL'])
+
+    def _is_fresh(self, state):
+        return state is not None and state.expires_at > time.monotonic()
+
+    def _get_state(self):
+        state = self._state
+        if self._is_fresh(state):
+            return state
+        with self._lock:
+            # 等待锁期间可能已被其他线程加载
+            state = self._state
+            if not self._is_fresh(state):
+                state = self._load()
+                self._state = state
+        return state
+
+    async def _aget_state(self):
+        """异步上下文中获取快照，需要加载时在线程池中访问数据库"""
+        state = self._state
+        if self._is_fresh(state):
+            return state
+        return await sync_to_async(self._get_state)()
+
+    def invalidate(self):
+        """使注册表失效，下一次解析时重新加载"""
+        self._state = None
+
+    @staticmethod
+    def _lookup(state, host):
+        """
+        依次匹配: 带端口的完整域名 -> 不带端口的域名 -> 泛域名(从最具体的后缀开始)
+        """
+        host = normalize_host(host)
+        if not host:
+            return None
+        if host in state.exact_hosts:
+            return state.exact_hosts[host]
+
+        domain, _ = split_domain_port(host)
+        if not domain:
+            return None
+        if domain in state.exact_hosts:
+            return state.exact_hosts[domain]
+
+        labels = domain.split('.')
+        for index in range(1, len(labels)):
+            code = state.wildcard_hosts.get('.'.join(labels[index:]))
+            if code is not None:
+                return code
+        return None
+
+    def lookup_code(self, host):
+        """根据Host头查找站点代码，未匹配时返回None"""
+        return self._lookup(self._get_state(), host)
+
+    def resolve(self, host, default=DEFAULT_SITE_CODE):
+        """返回 (站点代码, 站点对象)，站点未在数据库中配置时站点对象为None"""
+        state = self._get_state()
+        code = self._lookup(state, host) or default
+        return code, state.sites.get(code)
+
+    async def aresolve(self, host, default=DEFAULT_SITE_CODE):
+        """resolve的异步版本，供ASGI中间件使用"""
+        state = await self._aget_state()
+        code = self._lookup(state, host) or default
+        return code, state.sites.get(code)
+
+    def get(self, code):
+        """按站点代码获取启用的站点对象"""
+        return self._get_state().sites.get(code)
+
+    def all(self):
+        """返回全部启用的站点对象"""
+        return list(self._get_state().sites.values())
+
+
+site_registry = SiteRegistry()
@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Site, SiteTheme, SiteConfig
+from .registry import site_registry
+
+
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+@receiver(post_save, sender=SiteTheme)
+@receiver(post_delete, sender=SiteTheme)
+@receiver(post_save, sender=SiteConfig)
+@receiver(post_delete, sender=SiteConfig)
+def invalidate_site_registry(sender, **kwargs):
+    """站点、主题或配置变更提交后使当前进程的站点注册表失效"""
+    transaction.on_commit(site_registry.invalidate)
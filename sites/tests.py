@@ -1,3 +1,14 @@
-from django.test import TestCase
+from celery.signals import before_task_publish
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from mall.site_context import SITE_HEADER, site_context
+
+
+class CelerySiteHeaderTests(SimpleTestCase):
+    """Django启动时已加载Celery应用，发布任务时自动带上当前站点"""
+
+    def test_site_header_attached_on_publish(self):
+        headers = {}
+        with site_context('site2'):
+            before_task_publish.send(sender='demo.task', headers=headers, body=None)
+        self.assertEqual(headers[SITE_HEADER], 'site2')
@@ -4,7 +4,8 @@ from .models import (
     TelegramBotSettings, 
     UserTelegramBinding, 
     TelegramNotificationSettings,
-    TelegramNotification
+    TelegramNotification,
+    NotificationOutbox
 )
 
 # 创建别名
@@ -89,7 +90,8 @@ class TelegramNotificationAdmin(admin.ModelAdmin):
     search_fields = ('user_binding__user__username', 'content')
     readonly_fields = ('user_binding', 'notification_type', 'content', 
                       'related_object_id', 'related_object_type', 
-                      'status', 'error_message', 'created_at', 'sent_at')
+                      'status', 'error_message', 'created_at', 'sent_at',
+                      'attempts', 'next_attempt_at')
     fieldsets = (
         ('通知信息', {
             'fields': ('user_binding', 'notification_type', 'content')
@@ -99,7 +101,7 @@ class TelegramNotificationAdmin(admin.ModelAdmin):
             'classes': ('collapse',),
         }),
         ('状态信息', {
-            'fields': ('status', 'error_message', 'created_at', 'sent_at')
+            'fields': ('status', 'error_message', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
         }),
     )
     actions = ['resend_notifications']
@@ -115,10 +117,26 @@ class TelegramNotificationAdmin(admin.ModelAdmin):
     get_content_preview.short_description = '内容预览'
     
     def resend_notifications(self, request, queryset):
-        from .tasks import send_telegram_notification
-        count = 0
-        for notification in queryset.filter(status='failed'):
-            send_telegram_notification.delay(notification.id)
-            count += 1
+        from .tasks import dispatch_telegram_notifications
+        count = queryset.filter(status='failed').update(
+            status='pending', attempts=0, next_attempt_at=None, error_message=''
+        )
+        if count:
+            dispatch_telegram_notifications.delay()
         self.message_user(request, f'已重新发送 {count} 条通知')
-    resend_notifications.short_description = '重新发送失败通知' 
\ No newline at end of file
+    resend_notifications.short_description = '重新发送失败通知'
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event_type', 'created_at', 'published_at', 'attempts')
+    list_filter = ('event_type', 'published_at')
+    readonly_fields = ('event_type', 'payload', 'created_at', 'published_at', 'attempts', 'last_error')
+    actions = ['retry_events']
+    
+    def retry_events(self, request, queryset):
+        from .outbox import enqueue_relay
+        count = queryset.filter(published_at__isnull=True).update(attempts=0, last_error='')
+        enqueue_relay()
+        self.message_user(request, f'已重新转发 {count} 个事件')
+    retry_events.short_description = '重新转发未转发的事件'
@@ -0,0 +1,298 @@
+"""
+Telegram通知批量发送
+
+通知记录先以pending状态写入TelegramNotification，由Celery beat定时执行 dispatch_notifications 批量发送：
+- 每批按主键顺序取出到期的待发送通知（一次查询，连同绑定关系和通知设置），按聊天分组后并发发送，
+  同一聊天的消息在一个线程内按顺序发送
+- 每批在一个事务内用 select_for_update(skip_locked=True) 锁定，发送结果写回后才提交；
+  多个进程同时执行时各自取到不同的通知，同一条通知不会被重复发送
+- 令牌桶限流：全局 GLOBAL_RATE 条/秒，每个聊天 CHAT_RATE 条/秒（Bot API约为30条/秒和1条/秒）。
+  缓存锁让同一时间只有一个进程在发送，进程内的令牌桶即为全局限制；缓存为本地内存缓存时锁只在进程内有效，
+  此时不会重复发送，但多个进程各自限流
+- 收到429时按响应中的 retry_after 暂停该聊天；本轮内需要等待超过 MAX_WAIT 秒的消息设置 next_attempt_at 留到之后发送
+- 网络错误和5xx按指数退避重试，达到 MAX_ATTEMPTS 后标记失败；其他4xx(如用户屏蔽机器人)直接标记失败
+- 每批发送结果用一次bulk_update写回
+
+HTTP请求通过 mall.http_client 的共享客户端发送（长连接池，POST在请求已发出后不自动重试），
+并发线程数 CONCURRENCY 不应超过客户端连接池大小。API_URL可指向本地模拟的Bot API用于测试。
+"""
+import datetime
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from mall.http_client import get_client, redact
+
+from .models import TelegramNotification
+from .utils import can_send_notification, get_bot_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TELEGRAM_DISPATCHER_SETTINGS = {
+    'API_URL': 'https://api.telegram.org',
+    'BATCH_SIZE': 100,  # 每批取出的通知数量
+    'CONCURRENCY': 8,  # 并发发送的线程数
+    'GLOBAL_RATE': 30,  # 全局每秒最多发送的消息数
+    'CHAT_RATE': 1,  # 每个聊天每秒最多发送的消息数
+    'CHAT_BURST': 1,  # 每个聊天允许的突发消息数
+    'MAX_WAIT': 10,  # 本轮内为限流等待的最长时间(秒)，超过则留到之后发送
+    'MAX_ATTEMPTS': 5,  # 网络错误或5xx的最大发送次数
+    'RETRY_DELAY': 30,  # 第n次失败后等待 RETRY_DELAY * 2^(n-1) 秒再发送
+    'LOCK_TIMEOUT': 300,  # 防止多个beat周期重叠执行的锁时间(秒)
+}
+
+LOCK_CACHE_KEY = 'telegram:dispatch-lock'
+
+# bulk_update写回的字段
+RESULT_FIELDS = ['status', 'sent_at', 'error_message', 'attempts', 'next_attempt_at']
+
+
+def get_dispatcher_settings():
+    """读取TELEGRAM_DISPATCHER配置，未配置的项使用默认值"""
+    config = dict(DEFAULT_TELEGRAM_DISPATCHER_SETTINGS)
+    config.update(getattr(settings, 'TELEGRAM_DISPATCHER', {}))
+    return config
+
+
+class TokenBucket:
+    """令牌桶：每秒补充rate个令牌，最多积累capacity个；block用于按retry_after暂停（调用方负责加锁）"""
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = now
+
+    def wait_time(self, now):
+        """距离下一个可用令牌的秒数，0表示现在可用"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def idle(self, now):
+        return self.wait_time(now) == 0 and self.tokens >= self.capacity
+
+    def block(self, seconds, now):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class RateLimiter:
+    """全局令牌桶加按聊天的令牌桶（线程安全），两者都有令牌时才放行"""
+    MAX_CHATS = 10000  # 超过后清理已回满的聊天令牌桶
+
+    def __init__(self, global_rate, chat_rate, chat_burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._lock = threading.Lock()
+        self._global = TokenBucket(global_rate, global_rate, clock())
+        self._chats = {}
+
+    def _chat(self, chat_id, now):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.MAX_CHATS:
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle(now)}
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+        return bucket
+
+    def reserve(self, chat_id):
+        """有令牌时占用并返回0，否则返回需要等待的秒数"""
+        with self._lock:
+            now = self.clock()
+            chat = self._chat(chat_id, now)
+            wait = max(self._global.wait_time(now), chat.wait_time(now))
+            if wait == 0:
+                self._global.tokens -= 1
+                chat.tokens -= 1
+            return wait
+
+    def acquire(self, chat_id, max_wait):
+        """等待令牌，获得时返回0；需要等待超过max_wait秒时不再等待，返回仍需等待的秒数"""
+        deadline = self.clock() + max_wait
+        while True:
+            wait = self.reserve(chat_id)
+            if wait == 0:
+                return 0
+            if self.clock() + wait > deadline:
+                return wait
+            self.sleep(wait)
+
+    def block(self, chat_id, seconds):
+        """按429响应的retry_after暂停向该聊天发送"""
+        with self._lock:
+            now = self.clock()
+            self._chat(chat_id, now).block(seconds, now)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """进程内共享的限流器，多轮发送之间保留各聊天的令牌状态"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                config = get_dispatcher_settings()
+                _limiter = RateLimiter(config['GLOBAL_RATE'], config['CHAT_RATE'], config['CHAT_BURST'])
+    return _limiter
+
+
+def reset_rate_limiter():
+    global _limiter
+    _limiter = None
+
+
+def _retry_later(notification, error, config):
+    if notification.attempts >= config['MAX_ATTEMPTS']:
+        notification.status = 'failed'
+        notification.error_message = error
+        notification.next_attempt_at = None
+        return
+    delay = config['RETRY_DELAY'] * (2 ** (notification.attempts - 1))
+    notification.error_message = error
+    notification.next_attempt_at = timezone.now() + datetime.timedelta(seconds=delay)
+
+
+def deliver(notification, client, url, limiter, config):
+    """发送一条通知并把结果写到通知对象上（不访问数据库）"""
+    chat_id = notification.user_binding.telegram_id
+    # 等待时间上限对整条消息生效，反复收到429时也不会超过MAX_WAIT
+    deadline = limiter.clock() + config['MAX_WAIT']
+    while True:
+        wait = limiter.acquire(chat_id, max(0, deadline - limiter.clock()))
+        if wait:
+            notification.next_attempt_at = timezone.now() + datetime.timedelta(seconds=wait)
+            return
+
+        notification.attempts += 1
+        try:
+            response = client.post(url, json={
+                'chat_id': chat_id,
+                'text': notification.content,
+                'parse_mode': 'HTML',
+            })
+        except requests.RequestException as e:
+            # 异常信息中带有包含Bot令牌的URL
+            _retry_later(notification, f'请求Telegram API失败: {redact(str(e))}', config)
+            return
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        if response.status_code == 200 and data.get('ok'):
+            notification.status = 'sent'
+            notification.sent_at = timezone.now()
+            notification.error_message = ''
+            notification.next_attempt_at = None
+            return
+
+        description = data.get('description') or f'HTTP {response.status_code}'
+        if response.status_code == 429:
+            # 被限流不计入发送次数，暂停该聊天后重新排队等待令牌
+            notification.attempts -= 1
+            retry_after = (data.get('parameters') or {}).get('retry_after', 1)
+            logger.warning(f"Telegram限流，聊天 {chat_id} 暂停 {retry_after} 秒")
+            limiter.block(chat_id, retry_after)
+            continue
+        if response.status_code >= 500:
+            _retry_later(notification, description, config)
+            return
+
+        notification.status = 'failed'
+        notification.error_message = description
+        notification.next_attempt_at = None
+        return
+
+
+def deliver_chat(notifications, client, url, limiter, config):
+    """按顺序发送同一聊天的通知，前一条未发送成功时后面的消息一起顺延"""
+    for index, notification in enumerate(notifications):
+        deliver(notification, client, url, limiter, config)
+        if notification.status == 'pending':
+            for rest in notifications[index + 1:]:
+                rest.next_attempt_at = notification.next_attempt_at
+            return
+
+
+def dispatch_notifications(client=None, limiter=None):
+    """
+    发送全部到期的待发送通知，返回统计 {'sent', 'failed', 'deferred'}
+    同一时间只允许一个进程执行（缓存锁），上一轮未结束时本轮直接跳过；
+    缓存锁失效时由数据库行锁保证每条通知只被一个进程发送
+    """
+    config = get_dispatcher_settings()
+    if not cache.add(LOCK_CACHE_KEY, 1, config['LOCK_TIMEOUT']):
+        logger.info("上一轮Telegram通知发送尚未结束，跳过本轮")
+        return None
+
+    try:
+        bot_settings = get_bot_settings()
+        if not bot_settings or not bot_settings.bot_token:
+            logger.error("未配置Bot Token，通知保持待发送")
+            return None
+
+        api_url = config['API_URL'].rstrip('/')
+        url = f"{api_url}/bot{bot_settings.bot_token}/sendMessage"
+        client = client or get_client('telegram', base_url=api_url)
+        limiter = limiter or get_rate_limiter()
+        stats = {'sent': 0, 'failed': 0, 'deferred': 0}
+
+        last_pk = 0
+        with ThreadPoolExecutor(max_workers=config['CONCURRENCY']) as executor:
+            while True:
+                with transaction.atomic():
+                    # 锁定本批通知直到结果写回，其他进程跳过这些行；绑定关系等关联表不加锁
+                    batch = list(
+                        TelegramNotification.objects.select_for_update(skip_locked=True, of=('self',))
+                        .filter(status='pending', pk__gt=last_pk)
+                        .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()))
+                        .select_related('user_binding__notification_settings')
+                        .order_by('pk')[:config['BATCH_SIZE']]
+                    )
+                    if not batch:
+                        break
+                    last_pk = batch[-1].pk
+
+                    chats = {}
+                    for notification in batch:
+                        if not can_send_notification(notification.user_binding):
+                            notification.status = 'failed'
+                            notification.error_message = '用户在免打扰时间段或通知已禁用'
+                            continue
+                        chats.setdefault(notification.user_binding.telegram_id, []).append(notification)
+
+                    # 线程中只发送HTTP请求，不访问数据库
+                    list(executor.map(
+                        lambda notifications: deliver_chat(notifications, client, url, limiter, config),
+                        chats.values(),
+                    ))
+                    TelegramNotification.objects.bulk_update(batch, RESULT_FIELDS)
+
+                for notification in batch:
+                    if notification.status == 'pending':
+                        stats['deferred'] += 1
+                    else:
+                        stats[notification.status] += 1
+
+        if any(stats.values()):
+            logger.info(f"Telegram通知发送完成: {stats}")
+        return stats
+    finally:
+        cache.delete(LOCK_CACHE_KEY)
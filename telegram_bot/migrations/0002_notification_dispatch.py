@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telegram_bot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='telegramnotification',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='发送次数'),
+        ),
+        migrations.AddField(
+            model_name='telegramnotification',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='下次发送时间'),
+        ),
+        migrations.AddIndex(
+            model_name='telegramnotification',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='tg_notification_due_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-18 22:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telegram_bot', '0002_notification_dispatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('wishlist_view', '心愿单被查看'), ('wishlist_purchase', '心愿单物品购买')], max_length=20, verbose_name='事件类型')),
+                ('payload', models.JSONField(default=dict, verbose_name='事件数据')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('published_at', models.DateTimeField(blank=True, null=True, verbose_name='转发时间')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='失败次数')),
+                ('last_error', models.TextField(blank=True, verbose_name='错误信息')),
+            ],
+            options={
+                'verbose_name': '通知事件发件箱',
+                'verbose_name_plural': '通知事件发件箱',
+                'indexes': [models.Index(condition=models.Q(('published_at__isnull', True)), fields=['id'], name='tg_outbox_pending_idx')],
+            },
+        ),
+    ]
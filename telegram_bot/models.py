@@ -85,6 +85,8 @@ class TelegramNotification(models.Model):
     error_message = models.TextField(blank=True, verbose_name="错误信息")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
     sent_at = models.DateTimeField(null=True, blank=True, verbose_name="发送时间")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="发送次数")
+    next_attempt_at = models.DateTimeField(null=True, blank=True, verbose_name="下次发送时间")
     
     def mark_as_sent(self):
         self.status = 'sent'
@@ -103,6 +105,39 @@ class TelegramNotification(models.Model):
         verbose_name = "Telegram通知记录"
         verbose_name_plural = verbose_name
         ordering = ['-created_at']
+        indexes = [
+            # 批量发送按状态和下次发送时间取出到期的通知
+            models.Index(fields=['status', 'next_attempt_at'], name='tg_notification_due_idx'),
+        ]
+
+
+class NotificationOutbox(models.Model):
+    """
+    通知事件发件箱
+    信号中只写入一行事件（只包含ID），由后台任务批量转发到Channels和Telegram，见 outbox.py
+    """
+    EVENT_CHOICES = (
+        ('wishlist_view', '心愿单被查看'),
+        ('wishlist_purchase', '心愿单物品购买'),
+    )
+    
+    event_type = models.CharField(max_length=20, choices=EVENT_CHOICES, verbose_name="事件类型")
+    payload = models.JSONField(default=dict, verbose_name="事件数据")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    published_at = models.DateTimeField(null=True, blank=True, verbose_name="转发时间")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="失败次数")
+    last_error = models.TextField(blank=True, verbose_name="错误信息")
+    
+    def __str__(self):
+        return f"{self.get_event_type_display()} #{self.pk}"
+    
+    class Meta:
+        verbose_name = "通知事件发件箱"
+        verbose_name_plural = verbose_name
+        indexes = [
+            # 只索引未转发的事件，转发后的行不再进入索引
+            models.Index(fields=['id'], condition=models.Q(published_at__isnull=True), name='tg_outbox_pending_idx'),
+        ]
 
 
 # 为了与admin URL匹配，创建别名
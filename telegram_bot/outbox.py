@@ -0,0 +1,237 @@
+"""
+通知事件发件箱（transactional outbox）
+
+心愿单被查看、物品被购买时，信号只在当前事务内写入一行NotificationOutbox（只包含ID），
+请求中不再查询查看者、不再调用Channels，响应时间与通知后端无关；业务事务回滚时事件也一起回滚。
+
+转发由后台任务 relay_outbox 完成（事务提交后触发一次，另由Celery beat定时兜底）：
+- 按ID顺序锁定一批未转发的事件（多个worker时跳过已被锁定的行），批量查询心愿单、物品、用户和Telegram绑定
+- 为已绑定且开启对应通知的用户bulk_create TelegramNotification，由 dispatcher 限流发送
+- 事件标记为已转发后，在一次事件循环中把通知推送到Channels的telegram_notifications组
+- 处理失败时整批回滚并记录失败次数，达到MAX_ATTEMPTS的事件不再重试
+"""
+import datetime
+import logging
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import NotificationOutbox, TelegramNotification, TelegramNotificationSettings, UserTelegramBinding
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TELEGRAM_OUTBOX_SETTINGS = {
+    'BATCH_SIZE': 200,  # 每批转发的事件数量
+    'MAX_ATTEMPTS': 5,  # 失败多少次后不再重试
+    'NUDGE_INTERVAL': 1,  # 事务提交后最多每隔多少秒投递一次转发任务，其余由beat兜底
+    'RETENTION_DAYS': 7,  # 已转发事件的保留天数
+}
+
+NUDGE_CACHE_KEY = 'telegram:outbox:nudge'
+PURGE_CACHE_KEY = 'telegram:outbox:purge'
+CHANNEL_GROUP = 'telegram_notifications'
+
+# 事件类型 -> 对应的通知开关
+SETTING_FIELDS = {
+    'wishlist_view': 'notify_wishlist_view',
+    'wishlist_purchase': 'notify_wishlist_purchase',
+}
+
+
+def get_outbox_settings():
+    """读取TELEGRAM_OUTBOX配置，未配置的项使用默认值"""
+    config = dict(DEFAULT_TELEGRAM_OUTBOX_SETTINGS)
+    config.update(getattr(settings, 'TELEGRAM_OUTBOX', {}))
+    return config
+
+
+def enqueue_relay():
+    """投递转发任务；短时间内多次提交只投递一次，投递失败时由beat兜底"""
+    if not cache.add(NUDGE_CACHE_KEY, 1, get_outbox_settings()['NUDGE_INTERVAL']):
+        return
+    from .tasks import relay_notification_outbox
+    try:
+        relay_notification_outbox.delay()
+    except Exception as e:
+        logger.error(f"投递通知转发任务失败，等待定时任务处理: {str(e)}")
+
+
+def record_event(event_type, **payload):
+    """在当前事务中写入一个事件，事务提交后触发转发"""
+    event = NotificationOutbox.objects.create(event_type=event_type, payload=payload)
+    transaction.on_commit(enqueue_relay)
+    return event
+
+
+def wishlist_view_message(wishlist, viewer_name):
+    viewer_info = f"用户 {viewer_name} " if viewer_name else ""
+    return f"""
+📋 您的心愿单被查看了！
+
+心愿单: <b>{wishlist.name}</b>
+{viewer_info}刚刚查看了您的心愿单。
+
+<a href="https://example.com/wishlist/{wishlist.id}/">点击查看心愿单详情</a>
+    """
+
+
+def wishlist_purchase_message(item, buyer_name):
+    buyer_info = f"用户 {buyer_name} " if buyer_name else ""
+    return f"""
+🎁 您的心愿单物品已被购买！
+
+物品: <b>{item.title}</b>
+价格: {item.price}
+心愿单: {item.wishlist.name}
+
+{buyer_info}已完成了此物品的购买。
+
+<a href="https://example.com/wishlist/{item.wishlist.id}/">点击查看心愿单详情</a>
+    """
+
+
+def build_notifications(events):
+    """
+    把一批事件转换为待发送的通知，返回 [(事件, 接收者用户ID, 通知)]
+    关联对象按类型各查询一次；对象已删除、用户未绑定或关闭了该类通知的事件不生成通知
+    """
+    from wishlist.models import Wishlist, WishlistItem
+
+    wishlist_ids = {e.payload.get('wishlist_id') for e in events if e.event_type == 'wishlist_view'}
+    item_ids = {e.payload.get('item_id') for e in events if e.event_type == 'wishlist_purchase'}
+    wishlists = Wishlist.objects.in_bulk(wishlist_ids - {None})
+    items = WishlistItem.objects.select_related('wishlist').in_bulk(item_ids - {None})
+
+    actor_ids = {e.payload.get('viewer_id') or e.payload.get('buyer_id') for e in events} - {None}
+    usernames = dict(get_user_model().objects.filter(id__in=actor_ids).values_list('id', 'username'))
+
+    resolved = []
+    for event in events:
+        if event.event_type == 'wishlist_view':
+            wishlist = wishlists.get(event.payload.get('wishlist_id'))
+            if wishlist is None:
+                continue
+            owner_id = wishlist.user_id
+            content = wishlist_view_message(wishlist, usernames.get(event.payload.get('viewer_id')))
+            related = ('wishlist', wishlist.id)
+        else:
+            item = items.get(event.payload.get('item_id'))
+            if item is None:
+                continue
+            owner_id = item.wishlist.user_id
+            content = wishlist_purchase_message(item, usernames.get(event.payload.get('buyer_id')))
+            related = ('wishlist_item', item.id)
+        resolved.append((event, owner_id, content, related))
+
+    bindings = {
+        binding.user_id: binding
+        for binding in UserTelegramBinding.objects.filter(
+            user_id__in={owner_id for _, owner_id, _, _ in resolved}, verified=True, is_active=True
+        ).select_related('notification_settings')
+    }
+
+    notifications = []
+    for event, owner_id, content, (related_type, related_id) in resolved:
+        binding = bindings.get(owner_id)
+        if binding is None:
+            continue
+        try:
+            if not getattr(binding.notification_settings, SETTING_FIELDS[event.event_type]):
+                continue
+        except TelegramNotificationSettings.DoesNotExist:
+            pass  # 没有通知设置时使用默认设置（全部开启）
+        notifications.append((event, owner_id, TelegramNotification(
+            user_binding=binding,
+            notification_type=event.event_type,
+            content=content,
+            related_object_type=related_type,
+            related_object_id=related_id,
+        )))
+    return notifications
+
+
+def publish_messages(messages):
+    """在一次事件循环中把全部消息推送到Channels，推送失败不影响已转发的事件"""
+    if not messages:
+        return
+    try:
+        from channels.layers import get_channel_layer
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+
+        async def send_all():
+            for message in messages:
+                await channel_layer.group_send(CHANNEL_GROUP, message)
+
+        async_to_sync(send_all)()
+    except Exception as e:
+        logger.error(f"推送通知到Channels失败: {str(e)}")
+
+
+def relay_outbox():
+    """转发全部未转发的事件，返回统计 {'events', 'notifications', 'failed'}"""
+    config = get_outbox_settings()
+    stats = {'events': 0, 'notifications': 0, 'failed': 0}
+
+    while True:
+        messages = []
+        with transaction.atomic():
+            events = list(
+                NotificationOutbox.objects.select_for_update(skip_locked=True)
+                .filter(published_at__isnull=True, attempts__lt=config['MAX_ATTEMPTS'])
+                .order_by('id')[:config['BATCH_SIZE']]
+            )
+            if not events:
+                break
+
+            try:
+                with transaction.atomic():
+                    notifications = build_notifications(events)
+                    TelegramNotification.objects.bulk_create([notification for _, _, notification in notifications])
+            except Exception as e:
+                logger.exception(f"转发通知事件失败: {str(e)}")
+                for event in events:
+                    event.attempts += 1
+                    event.last_error = str(e)
+                NotificationOutbox.objects.bulk_update(events, ['attempts', 'last_error'])
+                stats['failed'] += len(events)
+                # 本轮不再处理，避免同一批事件反复失败
+                break
+
+            now = timezone.now()
+            for event in events:
+                event.published_at = now
+            NotificationOutbox.objects.bulk_update(events, ['published_at'])
+
+            for event, owner_id, notification in notifications:
+                messages.append({
+                    'type': 'telegram_notification',
+                    'status': 'queued',
+                    'message': notification.get_notification_type_display(),
+                    'user_id': owner_id,
+                    'notification_id': notification.id,
+                })
+            stats['events'] += len(events)
+            stats['notifications'] += len(notifications)
+
+        publish_messages(messages)
+        if notifications:
+            from .tasks import dispatch_telegram_notifications
+            try:
+                dispatch_telegram_notifications.delay()
+            except Exception as e:
+                logger.error(f"投递Telegram发送任务失败，等待定时任务处理: {str(e)}")
+
+    # 每小时最多清理一次已转发的旧事件
+    if cache.add(PURGE_CACHE_KEY, 1, 3600):
+        cutoff = timezone.now() - datetime.timedelta(days=config['RETENTION_DAYS'])
+        NotificationOutbox.objects.filter(published_at__lt=cutoff).delete()
+
+    if any(stats.values()):
+        logger.info(f"通知事件转发完成: {stats}")
+    return stats
@@ -1,6 +1,5 @@
 import logging
 from django.utils import timezone
-from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.auth.models import User
 from django.urls import reverse
 from celery import shared_task
@@ -11,45 +10,38 @@ from .models import (
     TelegramNotificationSettings,
     TelegramNotification
 )
-from .utils import send_telegram_message, can_send_notification, generate_verification_code
+from .utils import send_telegram_message, generate_verification_code
 
 logger = logging.getLogger(__name__)
 
 
+@shared_task(ignore_result=True)
+def dispatch_telegram_notifications():
+    """由Celery beat定时执行，批量发送待发送的Telegram通知（限流见 dispatcher.py）"""
+    from .dispatcher import dispatch_notifications
+    return dispatch_notifications()
+
+
+@shared_task(ignore_result=True)
+def relay_notification_outbox():
+    """转发发件箱中的通知事件（事务提交后触发，另由Celery beat定时兜底）"""
+    from .outbox import relay_outbox
+    return relay_outbox()
+
+
 @shared_task
 def send_telegram_notification(notification_id):
-    """异步发送Telegram消息"""
-    try:
-        notification = TelegramNotification.objects.get(id=notification_id)
-        
-        # 检查是否可以发送通知
-        if not can_send_notification(notification.user_binding):
-            notification.mark_as_failed("用户在免打扰时间段或通知已禁用")
-            return False
-        
-        # 发送消息
-        result = send_telegram_message(
-            notification.user_binding.telegram_id,
-            notification.content
-        )
-        
-        if result:
-            notification.mark_as_sent()
-            return True
-        else:
-            notification.mark_as_failed("发送消息失败")
-            return False
-            
-    except ObjectDoesNotExist:
+    """
+    重新发送一条通知：置为待发送后由批量发送任务统一发送，遵守限流
+    """
+    updated = TelegramNotification.objects.filter(id=notification_id).update(
+        status='pending', attempts=0, next_attempt_at=None, error_message=''
+    )
+    if not updated:
         logger.error(f"通知记录不存在: {notification_id}")
         return False
-    except Exception as e:
-        logger.error(f"发送通知失败: {str(e)}")
-        try:
-            notification.mark_as_failed(str(e))
-        except:
-            pass
-        return False
+    dispatch_telegram_notifications.delay()
+    return True
 
 
 @shared_task
@@ -223,8 +215,8 @@ def notify_wishlist_viewed(wishlist_id, viewer_id=None):
                 related_object_id=wishlist.id
             )
             
-            # 发送通知
-            send_telegram_notification.delay(notification.id)
+            # 由批量发送任务统一发送
+            dispatch_telegram_notifications.delay()
             
         except UserTelegramBinding.DoesNotExist:
             # 用户未绑定Telegram，不发送通知
@@ -287,8 +279,8 @@ def notify_wishlist_item_purchased(wishlist_item_id, buyer_id=None):
                 related_object_id=item.id
             )
             
-            # 发送通知
-            send_telegram_notification.delay(notification.id)
+            # 由批量发送任务统一发送
+            dispatch_telegram_notifications.delay()
             
         except UserTelegramBinding.DoesNotExist:
             # 用户未绑定Telegram，不发送通知
@@ -0,0 +1,300 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+
+from mall.http_client import HttpClient
+
+from wishlist.models import Wishlist
+
+from .dispatcher import RateLimiter, dispatch_notifications
+from .models import (
+    NotificationOutbox, TelegramBotSettings, TelegramNotification, TelegramNotificationSettings, UserTelegramBinding
+)
+from .outbox import PURGE_CACHE_KEY, record_event, relay_outbox
+
+User = get_user_model()
+
+
+class FakeBotAPIHandler(BaseHTTPRequestHandler):
+    """模拟Bot API的sendMessage：按聊天预设响应，未预设时返回成功"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        chat_id = str(body['chat_id'])
+        self.server.requests.append((chat_id, time.monotonic()))
+        time.sleep(getattr(self.server, 'delay', 0))
+        queued = self.server.responses.get(chat_id) or []
+        status, payload = queued.pop(0) if queued else (200, {'ok': True, 'result': {'message_id': 1}})
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class RateLimiterTests(TestCase):
+    def test_chat_and_global_limits(self):
+        clock = FakeClock()
+        limiter = RateLimiter(global_rate=2, chat_rate=1, clock=clock, sleep=clock.sleep)
+
+        sent = []
+        for chat_id in ['a', 'a', 'b', 'c']:
+            self.assertEqual(limiter.acquire(chat_id, max_wait=10), 0)
+            sent.append((chat_id, clock.now))
+
+        # 同一聊天间隔1秒；全局2条/秒
+        self.assertEqual(sent[0], ('a', 0.0))
+        self.assertAlmostEqual(sent[1][1], 1.0)
+        self.assertLessEqual(sent[3][1] - sent[0][1], 2.0)
+
+    def test_block_and_max_wait(self):
+        clock = FakeClock()
+        limiter = RateLimiter(global_rate=30, chat_rate=1, clock=clock, sleep=clock.sleep)
+        limiter.block('a', 30)
+        self.assertAlmostEqual(limiter.acquire('a', max_wait=5), 30)
+        self.assertEqual(clock.now, 0)
+        self.assertEqual(limiter.acquire('b', max_wait=5), 0)
+
+
+class FakeBotAPIMixin:
+    """启动本地模拟的Bot API，并准备机器人设置和三个已绑定的用户"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeBotAPIHandler)
+        cls.server.daemon_threads = True
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.api_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.server.requests = []
+        self.server.responses = {}
+        self.server.delay = 0
+        TelegramBotSettings.objects.create(bot_token='TEST', is_active=True)
+        self.bindings = []
+        for index in range(3):
+            user = User.objects.create_user(username=f'tg{index}', password='pass')
+            binding = UserTelegramBinding.objects.create(user=user, telegram_id=str(1000 + index), verified=True)
+            TelegramNotificationSettings.objects.create(user_binding=binding)
+            self.bindings.append(binding)
+        self.client = HttpClient('fake-telegram', self.api_url, RETRIES=0)
+        self.addCleanup(self.client.close)
+        self.settings = override_settings(TELEGRAM_DISPATCHER={'API_URL': self.api_url, 'MAX_WAIT': 5})
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def notify(self, binding, count=1):
+        return [
+            TelegramNotification.objects.create(
+                user_binding=binding, notification_type='system', content=f'消息{index}'
+            )
+            for index in range(count)
+        ]
+
+    def dispatch(self, **limits):
+        options = {'global_rate': 1000, 'chat_rate': 1000, 'chat_burst': 1000}
+        options.update(limits)
+        return dispatch_notifications(client=self.client, limiter=RateLimiter(**options))
+
+
+class DispatcherTests(FakeBotAPIMixin, TestCase):
+    """批量发送：对本地模拟的Bot API发送，验证限流、retry_after和状态写回"""
+
+    def test_batch_is_sent_and_written_back_in_bulk(self):
+        for binding in self.bindings:
+            self.notify(binding, 2)
+
+        # 机器人设置 + 取一批并加锁 + bulk_update + 确认没有下一批，每批事务在测试中各多一对保存点语句
+        with self.assertNumQueries(8):
+            stats = self.dispatch()
+
+        self.assertEqual(stats, {'sent': 6, 'failed': 0, 'deferred': 0})
+        self.assertEqual(len(self.server.requests), 6)
+        self.assertFalse(TelegramNotification.objects.exclude(status='sent').exists())
+
+    def test_per_chat_rate_limit(self):
+        self.notify(self.bindings[0], 3)
+        stats = self.dispatch(chat_rate=5, chat_burst=1)
+
+        self.assertEqual(stats['sent'], 3)
+        times = [at for _, at in self.server.requests]
+        self.assertGreaterEqual(times[2] - times[0], 0.35)
+
+    def test_retry_after_is_honoured(self):
+        chat_id = self.bindings[0].telegram_id
+        self.server.responses[chat_id] = [
+            (429, {'ok': False, 'description': 'Too Many Requests', 'parameters': {'retry_after': 1}}),
+        ]
+        notification, = self.notify(self.bindings[0])
+        self.dispatch()
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'sent')
+        self.assertEqual(notification.attempts, 1)
+        (_, first), (_, second) = self.server.requests
+        self.assertGreaterEqual(second - first, 0.9)
+
+    def test_long_retry_after_defers_to_next_run(self):
+        chat_id = self.bindings[0].telegram_id
+        self.server.responses[chat_id] = [
+            (429, {'ok': False, 'description': 'Too Many Requests', 'parameters': {'retry_after': 60}}),
+        ]
+        first, second = self.notify(self.bindings[0], 2)
+        stats = self.dispatch()
+
+        self.assertEqual(stats['deferred'], 2)
+        self.assertEqual(len(self.server.requests), 1)
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'pending')
+        self.assertEqual(first.attempts, 0)
+        self.assertIsNotNone(first.next_attempt_at)
+        # 到期前不会再次发送
+        self.assertEqual(self.dispatch(), {'sent': 0, 'failed': 0, 'deferred': 0})
+
+    def test_client_errors_fail_without_retry(self):
+        chat_id = self.bindings[1].telegram_id
+        self.server.responses[chat_id] = [
+            (403, {'ok': False, 'description': 'Forbidden: bot was blocked by the user'}),
+        ]
+        notification, = self.notify(self.bindings[1])
+        self.dispatch()
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'failed')
+        self.assertIn('blocked', notification.error_message)
+
+    def test_server_errors_are_retried_later(self):
+        chat_id = self.bindings[2].telegram_id
+        self.server.responses[chat_id] = [(502, {'ok': False, 'description': 'Bad Gateway'})]
+        notification, = self.notify(self.bindings[2])
+        self.dispatch()
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'pending')
+        self.assertEqual(notification.attempts, 1)
+        self.assertIsNotNone(notification.next_attempt_at)
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked', 'has_select_for_update_of')
+class ConcurrentDispatchTests(FakeBotAPIMixin, TransactionTestCase):
+    """缓存锁不共享（如各进程的本地内存缓存）时，并发执行的两轮发送不会重复发送同一条通知"""
+
+    def test_concurrent_runs_claim_different_notifications(self):
+        for binding in self.bindings:
+            self.notify(binding, 2)
+        self.server.delay = 0.1
+        results = []
+
+        def run():
+            try:
+                results.append(self.dispatch())
+            finally:
+                connection.close()
+
+        with override_settings(TELEGRAM_DISPATCHER={'API_URL': self.api_url, 'BATCH_SIZE': 2}), \
+                mock.patch('telegram_bot.dispatcher.cache') as process_cache:
+            process_cache.add.return_value = True
+            threads = [threading.Thread(target=run) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(sum(stats['sent'] for stats in results), 6)
+        self.assertTrue(all(stats['sent'] for stats in results))
+        self.assertEqual(len(self.server.requests), 6)
+        self.assertFalse(TelegramNotification.objects.exclude(status='sent').exists())
+
+
+@mock.patch('telegram_bot.tasks.dispatch_telegram_notifications.delay')
+@mock.patch('telegram_bot.outbox.publish_messages')
+class NotificationOutboxTests(TestCase):
+    """信号只写入发件箱事件，由relay_outbox批量生成通知并推送"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass')
+        self.viewer = User.objects.create_user(username='viewer', password='pass')
+        binding = UserTelegramBinding.objects.create(user=self.owner, telegram_id='2000', verified=True)
+        TelegramNotificationSettings.objects.create(user_binding=binding)
+        self.wishlist = Wishlist.objects.create(name='生日', user=self.owner)
+
+    @mock.patch('telegram_bot.outbox.enqueue_relay')
+    def test_signal_only_writes_event(self, enqueue_relay, publish_messages, dispatch):
+        self.wishlist._viewer_id = self.viewer.id
+        # 心愿单UPDATE + 事件INSERT，不查询查看者、不访问Channels
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(2):
+            self.wishlist.save()
+
+        event = NotificationOutbox.objects.get()
+        self.assertEqual(event.payload, {'wishlist_id': self.wishlist.id, 'viewer_id': self.viewer.id})
+        self.assertFalse(TelegramNotification.objects.exists())
+        enqueue_relay.assert_called_once_with()
+        publish_messages.assert_not_called()
+
+    def test_relay_creates_notifications(self, publish_messages, dispatch):
+        record_event('wishlist_view', wishlist_id=self.wishlist.id, viewer_id=self.viewer.id)
+        record_event('wishlist_purchase', item_id=999999, buyer_id=None)  # 物品不存在，跳过
+
+        stats = relay_outbox()
+
+        self.assertEqual(stats, {'events': 2, 'notifications': 1, 'failed': 0})
+        notification = TelegramNotification.objects.get()
+        self.assertEqual(notification.notification_type, 'wishlist_view')
+        self.assertIn('viewer', notification.content)
+        self.assertFalse(NotificationOutbox.objects.filter(published_at__isnull=True).exists())
+        messages, = publish_messages.call_args.args
+        self.assertEqual(messages[0]['notification_id'], notification.id)
+        dispatch.assert_called_once_with()
+
+        # 已转发的事件不会再次处理
+        self.assertEqual(relay_outbox(), {'events': 0, 'notifications': 0, 'failed': 0})
+
+    def test_relay_queries_do_not_grow_with_events(self, publish_messages, dispatch):
+        record_event('wishlist_view', wishlist_id=self.wishlist.id, viewer_id=self.viewer.id)
+        # 两次都执行旧事件清理，只比较转发本身的查询数量
+        cache.delete(PURGE_CACHE_KEY)
+        with CaptureQueriesContext(connection) as single:
+            relay_outbox()
+
+        for _ in range(10):
+            record_event('wishlist_view', wishlist_id=self.wishlist.id, viewer_id=self.viewer.id)
+        cache.delete(PURGE_CACHE_KEY)
+        with CaptureQueriesContext(connection) as many:
+            relay_outbox()
+
+        self.assertEqual(len(many.captured_queries), len(single.captured_queries))
+        self.assertEqual(TelegramNotification.objects.count(), 11)
@@ -1,17 +1,23 @@
 import logging
 import random
 import string
-import requests
 from django.conf import settings
 from django.urls import reverse
 from django.utils import timezone
 
+from mall.http_client import get_client
+
 logger = logging.getLogger(__name__)
 
 # Telegram Bot API基础URL
 TELEGRAM_API_BASE = "https://api.telegram.org/bot"
 
 
+def get_telegram_client():
+    """Telegram Bot API的共享HTTP客户端（长连接、超时、重试、熔断）"""
+    return get_client('telegram', base_url='https://api.telegram.org')
+
+
 def get_bot_settings():
     """获取机器人配置"""
     from .models import TelegramBotSettings
@@ -34,7 +40,7 @@ def setup_telegram_webhook(bot_settings):
     # 请求Telegram API设置webhook
     api_url = f"{TELEGRAM_API_BASE}{bot_settings.bot_token}/setWebhook"
     try:
-        response = requests.post(api_url, json={
+        response = get_telegram_client().post(api_url, json={
             'url': webhook_url,
             'allowed_updates': ['message', 'callback_query']
         })
@@ -85,7 +91,7 @@ def send_telegram_message(chat_id, text, parse_mode='HTML', reply_markup=None):
         payload['reply_markup'] = reply_markup
     
     try:
-        response = requests.post(api_url, json=payload)
+        response = get_telegram_client().post(api_url, json=payload)
         if response.status_code == 200 and response.json().get('ok'):
             return response.json().get('result')
         else:
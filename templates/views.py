@@ -4,6 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 import json
 from goods.models import GoodsCategory, Goods
+from goods.visibility import filter_visible_in_site
 from api.utils import get_current_site
 from mall.settings import SITE_NAMES
 
@@ -63,7 +64,9 @@ def get_site_blocks(request, site_id):
     # 这里我们返回一些示例数据
     
     # 获取一些分类数据
-    categories = GoodsCategory.objects.filter(visible_in__contains=[site_id])[:4]
+    categories = GoodsCategory.objects.filter(
+        id__in=filter_visible_in_site(Goods.objects.all(), site_id).values('category_id')
+    )[:4]
     category_data = []
     for category in categories:
         category_data.append({
@@ -74,7 +77,7 @@ def get_site_blocks(request, site_id):
         })
     
     # 获取一些商品数据
-    products = Goods.objects.filter(visible_in__contains=[site_id])[:8]
+    products = filter_visible_in_site(Goods.objects.all(), site_id)[:8]
     product_data = []
     for product in products:
         product_data.append({
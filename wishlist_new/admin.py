@@ -7,7 +7,9 @@ class WishlistItemInline(admin.TabularInline):
 
 @admin.register(Wishlist)
 class WishlistAdmin(admin.ModelAdmin):
-    list_display = ('name', 'user', 'is_public', 'created_at')
+    list_display = ('name', 'user', 'is_public', 'view_count', 'created_at')
+    list_select_related = ('user',)
+    readonly_fields = ('view_count',)
     list_filter = ('is_public', 'created_at')
     search_fields = ('name', 'user__username')
     inlines = [WishlistItemInline]
@@ -15,6 +17,7 @@ class WishlistAdmin(admin.ModelAdmin):
 @admin.register(WishlistItem)
 class WishlistItemAdmin(admin.ModelAdmin):
     list_display = ('title', 'wishlist', 'price', 'currency', 'priority', 'purchased', 'added_at')
+    list_select_related = ('wishlist__user',)
     list_filter = ('added_at', 'purchased', 'priority', 'currency')
     search_fields = ('title', 'description', 'wishlist__name')
     raw_id_fields = ('wishlist', 'purchased_by')
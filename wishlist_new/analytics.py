@@ -0,0 +1,76 @@
+"""
+心愿单统计
+
+每个统计口径(已购买/未购买/支付完成)的数量和金额都用带 filter 的 Count/Sum 在同一条查询中计算，
+浏览量直接读取 Wishlist.view_count（已写库的浏览次数，见 view_counter.py），不再关联浏览记录表：
+- wishlist_stats: 单个心愿单，一条查询
+- user_wishlist_stats: 用户全部心愿单按心愿单分组，一条查询返回每个心愿单的明细，汇总在Python中累加
+"""
+from django.db.models import Count, F, Q, Sum
+
+from .models import Wishlist
+
+# 统计口径: 名称 -> 商品筛选条件（相对Wishlist，经由items关联）
+BUCKETS = {
+    'purchased': Q(items__purchased=True),
+    'unpurchased': Q(items__purchased=False),
+    'payment_completed': Q(items__payment_completed=True),
+}
+
+
+def _annotations():
+    annotations = {'views_count': F('view_count')}
+    for name, condition in BUCKETS.items():
+        annotations[f'{name}_count'] = Count('items', filter=condition)
+        annotations[f'{name}_amount'] = Sum('items__price', filter=condition)
+    return annotations
+
+
+def annotate_stats(queryset):
+    """为心愿单查询集加上统计字段，每个心愿单一行"""
+    return queryset.annotate(**_annotations())
+
+
+def _breakdown(wishlist):
+    data = {'views_count': wishlist.views_count}
+    for name in BUCKETS:
+        data[name] = {
+            'count': getattr(wishlist, f'{name}_count'),
+            'amount': getattr(wishlist, f'{name}_amount') or 0,
+        }
+    return data
+
+
+def _empty():
+    data = {'views_count': 0}
+    for name in BUCKETS:
+        data[name] = {'count': 0, 'amount': 0}
+    return data
+
+
+def wishlist_stats(wishlist):
+    """单个心愿单的浏览量和各口径商品数量、金额"""
+    annotated = annotate_stats(Wishlist.objects.filter(pk=wishlist.pk)).order_by().first()
+    if annotated is None:
+        return _empty()
+    return _breakdown(annotated)
+
+
+def user_wishlist_stats(user):
+    """
+    用户全部心愿单的汇总统计和按心愿单分组的明细
+    返回的汇总字段与单个心愿单一致，另有 wishlists_count 和 wishlists 明细列表
+    """
+    totals = _empty()
+    wishlists = []
+    for wishlist in annotate_stats(Wishlist.objects.filter(user=user)):
+        breakdown = _breakdown(wishlist)
+        totals['views_count'] += breakdown['views_count']
+        for name in BUCKETS:
+            totals[name]['count'] += breakdown[name]['count']
+            totals[name]['amount'] += breakdown[name]['amount']
+        wishlists.append({'id': str(wishlist.id), 'name': wishlist.name, **breakdown})
+
+    totals['wishlists_count'] = len(wishlists)
+    totals['wishlists'] = wishlists
+    return totals
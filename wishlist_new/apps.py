@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class WishlistNewConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'wishlist_new'
+
+    def ready(self):
+        import wishlist_new.signals  # 导入信号处理模块
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_view_count(apps, schema_editor):
+    """用已有的浏览记录初始化浏览次数"""
+    Wishlist = apps.get_model('wishlist_new', 'Wishlist')
+    WishlistView = apps.get_model('wishlist_new', 'WishlistView')
+    counts = WishlistView.objects.order_by().values('wishlist').annotate(total=Count('id'))
+    for row in counts.iterator():
+        Wishlist.objects.filter(pk=row['wishlist']).update(view_count=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlist_new', '0006_alter_wishlist_options_alter_wishlistitem_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wishlist',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='浏览次数'),
+        ),
+        migrations.AddField(
+            model_name='wishlistview',
+            name='dedupe_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='去重键'),
+        ),
+        migrations.RunPython(backfill_view_count, migrations.RunPython.noop),
+    ]
@@ -17,6 +17,7 @@ class Wishlist(models.Model):
     description = models.TextField(blank=True, verbose_name=_('描述'))
     is_public = models.BooleanField(default=True, verbose_name=_('是否公开'))
     share_code = models.CharField(max_length=20, unique=True, blank=True, verbose_name=_('分享码'))
+    view_count = models.PositiveIntegerField(default=0, verbose_name='浏览次数')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     
@@ -51,8 +52,9 @@ class Wishlist(models.Model):
         return reverse('wishlist_share', args=[self.share_code])
         
     def get_view_count(self):
-        """获取心愿单浏览次数"""
-        return self.views.count()
+        """获取心愿单浏览次数（含缓存中尚未写入数据库的浏览）"""
+        from .view_counter import get_view_count
+        return get_view_count(self)
 
 
 class WishlistItem(models.Model):
@@ -114,6 +116,8 @@ class WishlistView(models.Model):
     ip_address = models.GenericIPAddressField(blank=True, null=True, verbose_name='IP地址')
     user_agent = models.TextField(blank=True, verbose_name='User Agent')
     viewed_at = models.DateTimeField(auto_now_add=True, verbose_name='浏览时间')
+    # 心愿单+访客指纹+时间段，批量写入时用于去重，重复写入同一批浏览不会重复计数
+    dedupe_key = models.CharField(max_length=64, unique=True, null=True, blank=True, verbose_name='去重键')
     
     class Meta:
         app_label = 'wishlist_new'
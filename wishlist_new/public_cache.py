@@ -0,0 +1,74 @@
+"""
+公开心愿单缓存
+
+分享链接是访问量最大的匿名页面，按分享码缓存序列化后的心愿单数据（读穿透）：
+- get_public_wishlist(share_code, build, origin): 命中直接返回缓存数据，未命中时调用build生成并写入缓存
+- 序列化结果中的图片为按请求主机生成的绝对URL，同一分享码下按origin(协议+主机)分别保存，
+  失效时删除分享码对应的缓存键即可清除所有主机的数据
+- 心愿单、心愿单物品保存/删除以及关联支付完成时，在事务提交后删除对应分享码的缓存；
+  分享码变更时新旧分享码一起删除（见 signals.py）
+
+失效在事务提交后执行，提交前并发请求读到的旧数据最多保留TIMEOUT秒。
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Wishlist
+
+DEFAULT_PUBLIC_CACHE_SETTINGS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'wishlist:public',
+    'TIMEOUT': 300,
+}
+
+
+def get_public_cache_settings():
+    """读取WISHLIST_PUBLIC_CACHE配置，未配置的项使用默认值"""
+    config = dict(DEFAULT_PUBLIC_CACHE_SETTINGS)
+    config.update(getattr(settings, 'WISHLIST_PUBLIC_CACHE', {}))
+    return config
+
+
+def get_cache():
+    return caches[get_public_cache_settings()['CACHE_ALIAS']]
+
+
+def cache_key(share_code):
+    return f"{get_public_cache_settings()['KEY_PREFIX']}:{share_code}"
+
+
+def get_public_wishlist(share_code, build, origin=''):
+    """
+    返回分享码对应的公开心愿单数据
+    build为无参回调，返回序列化后的数据，心愿单不存在或不公开时返回None（不缓存）
+    origin为请求的协议和主机，不同主机访问时分别缓存
+    """
+    config = get_public_cache_settings()
+    if not config['ENABLED']:
+        return build()
+
+    cache = get_cache()
+    key = cache_key(share_code)
+    entries = cache.get(key) or {}
+    if origin in entries:
+        return entries[origin]
+
+    data = build()
+    if data is not None:
+        entries[origin] = data
+        cache.set(key, entries, config['TIMEOUT'])
+    return data
+
+
+def invalidate_share_codes(share_codes):
+    share_codes = [code for code in share_codes if code]
+    if share_codes:
+        get_cache().delete_many([cache_key(code) for code in share_codes])
+
+
+def invalidate_wishlists(wishlist_ids):
+    """按心愿单ID删除缓存，需要一次查询取分享码"""
+    wishlist_ids = [pk for pk in wishlist_ids if pk]
+    if wishlist_ids:
+        invalidate_share_codes(Wishlist.objects.filter(pk__in=wishlist_ids).values_list('share_code', flat=True))
@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import Wishlist, WishlistItem
+from .public_cache import invalidate_share_codes, invalidate_wishlists
+
+
+@receiver(post_init, sender=Wishlist)
+def remember_share_code(sender, instance, **kwargs):
+    """记录加载时的分享码，分享码变更后旧分享码的缓存也要删除（延迟加载的字段不读取）"""
+    instance._loaded_share_code = instance.__dict__.get('share_code')
+
+
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=Wishlist)
+def invalidate_public_wishlist(sender, instance, **kwargs):
+    """心愿单修改或删除提交后删除其新旧分享码对应的公开缓存"""
+    share_codes = {instance.share_code, getattr(instance, '_loaded_share_code', None)}
+    instance._loaded_share_code = instance.share_code
+    transaction.on_commit(lambda: invalidate_share_codes(share_codes))
+
+
+@receiver(post_save, sender=WishlistItem)
+@receiver(post_delete, sender=WishlistItem)
+def invalidate_public_wishlist_for_item(sender, instance, **kwargs):
+    """
+    物品增删改（包括标记为已购买）提交后删除所属心愿单的公开缓存
+    物品已带有心愿单对象（select_related或创建时传入）时直接使用其分享码，不再查询
+    """
+    if WishlistItem.wishlist.is_cached(instance):
+        share_code = instance.wishlist.share_code
+        transaction.on_commit(lambda: invalidate_share_codes([share_code]))
+        return
+    wishlist_id = instance.wishlist_id
+    transaction.on_commit(lambda: invalidate_wishlists([wishlist_id]))
+
+
+@receiver(post_save, sender='payment.Payment')
+def invalidate_public_wishlist_for_payment(sender, instance, **kwargs):
+    """关联心愿单物品的支付完成后删除对应心愿单的公开缓存"""
+    if instance.status != 'completed' or not instance.wishlist_item_id:
+        return
+    item_id = instance.wishlist_item_id
+    transaction.on_commit(lambda: invalidate_wishlists(
+        WishlistItem.objects.filter(pk=item_id).values_list('wishlist_id', flat=True)
+    ))
@@ -0,0 +1,8 @@
+from celery import shared_task
+
+
+@shared_task(ignore_result=True)
+def flush_wishlist_views():
+    """由Celery beat定时执行，把缓存中的心愿单浏览批量写入数据库"""
+    from .view_counter import flush_views
+    return flush_views()
@@ -1,3 +1,246 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .analytics import user_wishlist_stats, wishlist_stats
+from .models import Wishlist, WishlistItem, WishlistView
+from .public_cache import cache_key
+from .view_counter import _key, flush_views, record_view
+
+User = get_user_model()
+
+
+def add_items(wishlist, count, price='10.00', purchased=False, payment_completed=False):
+    for index in range(count):
+        WishlistItem.objects.create(
+            wishlist=wishlist,
+            title=f'商品{index}',
+            price=Decimal(price),
+            purchased=purchased,
+            payment_completed=payment_completed,
+        )
+
+
+class WishlistStatsTests(TestCase):
+    """心愿单统计：每个口径的数量和金额在一条查询中完成，查询数量不随心愿单数量增长"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='stats', password='pass')
+        cls.wishlist = Wishlist.objects.create(user=cls.user, name='生日', view_count=3)
+        add_items(cls.wishlist, 2, price='10.00')
+        add_items(cls.wishlist, 1, price='25.50', purchased=True, payment_completed=True)
+        cls.empty = Wishlist.objects.create(user=cls.user, name='空心愿单')
+
+    def test_wishlist_stats_single_query(self):
+        with self.assertNumQueries(1):
+            stats = wishlist_stats(self.wishlist)
+
+        self.assertEqual(stats['views_count'], 3)
+        self.assertEqual(stats['purchased'], {'count': 1, 'amount': Decimal('25.50')})
+        self.assertEqual(stats['unpurchased'], {'count': 2, 'amount': Decimal('20.00')})
+        self.assertEqual(stats['payment_completed'], {'count': 1, 'amount': Decimal('25.50')})
+
+    def test_user_stats_grouped_by_wishlist(self):
+        with self.assertNumQueries(1):
+            stats = user_wishlist_stats(self.user)
+
+        self.assertEqual(stats['wishlists_count'], 2)
+        self.assertEqual(stats['views_count'], 3)
+        self.assertEqual(stats['unpurchased'], {'count': 2, 'amount': Decimal('20.00')})
+        breakdowns = {row['name']: row for row in stats['wishlists']}
+        self.assertEqual(breakdowns['空心愿单']['purchased'], {'count': 0, 'amount': 0})
+        self.assertEqual(breakdowns['生日']['views_count'], 3)
+
+        # 新增心愿单后仍然只有一条查询
+        for index in range(5):
+            add_items(Wishlist.objects.create(user=self.user, name=f'新心愿单{index}'), 2)
+        with self.assertNumQueries(1):
+            stats = user_wishlist_stats(self.user)
+        self.assertEqual(stats['wishlists_count'], 7)
+        self.assertEqual(stats['unpurchased']['count'], 12)
+
+    def test_stats_endpoints(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(f'/api/v1/wishlist/lists/{self.wishlist.id}/stats/')
+        self.assertEqual(response.status_code, 200)
+        response = client.get('/api/v1/wishlist/stats/')
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(WISHLIST_VIEW_COUNTER={'BUFFERED': True})
+class WishlistViewCounterTests(TestCase):
+    """浏览计数：接口不写库，去重后由flush_views批量写入，重复执行不会重复计数"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass')
+        self.wishlist = Wishlist.objects.create(user=self.owner, name='分享')
+
+    def view(self, ip):
+        request = RequestFactory().post('/', REMOTE_ADDR=ip, HTTP_USER_AGENT='test')
+        request.user = AnonymousUser()
+        return record_view(self.wishlist, request)
+
+    def test_view_endpoint_does_not_write(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        url = f'/api/v1/wishlist/lists/{self.wishlist.id}/view/'
+        for _ in range(3):
+            response = client.post(url)
+            self.assertEqual(response.status_code, 200)
+        self.assertFalse(WishlistView.objects.exists())
+        self.assertEqual(self.wishlist.get_view_count(), 1)
+
+    def test_views_buffered_and_deduplicated(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.view('10.0.0.1'), 1)
+            self.assertEqual(self.view('10.0.0.1'), 1)
+            self.assertEqual(self.view('10.0.0.2'), 2)
+        self.assertFalse(WishlistView.objects.exists())
+
+        stats = flush_views()
+        self.assertEqual(stats['created'], 2)
+        self.wishlist.refresh_from_db()
+        self.assertEqual(self.wishlist.view_count, 2)
+        self.assertEqual(WishlistView.objects.filter(wishlist=self.wishlist).count(), 2)
+        self.assertEqual(self.wishlist.get_view_count(), 2)
+
+    def test_flush_is_idempotent(self):
+        self.view('10.0.0.1')
+        self.view('10.0.0.2')
+        events = cache.get_many([_key('event', 1), _key('event', 2)])
+        flush_views()
+
+        # 模拟写库后、推进序号前进程退出：事件和序号恢复原状后再次执行
+        cache.set_many(events)
+        cache.set(_key('flushed'), 0)
+        stats = flush_views()
+        self.assertEqual(stats['read'], 2)
+        self.assertEqual(stats['created'], 0)
+        self.wishlist.refresh_from_db()
+        self.assertEqual(self.wishlist.view_count, 2)
+
+    def test_count_survives_cache_loss(self):
+        self.view('10.0.0.1')
+        flush_views()
+        cache.clear()
+        self.wishlist.refresh_from_db()
+        self.assertEqual(self.wishlist.get_view_count(), 1)
+        self.assertEqual(self.view('10.0.0.3'), 2)
+
+    @override_settings(WISHLIST_VIEW_COUNTER={})
+    def test_process_local_cache_writes_directly(self):
+        # 本地内存缓存中的事件Celery worker读不到，浏览直接写库
+        self.assertEqual(self.view('10.0.0.1'), 1)
+        self.assertEqual(self.view('10.0.0.1'), 1)
+        self.assertEqual(self.view('10.0.0.2'), 2)
+        self.wishlist.refresh_from_db()
+        self.assertEqual(self.wishlist.view_count, 2)
+        self.assertEqual(WishlistView.objects.filter(wishlist=self.wishlist).count(), 2)
+        self.assertIsNone(cache.get(_key('seq')))
+
+
+class PublicWishlistCacheTests(TestCase):
+    """公开心愿单：按分享码缓存，物品变更或购买后失效；公开列表使用键集分页且不输出物品描述"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='sharer', password='pass')
+        self.wishlist = Wishlist.objects.create(user=self.owner, name='公开心愿单')
+        add_items(self.wishlist, 2)
+        self.client = APIClient()
+        self.url = f'/api/v1/wishlist/lists/share/{self.wishlist.share_code}/'
+
+    def test_share_code_cached(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertIsNotNone(cache.get(cache_key(self.wishlist.share_code)))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_item_changes_invalidate(self):
+        self.client.get(self.url)
+        item = self.wishlist.items.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            item.purchased = True
+            item.save()
+        self.assertIsNone(cache.get(cache_key(self.wishlist.share_code)))
+
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertIsNone(cache.get(cache_key(self.wishlist.share_code)))
+
+    def test_image_urls_cached_per_host(self):
+        item = self.wishlist.items.first()
+        item.image = 'wishlist_items/gift.jpg'
+        item.save()
+
+        def image_urls(**extra):
+            body = self.client.get(self.url, **extra).json()
+            body = body.get('data', body)
+            return {row['image'] for row in body['items'] if row['image']}
+
+        self.assertEqual(image_urls(), {'http://testserver/media/wishlist_items/gift.jpg'})
+        self.assertEqual(image_urls(HTTP_HOST='localhost'), {'http://localhost/media/wishlist_items/gift.jpg'})
+        with self.assertNumQueries(0):
+            self.assertEqual(image_urls(), {'http://testserver/media/wishlist_items/gift.jpg'})
+
+    def test_share_code_change_invalidates_old_code(self):
+        self.client.get(self.url)
+        old_code = self.wishlist.share_code
+        wishlist = Wishlist.objects.get(pk=self.wishlist.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            wishlist.share_code = wishlist.generate_share_code()
+            wishlist.save()
+        self.assertIsNone(cache.get(cache_key(old_code)))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_item_with_loaded_wishlist_invalidates_without_query(self):
+        self.client.get(self.url)
+        item = WishlistItem.objects.select_related('wishlist').filter(wishlist=self.wishlist).first()
+        with self.captureOnCommitCallbacks() as callbacks:
+            item.purchased = True
+            item.save()
+        with self.assertNumQueries(0):
+            for callback in callbacks:
+                callback()
+        self.assertIsNone(cache.get(cache_key(self.wishlist.share_code)))
+
+    def test_private_wishlist_not_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.wishlist.is_public = False
+            self.wishlist.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertIsNone(cache.get(cache_key(self.wishlist.share_code)))
+
+    def test_list_public_keyset_without_descriptions(self):
+        for index in range(3):
+            add_items(Wishlist.objects.create(user=self.owner, name=f'列表{index}'), 2)
+
+        response = self.client.get('/api/v1/wishlist/lists/list_public/', {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        body = body.get('data', body)
+        self.assertEqual(len(body['results']), 2)
+        self.assertIsNotNone(body['next'])
+        self.assertNotIn('description', body['results'][0]['items'][0])
+
+        # UUID主键的游标可以正常翻页，且不会重复
+        response = self.client.get(body['next'])
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        page = page.get('data', page)
+        first_ids = {row['id'] for row in body['results']}
+        self.assertEqual(len(page['results']), 2)
+        self.assertFalse(first_ids & {row['id'] for row in page['results']})
+
+        # 物品预取，查询数量不随心愿单数量增长
+        with self.assertNumQueries(2):
+            self.client.get('/api/v1/wishlist/lists/list_public/', {'page_size': 4})
@@ -0,0 +1,228 @@
+"""
+心愿单浏览计数（先写缓存，定时批量写库）
+
+浏览接口不再每次插入WishlistView并COUNT(*)：
+- 同一访客(登录用户ID或IP+User-Agent)在同一时间段(BUCKET_SECONDS)内对同一心愿单只计一次，
+  去重键 = hash(心愿单, 访客指纹, 时间段)，用 cache.add 判断是否首次出现
+- 首次出现的浏览分配一个全局序号写入缓存事件队列，同时自增缓存中的浏览总数，接口直接返回该总数
+- flush_views 由Celery beat定时执行：按序号批量读取事件，bulk_create写入WishlistView，
+  并按心愿单累加 Wishlist.view_count，最后推进已写入序号
+- 去重键在WishlistView上唯一，写入前先查询已存在的去重键，已写入的浏览不会重复计数；
+  写库后、推进序号前进程退出时，下次执行会重新读取同一批事件并全部跳过，因此重复执行是安全的
+
+缓冲依赖共享缓存(Redis)：本地内存缓存只在当前进程内可见，Celery worker读不到其中的事件，
+此时record_view不经过缓冲，直接把浏览写入数据库（仍按去重键去重）。
+WishlistView.viewed_at 为写库时间，与实际浏览时间最多相差一个执行周期。
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Wishlist, WishlistView
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VIEW_COUNTER_SETTINGS = {
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'wishlist:views',
+    'BUCKET_SECONDS': 1800,  # 同一访客在该时间段内重复浏览只计一次
+    'BATCH_SIZE': 500,  # 每批写库的事件数量
+    'EVENT_TIMEOUT': 86400,  # 未写库事件在缓存中的保留时间(秒)
+    'TOTAL_TIMEOUT': 86400,  # 缓存浏览总数的有效期(秒)，过期后从数据库重新初始化
+    'LOCK_TIMEOUT': 300,  # 防止多个beat周期重叠执行的锁时间(秒)
+    'BUFFERED': None,  # 是否先写缓存再批量写库；None按缓存后端判断，本地内存缓存时直接写库
+}
+
+
+def get_view_counter_settings():
+    """读取WISHLIST_VIEW_COUNTER配置，未配置的项使用默认值"""
+    config = dict(DEFAULT_VIEW_COUNTER_SETTINGS)
+    config.update(getattr(settings, 'WISHLIST_VIEW_COUNTER', {}))
+    return config
+
+
+def get_cache():
+    return caches[get_view_counter_settings()['CACHE_ALIAS']]
+
+
+def is_buffered():
+    """浏览事件是否经缓存缓冲：只有多个进程共享的缓存才能把事件交给flush_views"""
+    buffered = get_view_counter_settings()['BUFFERED']
+    if buffered is None:
+        return not isinstance(get_cache(), LocMemCache)
+    return buffered
+
+
+def _key(*parts):
+    return ':'.join([get_view_counter_settings()['KEY_PREFIX'], *map(str, parts)])
+
+
+def _incr(key, initial, timeout):
+    """原子自增，键不存在时先用initial初始化（add在并发下只有一个能成功）"""
+    cache = get_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, initial, timeout)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            return initial + 1
+
+
+def visitor_fingerprint(request):
+    """访客指纹：登录用户按用户ID，匿名访客按IP和User-Agent"""
+    if request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    raw = f"{request.META.get('REMOTE_ADDR', '')}|{request.META.get('HTTP_USER_AGENT', '')}"
+    return 'a' + hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def dedupe_key(wishlist_id, fingerprint, bucket):
+    return hashlib.sha1(f'{wishlist_id}:{fingerprint}:{bucket}'.encode('utf-8')).hexdigest()
+
+
+def get_view_count(wishlist):
+    """浏览次数：缓存中的总数（含未写库的浏览），缓存缺失时使用数据库中的计数"""
+    cached = get_cache().get(_key('total', wishlist.pk))
+    return max(cached or 0, wishlist.view_count)
+
+
+def _stored_view_count(wishlist):
+    """数据库中的浏览次数，心愿单已删除时使用传入对象上的计数"""
+    view_count = Wishlist.objects.filter(pk=wishlist.pk).values_list('view_count', flat=True).first()
+    return wishlist.view_count if view_count is None else view_count
+
+
+def record_view(wishlist, request):
+    """记录一次浏览并返回浏览次数；使用共享缓存时不访问数据库"""
+    config = get_view_counter_settings()
+    cache = get_cache()
+    now = timezone.now()
+    fingerprint = visitor_fingerprint(request)
+    key = dedupe_key(wishlist.pk, fingerprint, int(now.timestamp()) // config['BUCKET_SECONDS'])
+
+    buffered = is_buffered()
+    if not cache.add(_key('seen', key), 1, config['BUCKET_SECONDS']):
+        return get_view_count(wishlist) if buffered else _stored_view_count(wishlist)
+
+    event = {
+        'key': key,
+        'wishlist_id': str(wishlist.pk),
+        'user_id': request.user.pk if request.user.is_authenticated else None,
+        'ip_address': request.META.get('REMOTE_ADDR') or None,
+        'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+    }
+    if not buffered:
+        write_views([event])
+        return _stored_view_count(wishlist)
+
+    sequence = _incr(_key('seq'), 0, None)
+    cache.set(_key('event', sequence), event, config['EVENT_TIMEOUT'])
+    total = _incr(_key('total', wishlist.pk), wishlist.view_count, config['TOTAL_TIMEOUT'])
+    return max(total, wishlist.view_count + 1)
+
+
+def write_views(events):
+    """把一批浏览事件写入数据库，返回新写入的数量；已写入过的去重键直接跳过"""
+    events = list({event['key']: event for event in events}.values())
+    if not events:
+        return 0
+
+    with transaction.atomic():
+        existing = set(
+            WishlistView.objects.filter(dedupe_key__in=[event['key'] for event in events])
+            .values_list('dedupe_key', flat=True)
+        )
+        events = [event for event in events if event['key'] not in existing]
+        # 浏览之后被删除的心愿单不再写入
+        alive = {
+            str(pk) for pk in Wishlist.objects.filter(
+                pk__in={event['wishlist_id'] for event in events}
+            ).values_list('pk', flat=True)
+        }
+        events = [event for event in events if event['wishlist_id'] in alive]
+        if not events:
+            return 0
+
+        WishlistView.objects.bulk_create([
+            WishlistView(
+                wishlist_id=event['wishlist_id'],
+                user_id=event['user_id'],
+                ip_address=event['ip_address'],
+                user_agent=event['user_agent'],
+                dedupe_key=event['key'],
+            )
+            for event in events
+        ], ignore_conflicts=True)
+
+        per_wishlist = {}
+        for event in events:
+            per_wishlist[event['wishlist_id']] = per_wishlist.get(event['wishlist_id'], 0) + 1
+        # 增量相同的心愿单合并为一条UPDATE
+        by_increment = {}
+        for wishlist_id, increment in per_wishlist.items():
+            by_increment.setdefault(increment, []).append(wishlist_id)
+        for increment, wishlist_ids in by_increment.items():
+            Wishlist.objects.filter(pk__in=wishlist_ids).update(view_count=F('view_count') + increment)
+    return len(events)
+
+
+def flush_views():
+    """
+    把缓存中的浏览事件批量写入数据库，返回统计 {'read', 'created', 'lost'}
+    同一时间只允许一个进程执行（缓存锁），上一轮未结束时本轮直接跳过
+    """
+    config = get_view_counter_settings()
+    cache = get_cache()
+    lock_key = _key('flush-lock')
+    if not cache.add(lock_key, 1, config['LOCK_TIMEOUT']):
+        logger.info("上一轮心愿单浏览写库尚未结束，跳过本轮")
+        return None
+
+    try:
+        stats = {'read': 0, 'created': 0, 'lost': 0}
+        head = cache.get(_key('seq')) or 0
+        cursor = cache.get(_key('flushed'))
+        # 已写入序号丢失（缓存被清空）时从头扫描，已写入的事件早已删除，缺失的序号直接跳过
+        recovering = cursor is None or cursor > head
+        if recovering:
+            cursor = 0
+
+        while cursor < head:
+            indexes = range(cursor + 1, min(head, cursor + config['BATCH_SIZE']) + 1)
+            entries = cache.get_many([_key('event', index) for index in indexes])
+            events = []
+            end = cursor
+            for index in indexes:
+                event = entries.get(_key('event', index))
+                if event is None and not recovering:
+                    # 序号已分配但事件尚未写入缓存时等待下一轮；连续两轮缺失视为丢失
+                    if cache.get(_key('stalled')) != index:
+                        cache.set(_key('stalled'), index, None)
+                        break
+                if event is None:
+                    stats['lost'] += 1
+                else:
+                    events.append(event)
+                end = index
+
+            stats['read'] += len(events)
+            stats['created'] += write_views(events)
+            cache.set(_key('flushed'), end, None)
+            cache.delete_many([_key('event', index) for index in range(cursor + 1, end + 1)])
+            if end < indexes[-1]:
+                break
+            cursor = end
+
+        if stats['read'] or stats['lost']:
+            logger.info(f"心愿单浏览写库完成: {stats}")
+        return stats
+    finally:
+        cache.delete(lock_key)